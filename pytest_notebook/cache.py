@@ -0,0 +1,394 @@
+"""On-disk caches of notebook (and cell) execution results."""
+
+from collections.abc import Sequence
+import glob
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+
+import nbformat
+from nbformat import NotebookNode
+
+from pytest_notebook import __version__
+
+logger = logging.getLogger(__name__)
+
+HELP_EXEC_CACHE = (
+    "Cache execution results on disk, keyed on the notebook code (and cell tags), "
+    "execution settings, kernel and declared dependencies, "
+    "and skip execution of unchanged notebooks."
+)
+HELP_EXEC_CACHE_DEPS = (
+    "Files (or glob patterns, relative to the root directory), "
+    "on which notebook execution depends, for the execution cache."
+)
+HELP_EXEC_CACHE_SIZE = (
+    "The maximum size (in MB) of the execution cache, "
+    "before least recently used entries are evicted."
+)
+HELP_CELL_CACHE = (
+    "Cache the outputs of cells tagged 'nbreg-cache' (or with 'cache' set in their "
+    "nbreg metadata) on disk, keyed on the cell source, kernel and declared inputs, "
+    "and replay them, rather than executing unchanged cells."
+)
+HELP_CACHE_CLEAR = (
+    "Remove all entries from the execution (and cell) cache, at session start."
+)
+
+DEFAULT_MAX_SIZE_MB = 256
+# notebook metadata keys, which are set by execution
+EXEC_METADATA_KEYS = ("language_info", "widgets")
+
+
+def digest_files(patterns: Sequence[str], root_dir: str | None = None) -> dict:
+    """Return the hash of each file matching the (glob) patterns, per pattern.
+
+    :param root_dir: The directory that patterns are relative to
+        (defaults to the current working directory).
+    """
+    digest = {}
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern, root_dir=root_dir, recursive=True))
+        digest[pattern] = {
+            path: hashlib.sha256(Path(root_dir or "", path).read_bytes()).hexdigest()
+            for path in paths
+            if Path(root_dir or "", path).is_file()
+        }
+    return digest
+
+
+def _write_json(path: Path, data: dict) -> None:
+    """Write JSON data atomically, so that concurrent readers never see a partial file."""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as handle:
+            json.dump(data, handle)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+class ExecutionCache:
+    """An on-disk cache of notebook execution results, with LRU eviction.
+
+    Entries are keyed on a hash of the notebook's code cell sources and tags
+    (e.g. ``raises-exception`` and ``skip-execution``) and kernel spec,
+    the execution settings and working directory,
+    and the contents of declared dependency files.
+    Each entry stores the outputs of the executed code cells
+    (and metadata set by execution), and selected resources;
+    when retrieved, these are applied to the current notebook,
+    so that changes to e.g. markdown cells do not invalidate the cache.
+
+    Only JSON serializable data is stored.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_size: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024,
+        dependencies: Sequence[str] = (),
+        root_dir: str | Path | None = None,
+    ):
+        """Initialise the cache.
+
+        :param directory: The directory to store cache entries in.
+        :param max_size: The maximum size (in bytes) of all cache entries.
+        :param dependencies: Files (or glob patterns) on which execution depends.
+        :param root_dir: The directory that dependency patterns are relative to
+            (defaults to the current working directory).
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.dependencies = tuple(dependencies)
+        self.root_dir = None if root_dir is None else str(root_dir)
+        self._deps_digest = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"ExecutionCache(directory={str(self.directory)!r})"
+
+    def __getstate__(self):
+        """Support pickling (e.g. to share the cache with worker processes)."""
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        """Support unpickling."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def dependencies_digest(self) -> dict:
+        """Return the hash of each dependency file, per pattern.
+
+        This is computed once, on first use.
+        """
+        with self._lock:
+            if self._deps_digest is None:
+                self._deps_digest = digest_files(self.dependencies, self.root_dir)
+            return self._deps_digest
+
+    def key(
+        self, notebook: NotebookNode, settings: dict, cwd: str | Path | None = None
+    ) -> str:
+        """Compute the cache key for a notebook.
+
+        :param settings: JSON serializable settings, which affect execution.
+        :param cwd: The directory the notebook is executed in,
+            since it may read files relative to it.
+            This is hashed relative to ``root_dir``,
+            so that keys are the same for different checkouts of a project.
+        """
+        if cwd is not None:
+            root_dir = os.getcwd() if self.root_dir is None else self.root_dir
+            try:
+                cwd = Path(os.path.relpath(cwd, root_dir)).as_posix()
+            except ValueError:
+                # e.g. on a different drive (on Windows)
+                cwd = Path(cwd).as_posix()
+        kernelspec = notebook.get("metadata", {}).get("kernelspec", {})
+        code_cells = [
+            cell
+            for cell in notebook.get("cells", [])
+            if cell.get("cell_type") == "code"
+        ]
+        data = {
+            "version": __version__,
+            "kernel": [kernelspec.get("name", ""), kernelspec.get("language", "")],
+            "sources": [cell.get("source", "") for cell in code_cells],
+            # tags change how cells are executed (e.g. ``raises-exception``)
+            "tags": [
+                sorted(cell.get("metadata", {}).get("tags", [])) for cell in code_cells
+            ],
+            "settings": settings,
+            "cwd": cwd,
+            "dependencies": self.dependencies_digest(),
+        }
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str, notebook: NotebookNode) -> tuple[NotebookNode, dict] | None:
+        """Retrieve a cache entry, applied to a (copy of the) notebook.
+
+        :returns: (executed notebook, resources) or None, if no entry exists
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf8") as handle:
+                data = json.load(handle)
+            # record the access, for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            logger.warning(f"Removing invalid execution cache entry {path}: {err}")
+            path.unlink(missing_ok=True)
+            return None
+
+        new_notebook = nbformat.from_dict(
+            {
+                **notebook,
+                "metadata": {**notebook.get("metadata", {}), **data["metadata"]},
+                "cells": list(notebook.get("cells", [])),
+            }
+        )
+        code_cells = iter(data["cells"])
+        for index, cell in enumerate(new_notebook.cells):
+            if cell.get("cell_type") == "code":
+                new_notebook.cells[index] = nbformat.from_dict(
+                    {**cell, **next(code_cells)}
+                )
+        return new_notebook, data["resources"]
+
+    def set(self, key: str, notebook: NotebookNode, resources: dict) -> None:
+        """Store a cache entry, then evict entries if the cache is too large.
+
+        :param notebook: The executed notebook.
+        :param resources: JSON serializable resources to store.
+        """
+        data = {
+            "metadata": {
+                k: v for k, v in notebook.metadata.items() if k in EXEC_METADATA_KEYS
+            },
+            "cells": [
+                {
+                    "outputs": cell.get("outputs", []),
+                    "execution_count": cell.get("execution_count", None),
+                }
+                for cell in notebook.cells
+                if cell.get("cell_type") == "code"
+            ],
+            "resources": resources,
+        }
+        _write_json(self._path(key), data)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries, until the cache is within max_size."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            logger.debug(f"Evicting execution cache entry: {path}")
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+class CellCache:
+    """An on-disk cache of the outputs of notebook cells, with LRU eviction.
+
+    Entries are keyed on a hash of the cell source, the kernel,
+    the contents of the cell's declared input files,
+    and the names of any namespace variables stored with it.
+    Each entry stores the outputs of the executed cell
+    and, optionally, a pickle of the namespace variables it sets
+    (written by the kernel to ``namespace_path``),
+    so that the cell can be replayed, rather than executed.
+
+    Note, the cell's outputs (and variables) are assumed to depend only on these,
+    and not on the state set by preceding cells.
+    """
+
+    def __init__(
+        self, directory: str | Path, max_size: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024
+    ):
+        """Initialise the cache.
+
+        :param directory: The directory to store cache entries in
+            (created when the first entry is stored).
+        :param max_size: The maximum size (in bytes) of all cache entries.
+        """
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"CellCache(directory={str(self.directory)!r})"
+
+    def key(
+        self,
+        source: str,
+        kernelspec: dict,
+        inputs: Sequence[str] = (),
+        namespace: Sequence[str] = (),
+        root_dir: str | None = None,
+    ) -> str:
+        """Compute the cache key for a cell.
+
+        :param inputs: Files (or glob patterns) on which the cell's outputs depend.
+        :param namespace: Variables set by the cell, stored with its outputs.
+        :param root_dir: The directory that input patterns are relative to
+            (i.e. the working directory of the kernel).
+        """
+        data = {
+            "version": __version__,
+            "kernel": [kernelspec.get("name", ""), kernelspec.get("language", "")],
+            "source": source,
+            "inputs": digest_files(inputs, root_dir),
+            "namespace": sorted(namespace),
+        }
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True).encode("utf8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def namespace_path(self, key: str) -> Path:
+        """Return the path of the namespace pickle of an entry."""
+        return self.directory / f"{key}.pickle"
+
+    def get(self, key: str) -> dict | None:
+        """Retrieve a cache entry.
+
+        :returns: None, if no (valid) entry exists, or a dict of ``outputs``,
+            and ``namespace`` (the path to the namespace pickle, or None).
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf8") as handle:
+                data = json.load(handle)
+            # record the access, for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            logger.warning(f"Removing invalid cell cache entry {path}: {err}")
+            self.remove(key)
+            return None
+        namespace = None
+        if data["namespace"]:
+            namespace = self.namespace_path(key)
+            if not namespace.is_file():
+                logger.warning(f"Removing cell cache entry without namespace: {path}")
+                self.remove(key)
+                return None
+        return {
+            "outputs": [nbformat.from_dict(output) for output in data["outputs"]],
+            "namespace": namespace,
+        }
+
+    def set(self, key: str, outputs: list, namespace: bool = False) -> None:
+        """Store a cache entry, then evict entries if the cache is too large.
+
+        :param outputs: The outputs of the executed cell.
+        :param namespace: Whether the namespace pickle has been written
+            (to ``namespace_path``).
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_json(self._path(key), {"outputs": outputs, "namespace": namespace})
+        self.evict()
+
+    def remove(self, key: str) -> None:
+        """Remove a cache entry."""
+        self._path(key).unlink(missing_ok=True)
+        self.namespace_path(key).unlink(missing_ok=True)
+
+    def evict(self) -> None:
+        """Remove least recently used entries, until the cache is within max_size."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+                size = stat.st_size
+                if self.namespace_path(path.stem).is_file():
+                    size += self.namespace_path(path.stem).stat().st_size
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            logger.debug(f"Evicting cell cache entry: {path}")
+            self.remove(path.stem)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        for path in self.directory.glob("*.json"):
+            self.remove(path.stem)
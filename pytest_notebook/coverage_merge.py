@@ -0,0 +1,105 @@
+"""Merge notebook coverage data into a coverage.py ``Coverage`` object, in bulk."""
+
+import logging
+import threading
+from typing import Any
+
+try:
+    # coverage is an optional dependency
+    from coverage import Coverage as CoverageType
+except ImportError:
+    CoverageType = Any
+
+logger = logging.getLogger(__name__)
+
+HELP_COVERAGE_MERGER = (
+    "A CoverageMerger instance, to buffer coverage results in, "
+    "to be merged into its Coverage object in bulk "
+    "(rather than merging into cov_merge after each notebook)."
+)
+
+
+def get_coverage_aliases(cov):
+    """Retrieve path aliases from coverage.Coverage object."""
+    from coverage.files import PathAliases
+
+    aliases = None
+    if cov.config.paths:
+        aliases = PathAliases()
+        for paths in cov.config.paths.values():
+            result = paths[0]
+            for pattern in paths[1:]:
+                aliases.add(pattern, result)
+    return aliases
+
+
+class CoverageMerger:
+    """Buffer notebook coverage data files, and merge them into a ``Coverage`` object.
+
+    Data files are only recorded when added, then, on ``merge``,
+    they are combined (in-memory) and merged into the coverage data in a single update,
+    with the path aliases of the coverage configuration computed once.
+    """
+
+    def __init__(self, cov: CoverageType):
+        """Initialise the merger.
+
+        :param cov: The coverage object to merge data into.
+        """
+        self.cov = cov
+        self._data_files = []
+        self._aliases = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"CoverageMerger(pending={len(self)})"
+
+    def __len__(self):
+        """Return the number of data files waiting to be merged."""
+        return len(self._data_files)
+
+    def add(self, data_file: str) -> None:
+        """Add a coverage data file, to be merged."""
+        with self._lock:
+            self._data_files.append(data_file)
+
+    def aliases(self):
+        """Return the path aliases of the coverage configuration (computed once)."""
+        if self._aliases is None:
+            self._aliases = (get_coverage_aliases(self.cov),)
+        return self._aliases[0]
+
+    def merge(self) -> int:
+        """Merge all added data files into the coverage data.
+
+        :returns: The number of data files merged.
+        """
+        from coverage import CoverageData
+
+        with self._lock:
+            data_files, self._data_files = self._data_files, []
+        if not data_files:
+            return 0
+        logger.info(f"Merging coverage of {len(data_files)} notebook(s).")
+        combined = CoverageData(no_disk=True, debug=self.cov._debug)
+        for data_file in data_files:
+            file_data = CoverageData(basename=data_file, debug=self.cov._debug)
+            file_data.read()
+            try:
+                combined.update(file_data)
+            finally:
+                file_data.close()
+        aliases = self.aliases()
+        self.cov.get_data().update(
+            combined,
+            # note aliases was renamed map_path in coverage v7
+            map_path=aliases.map if aliases else None,
+        )
+        # we also take this opportunity to remove ''
+        # from the unmatched source packages, which is caused by using `--cov=`
+        if self.cov._inorout is not None:
+            self.cov._inorout.source_pkgs_unmatched = [
+                p for p in self.cov._inorout.source_pkgs_unmatched if p
+            ]
+        return len(data_files)
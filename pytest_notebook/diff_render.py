@@ -0,0 +1,304 @@
+"""Render line diffs of text in-process, without ``git`` or ``diff`` subprocesses.
+
+The output mimics that of ``git diff --no-index`` (as rendered by nbdime,
+i.e. without the file headers), with the same context lines, hunk headers
+(including the "function" line), ANSI color codes and whitespace error highlights,
+but lines are matched with ``difflib``, so ambiguous changes may be placed differently.
+"""
+
+from collections.abc import Iterator
+import difflib
+import io
+import re
+
+#: The number of context lines around each change (as for ``git diff``)
+CONTEXT_LINES = 3
+
+# the ANSI color codes used by ``git diff --color``
+_RESET = "\x1b[m"
+_FRAG = "\x1b[36m"
+_OLD = "\x1b[31m"
+_NEW = "\x1b[32m"
+_WHITESPACE_ERROR = "\x1b[41m"
+
+# the default "function" line of ``git diff`` hunk headers,
+# a line starting with a letter, underscore or dollar (truncated to 80 bytes)
+_R_FUNCNAME = re.compile(r"[A-Za-z_$]")
+_FUNCNAME_MAX = 80
+# the characters that ``git`` considers whitespace
+_WHITESPACE = " \t\n\r"
+# the words of ``git diff --color-words`` (runs of non-whitespace)
+_R_WORD = re.compile(rf"[^{_WHITESPACE}]+")
+# lines are only split at newlines (as for ``git diff``)
+_R_LINES = re.compile(r"[^\n]*\n|[^\n]+")
+
+
+def _format_range(start: int, length: int) -> str:
+    """Format a hunk range, as for ``git diff`` (``start`` is 0-based)."""
+    if length == 0:
+        return f"{start},0"
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start + 1},{length}"
+
+
+def _funcname(lines: list[str], end: int) -> str:
+    """Return the last "function" line before a line index (or an empty string)."""
+    for line in reversed(lines[:end]):
+        if _R_FUNCNAME.match(line):
+            func = line.encode("utf8")[:_FUNCNAME_MAX].decode("utf8", "ignore")
+            return func.rstrip()
+    return ""
+
+
+def _trailing_blank(lines: list[str]) -> int:
+    """Return the number of blank lines at the end of a list of lines."""
+    count = 0
+    for line in reversed(lines):
+        if line.strip(_WHITESPACE):
+            break
+        count += 1
+    return count
+
+
+def _is_change(opcodes: list[list], index: int) -> bool:
+    """Return whether the opcode at an index exists, and is not equal."""
+    return 0 <= index < len(opcodes) and opcodes[index][0] != "equal"
+
+
+def _opcodes(a: list[str], b: list[str]) -> list[list]:
+    """Return the opcodes to turn one list of lines into another.
+
+    As for ``git diff``, lines that are only deleted or inserted are slid
+    to be adjacent to another change or, failing that, as far down as possible,
+    and adjacent changes are then combined.
+    """
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    # changes are surrounded by (possibly empty) equal opcodes,
+    # so that there are always lines to slide changes into
+    opcodes = [
+        ["equal", 0, 0, 0, 0],
+        *(list(opcode) for opcode in matcher.get_opcodes()),
+        ["equal", len(a), len(a), len(b), len(b)],
+    ]
+    for index, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag not in ("delete", "insert"):
+            continue
+        lines, start, end = (a, i1, i2) if tag == "delete" else (b, j1, j2)
+        before, after = opcodes[index - 1], opcodes[index + 1]
+        max_up = before[2] - before[1]
+        max_down = after[2] - after[1]
+        up = down = 0
+        while up < max_up and lines[start - up - 1] == lines[end - up - 1]:
+            up += 1
+        while down < max_down and lines[start + down] == lines[end + down]:
+            down += 1
+        if down == max_down and _is_change(opcodes, index + 2):
+            shift = down
+        elif up == max_up and _is_change(opcodes, index - 2):
+            shift = -up
+        else:
+            shift = down
+        if not shift:
+            continue
+        before[2] += shift
+        before[4] += shift
+        opcodes[index] = [tag, i1 + shift, i2 + shift, j1 + shift, j2 + shift]
+        after[1] += shift
+        after[3] += shift
+
+    combined: list[list] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2 and j1 == j2:
+            continue
+        if combined and tag != "equal" and combined[-1][0] != "equal":
+            combined[-1][2:] = [i2, combined[-1][3], j2]
+            combined[-1][0] = "replace"
+        else:
+            combined.append([tag, i1, i2, j1, j2])
+    return combined
+
+
+def _hunks(opcodes: list[list], context: int = CONTEXT_LINES) -> Iterator[list[list]]:
+    """Yield the opcodes of each hunk, with up to ``context`` lines around changes.
+
+    Changes separated by up to twice the context lines are in the same hunk
+    (as for :meth:`difflib.SequenceMatcher.get_grouped_opcodes`).
+    """
+    if not opcodes:
+        return
+    opcodes = [list(opcode) for opcode in opcodes]
+    if opcodes[0][0] == "equal":
+        _, i1, i2, j1, j2 = opcodes[0]
+        opcodes[0][1:] = [max(i1, i2 - context), i2, max(j1, j2 - context), j2]
+    if opcodes[-1][0] == "equal":
+        _, i1, i2, j1, j2 = opcodes[-1]
+        opcodes[-1][1:] = [i1, min(i2, i1 + context), j1, min(j2, j1 + context)]
+    group: list[list] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append([tag, i1, i1 + context, j1, j1 + context])
+            yield group
+            group = []
+            i1, j1 = i2 - context, j2 - context
+        group.append([tag, i1, i2, j1, j2])
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def render_diff(
+    a: str, b: str, use_color: bool = True, color_words: bool = False
+) -> str:
+    """Render a unified line diff of two strings.
+
+    :param use_color: Use ANSI color code escapes.
+    :param color_words: Highlight changed words, rather than lines (if ``use_color``).
+    """
+    # lines are compared with their line endings,
+    # so that a last line without a newline differs (as for ``git diff``)
+    a_split = _R_LINES.findall(a)
+    b_split = _R_LINES.findall(b)
+    a_lines = [line.removesuffix("\n") for line in a_split]
+    b_lines = [line.removesuffix("\n") for line in b_split]
+    # the last line of each string, if it has no trailing newline
+    a_no_eol = len(a_lines) - 1 if a and not a.endswith("\n") else None
+    b_no_eol = len(b_lines) - 1 if b and not b.endswith("\n") else None
+    # blank lines added at the end of the string are whitespace errors
+    a_blank = _trailing_blank(a_lines)
+    b_blank = _trailing_blank(b_lines)
+    a_blank_start = len(a_lines) - a_blank
+    b_blank_start = len(b_lines) - b_blank if b_blank > a_blank else len(b_lines)
+
+    out = io.StringIO()
+    for group in _hunks(_opcodes(a_split, b_split)):
+        a_start, a_end = group[0][1], group[-1][2]
+        b_start, b_end = group[0][3], group[-1][4]
+        header = (
+            f"@@ -{_format_range(a_start, a_end - a_start)} "
+            f"+{_format_range(b_start, b_end - b_start)} @@"
+        )
+        func = _funcname(a_lines, a_start)
+        if not use_color:
+            out.write(f"{header} {func}\n" if func else f"{header}\n")
+        elif func:
+            out.write(f"{_FRAG}{header}{_RESET} {_RESET}{func}{_RESET}\n")
+        else:
+            out.write(f"{_FRAG}{header}{_RESET}\n")
+
+        if use_color and color_words:
+            _write_words(out, group, a_split, b_split)
+            continue
+
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for i in range(i1, i2):
+                    out.write(f" {a_lines[i]}{_RESET if use_color else ''}\n")
+                    # the line has no newline in either string
+                    if i == a_no_eol and use_color:
+                        out.write(f"{_RESET}\n")
+                continue
+            for i in range(i1, i2):
+                if use_color:
+                    out.write(f"{_OLD}-{a_lines[i]}{_RESET}\n")
+                else:
+                    out.write(f"-{a_lines[i]}\n")
+                if i == a_no_eol and use_color:
+                    out.write(f"{_RESET}\n")
+            for j in range(j1, j2):
+                if not use_color:
+                    out.write(f"+{b_lines[j]}\n")
+                elif j >= b_blank_start and i2 >= a_blank_start:
+                    out.write(f"{_WHITESPACE_ERROR}+{b_lines[j]}{_RESET}\n")
+                else:
+                    _write_added(out, b_lines[j])
+                if j == b_no_eol and use_color:
+                    out.write(f"{_RESET}\n")
+    return out.getvalue()
+
+
+def _write_added(out: io.StringIO, line: str) -> None:
+    """Write a colored added line, highlighting whitespace errors.
+
+    As for the default ``core.whitespace`` of ``git diff``, these are trailing
+    whitespace and spaces before tabs in the indentation.
+    """
+    out.write(f"{_NEW}+{_RESET}")
+    end = len(line.rstrip(_WHITESPACE))
+    written = 0
+    for i, char in enumerate(line[:end]):
+        if char == " ":
+            continue
+        if char != "\t":
+            break
+        if written < i:
+            out.write(f"{_WHITESPACE_ERROR}{line[written:i]}{_RESET}\t")
+        else:
+            out.write("\t")
+        written = i + 1
+    if written < end:
+        out.write(f"{_NEW}{line[written:end]}{_RESET}")
+    if end < len(line):
+        out.write(f"{_WHITESPACE_ERROR}{line[end:]}{_RESET}")
+    out.write("\n")
+
+
+def _write_words(
+    out: io.StringIO, group: list[list], a_split: list[str], b_split: list[str]
+) -> None:
+    """Write a hunk with changed words highlighted (as ``git diff --color-words``).
+
+    Unchanged lines are written as is, and the words of each block of changed lines
+    are compared, with the text between changed words taken from the new lines.
+    """
+    for tag, i1, i2, j1, j2 in group:
+        if tag == "equal":
+            for line in b_split[j1:j2]:
+                line = line.removesuffix("\n")
+                out.write(f"{line}{_RESET}\n" if line else "\n")
+            continue
+        a_text = "".join(a_split[i1:i2])
+        b_text = "".join(b_split[j1:j2])
+        if not b_text:
+            _write_colored(out, _OLD, a_text)
+            continue
+        a_words = list(_R_WORD.finditer(a_text))
+        b_words = list(_R_WORD.finditer(b_text))
+        # words are slid as lines are, so that a deleted line keeps its line break
+        word_opcodes = _opcodes(
+            [word.group() for word in a_words], [word.group() for word in b_words]
+        )
+        current = 0
+        for word_tag, w_i1, w_i2, w_j1, w_j2 in word_opcodes:
+            if word_tag == "equal":
+                continue
+            a_start, a_end = _word_span(a_words, w_i1, w_i2)
+            b_start, b_end = _word_span(b_words, w_j1, w_j2)
+            _write_colored(out, "", b_text[current:b_start])
+            _write_colored(out, _OLD, a_text[a_start:a_end])
+            _write_colored(out, _NEW, b_text[b_start:b_end])
+            current = b_end
+        _write_colored(out, "", b_text[current:])
+        if not b_text.endswith("\n"):
+            out.write("\n")
+
+
+def _word_span(words: list[re.Match], start: int, end: int) -> tuple[int, int]:
+    """Return the text span of a range of words.
+
+    For an empty range, this is the (empty) span after the preceding word.
+    """
+    if start < end:
+        return words[start].start(), words[end - 1].end()
+    position = words[start - 1].end() if start else 0
+    return position, position
+
+
+def _write_colored(out: io.StringIO, color: str, text: str) -> None:
+    """Write text in a color, with the color codes not spanning lines."""
+    for i, part in enumerate(text.split("\n")):
+        if i:
+            out.write("\n")
+        if part and color:
+            out.write(f"{color}{part}{_RESET}")
+        elif part:
+            out.write(part)
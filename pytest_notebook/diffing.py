@@ -1,20 +1,25 @@
 """Diffing of notebooks."""
 
-from collections.abc import Sequence
+from collections.abc import Container, Iterable, Sequence
 import copy
+import functools
+import io
 import json
 import operator
 from pathlib import Path
 import re
 
-from nbdime.diff_format import DiffEntry, SequenceDiffBuilder
+from nbdime import prettyprint
+from nbdime.diff_format import DiffEntry, SequenceDiffBuilder, op_patch
 from nbdime.diffing.config import DiffConfig
 from nbdime.diffing.generic import default_differs, default_predicates, diff
 from nbdime.diffing.notebooks import diff_attachments, diff_single_outputs
 from nbdime.prettyprint import PrettyPrintConfig, pretty_print_diff
-from nbdime.utils import defaultdict2, join_path, split_path
+from nbdime.utils import defaultdict2, split_path
 from nbformat import NotebookNode
 
+from pytest_notebook.diff_render import render_diff
+
 # TODO nbdime is currently hard coded to version 4 notebooks,
 # this should be reviewed in new releases
 
@@ -24,12 +29,16 @@ def diff_sequence_simple(
     final: Sequence,
     path: str = "",
     config: DiffConfig = None,
+    unchanged: Container[int] = (),
 ) -> dict:
     """Compute diff of two lists with configurable behaviour.
 
     If the lists are of different lengths,
     we assume that items have been appended or removed from the end of the initial list.
 
+    :param unchanged: Indices of items known to be equal in both lists,
+        which are not diffed.
+
     """
     if config is None:
         config = DiffConfig()
@@ -46,6 +55,8 @@ def diff_sequence_simple(
 
     max_length = max(len(initial), len(final))
     for i, (aval, bval) in enumerate(zip(initial[:max_length], final[:max_length])):
+        if i in unchanged:
+            continue
         # if a/bval are outputs and the output_type's are different the diff will fail
         if isinstance(aval, dict) and isinstance(bval, dict):  # noqa: SIM102
             if aval.get("output_type", None) != bval.get("output_type", None):
@@ -79,13 +90,32 @@ def diff_notebooks(
     Moreover, since we are comparing the same notebook before/after execution,
     we shouldn't need to worry about insertions.
 
+    Since most cells are usually unchanged, the cells are first compared for
+    equality (a fast, C-level comparison), and only those that differ are diffed;
+    if all cells, and the rest of the notebook, are equal,
+    the diff is skipped entirely.
+
     """
+    initial_cells = initial.get("cells", [])
+    final_cells = final.get("cells", [])
+    unchanged = {
+        i
+        for i, (icell, fcell) in enumerate(zip(initial_cells, final_cells))
+        if icell == fcell
+    }
+    if (
+        len(unchanged) == len(initial_cells) == len(final_cells)
+        and initial.keys() == final.keys()
+        and all(initial[key] == final[key] for key in initial if key != "cells")
+    ):
+        return []
+
     config = DiffConfig(
         predicates=defaultdict2(lambda: [operator.__eq__], {}),
         differs=defaultdict2(
             lambda: diff,
             {
-                "/cells": diff_sequence_simple,
+                "/cells": functools.partial(diff_sequence_simple, unchanged=unchanged),
                 "/cells/*": diff,
                 "/cells/*/outputs": diff_sequence_simple,
                 "/cells/*/outputs/*": diff_single_outputs,
@@ -118,47 +148,256 @@ def star_path(path):
     return path
 
 
-def filter_diff(
-    diff: list[DiffEntry], remove_paths: list[str], path: str = ""
-) -> list[DiffEntry]:
-    r"""Filter a notebook diff object, removing a list of paths.
+def cell_path(path: str, index: int) -> str | None:
+    r"""Re-base a (possibly starred) notebook path, to the cell at an index,
+    within a notebook containing only that cell.
 
-    Paths are joined by '/' and may be starred, e.g. '/cells/\*/outputs'.
+    e.g. for index 2, '/cells/2/outputs' becomes '/cells/0/outputs',
+    '/cells/\*/outputs' and '/metadata' are unchanged,
+    and '/cells/1/outputs' is None (since it applies only to another cell).
     """
+    segments = path.split("/")
+    if len(segments) < 3 or segments[1] != "cells" or not R_IS_INT.match(segments[2]):
+        return path
+    if int(segments[2]) != index:
+        return None
+    return "/".join([*segments[:2], "0", *segments[3:]])
 
-    if isinstance(diff, list):
-        new_diffs = []
-        for dct in diff:
-            output = filter_diff(dct, remove_paths, path)
-            if output is not None:
-                new_diffs.append(output)
-        return new_diffs
-    elif isinstance(diff, dict):
-        path = "{}/{}".format(path, diff["key"])
-
-        path_elements = split_path(path)
-        for i in reversed(range(len(path_elements))):
-            # iteratively star more elements from the right side
-            new_path = join_path(path_elements[:i] + star_path(path_elements[i:]))
-            # match only on full path-segment boundaries,
-            # so that e.g. '/cells/1' does not also match '/cells/11'
-            if any(new_path == p or new_path.startswith(p + "/") for p in remove_paths):
-                return None
 
-        new_diff = copy.deepcopy(diff)
+def offset_cell_diff(diff: list[DiffEntry], index: int) -> list[DiffEntry]:
+    """Offset the cell indices of a notebook diff, by an index.
 
-        if "diff" in new_diff:
-            sub_diffs = []
-            for sub_diff in new_diff["diff"]:
-                output = filter_diff(sub_diff, remove_paths, path)
+    This converts the diff of notebooks containing only the cell at an index
+    (see ``cell_path``), to the paths of the full notebooks.
+    """
+    new_diff = []
+    for entry in diff:
+        if entry.key == "cells":
+            entry = op_patch(
+                "cells",
+                [DiffEntry({**item, "key": item.key + index}) for item in entry.diff],
+            )
+        new_diff.append(entry)
+    return new_diff
+
+
+class DiffPathMatcher:
+    r"""A matcher of diff entry paths, compiled from a list of (starred) paths to remove.
+
+    The paths are compiled into a trie of their segments, which is walked
+    as the diff is traversed, so that the cost of matching each diff entry
+    does not depend on the number of paths.
+
+    An entry matches, if any of the paths is equal to, or a (full segment) prefix of,
+    the entry path with the integer segments from the right side
+    iteratively replaced by ``*``, as for ``star_path``
+    (note, the last segment is always starred, if it is an integer),
+    e.g. '/cells/\*/outputs' matches '/cells/1/outputs' and '/cells/1/outputs/0',
+    and '/cells/1' matches '/cells/1/outputs', but not '/cells/11'.
+    """
+
+    # the key of a trie node, marking the end of a path
+    _END = None
+
+    def __init__(self, paths: Iterable[str]):
+        """Compile the paths."""
+        self.paths = tuple(paths)
+        self._root = {}
+        for path in self.paths:
+            node = self._root
+            for segment in path.split("/"):
+                node = node.setdefault(segment, {})
+            node[self._END] = True
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"DiffPathMatcher(paths={len(self.paths)})"
+
+    def _initial(self) -> tuple:
+        """Return the state of the root path.
+
+        A state is a tuple of the node reached by the literal path,
+        and the nodes reached by the path with its integer segments starred,
+        from each segment onwards (or None, if the path is matched).
+        """
+        return self._root.get("", None), []
+
+    def _advance(self, state: tuple, segments: Sequence[str]) -> tuple | None:
+        """Advance a state along the segments of a path."""
+        literal, starred = state
+        for segment in segments:
+            star = "*" if R_IS_INT.match(segment) else segment
+            new_starred = []
+            for node in (*starred, literal):
+                if node is None:
+                    continue
+                if self._END in node:
+                    # a path is a prefix of this one
+                    return None
+                child = node.get(star, None)
+                if child is not None and not any(child is n for n in new_starred):
+                    new_starred.append(child)
+            literal = None if literal is None else literal.get(segment, None)
+            starred = new_starred
+        if any(self._END in node for node in starred):
+            return None
+        return literal, starred
+
+    def matches(self, path: str) -> bool:
+        """Return whether a diff entry path is matched."""
+        return self._advance(self._initial(), split_path(path)) is None
+
+    def filter(self, diff: list[DiffEntry], path: str = "") -> list[DiffEntry]:
+        """Filter a notebook diff object, removing the matched entries.
+
+        :param path: The path of the diff object.
+        """
+        state = self._advance(self._initial(), split_path(path))
+        if state is None:
+            return [] if isinstance(diff, list) else None
+        return self._filter(diff, state)
+
+    def _filter(self, diff, state: tuple):
+        if isinstance(diff, list):
+            new_diffs = []
+            for dct in diff:
+                output = self._filter(dct, state)
                 if output is not None:
-                    sub_diffs.append(output)
-            if sub_diffs:
-                new_diff["diff"] = sub_diffs
-            else:
-                new_diff = None
-        return new_diff
-    return diff
+                    new_diffs.append(output)
+            return new_diffs
+        elif isinstance(diff, dict):
+            entry_state = self._advance(state, split_path(str(diff["key"])))
+            if entry_state is None:
+                return None
+
+            if "diff" not in diff:
+                return diff
+            sub_diffs = self._filter(diff["diff"], entry_state)
+            if not sub_diffs:
+                return None
+            if len(sub_diffs) == len(diff["diff"]) and all(
+                new is old for new, old in zip(sub_diffs, diff["diff"])
+            ):
+                return diff
+            # the sub-diffs are replaced, and all other values are shared
+            new_diff = copy.copy(diff)
+            new_diff["diff"] = sub_diffs
+            return new_diff
+        return diff
+
+    def project(
+        self, initial: NotebookNode, final: NotebookNode
+    ) -> tuple[NotebookNode, NotebookNode]:
+        """Replace the matched values, present in both notebooks,
+        by equal (empty) placeholders, so that they are not traversed when diffing.
+
+        Only values that nbdime would diff pairwise are replaced,
+        i.e. values with the same type under the same mapping keys,
+        within cells (by index) and outputs (by index, with the same output type),
+        but not within MIME bundles or other lists,
+        which may be replaced as a whole in a diff (and so would show the placeholders).
+        Values present in only one notebook are left to be filtered from the diff.
+
+        :returns: (initial, final), copied only where values are replaced.
+        """
+        return self._project(initial, final, "", self._initial())
+
+    def _project(self, initial, final, diff_path: str, state: tuple) -> tuple:
+        if isinstance(initial, dict) and isinstance(final, dict):
+            new_initial, new_final = initial, final
+            for key in initial.keys() & final.keys():
+                avalue, bvalue = initial[key], final[key]
+                if type(avalue) is not type(bvalue):
+                    continue
+                key_state = self._advance(state, split_path(str(key)))
+                if key_state is None:
+                    avalue = bvalue = _placeholder(avalue)
+                elif diff_path in _PROJECT_KEYS_ONLY:
+                    continue
+                else:
+                    avalue, bvalue = self._project(
+                        avalue, bvalue, f"{diff_path}/{key}", key_state
+                    )
+                if avalue is not initial[key] or bvalue is not final[key]:
+                    if new_initial is initial:
+                        new_initial, new_final = copy.copy(initial), copy.copy(final)
+                    new_initial[key], new_final[key] = avalue, bvalue
+            return new_initial, new_final
+        if (
+            isinstance(initial, list)
+            and isinstance(final, list)
+            and diff_path in _PROJECT_ITEMS
+        ):
+            new_initial, new_final = initial, final
+            for index, (aitem, bitem) in enumerate(zip(initial, final)):
+                if not (isinstance(aitem, dict) and isinstance(bitem, dict)) or (
+                    aitem.get("output_type", None) != bitem.get("output_type", None)
+                ):
+                    continue
+                item_state = self._advance(state, [str(index)])
+                if item_state is None:
+                    continue
+                aitem, bitem = self._project(aitem, bitem, f"{diff_path}/*", item_state)
+                if aitem is not initial[index] or bitem is not final[index]:
+                    if new_initial is initial:
+                        new_initial, new_final = list(initial), list(final)
+                    new_initial[index], new_final[index] = aitem, bitem
+            return new_initial, new_final
+        return initial, final
+
+
+# the lists diffed pairwise (by index), by ``diff_notebooks``
+_PROJECT_ITEMS = ("/cells", "/cells/*/outputs")
+# the MIME bundles, whose values may be replaced as a whole in a diff
+_PROJECT_KEYS_ONLY = ("/cells/*/outputs/*/data", "/cells/*/attachments")
+
+
+def _placeholder(value):
+    """Return an empty value of the same type (or the value, if not a container)."""
+    if isinstance(value, (dict, list, str)):
+        return type(value)()
+    return value
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_paths(paths: frozenset[str]) -> DiffPathMatcher:
+    return DiffPathMatcher(paths)
+
+
+def filter_diff(
+    diff: list[DiffEntry],
+    remove_paths: Iterable[str] | DiffPathMatcher,
+    path: str = "",
+) -> list[DiffEntry]:
+    r"""Filter a notebook diff object, removing a list of paths.
+
+    Paths are joined by '/' and may be starred, e.g. '/cells/\*/outputs'.
+    They are compiled into a ``DiffPathMatcher``
+    (cached, for recently used paths), or one can be given directly.
+    """
+    if not isinstance(remove_paths, DiffPathMatcher):
+        remove_paths = _compile_paths(frozenset(remove_paths))
+    return remove_paths.filter(diff, path)
+
+
+def project_notebooks(
+    initial: NotebookNode,
+    final: NotebookNode,
+    remove_paths: Iterable[str] | DiffPathMatcher,
+) -> tuple[NotebookNode, NotebookNode]:
+    """Project out the paths to remove from two notebooks, before diffing them.
+
+    The values at the paths (as for ``filter_diff``), present in both notebooks,
+    are replaced by equal placeholders (see ``DiffPathMatcher.project``),
+    so that large ignored values (e.g. tracebacks or image outputs)
+    are not traversed by ``diff_notebooks``.
+    The diff should still be filtered, with ``filter_diff``,
+    for values present in only one notebook.
+    The paths of the diff are unchanged, and so apply to the original notebooks.
+    """
+    if not isinstance(remove_paths, DiffPathMatcher):
+        remove_paths = _compile_paths(frozenset(remove_paths))
+    return remove_paths.project(initial, final)
 
 
 # the sections read for the `nbdiff` entrypoint, in increasing precedence
@@ -241,6 +480,34 @@ def load_nbdime_ignore_config(path: str | Path) -> tuple[str, ...]:
     return tuple(sorted(paths))
 
 
+#: The available renderers of multi-line text diffs, for :func:`diff_to_string`
+DIFF_RENDERERS = ("external", "inprocess")
+
+
+class _InProcessConfig(PrettyPrintConfig):
+    """A pretty print configuration, rendering text diffs in-process."""
+
+
+@functools.cache
+def _install_diff_renderer() -> None:
+    """Wrap the nbdime text diff renderer, to render in-process configurations.
+
+    nbdime provides no hook for this, so the module function is replaced (once),
+    and diffs for any other configuration are still passed to the original.
+    """
+    original = prettyprint.diff_render
+
+    @functools.wraps(original)
+    def diff_render(a, b, config=prettyprint.DefaultConfig):
+        if isinstance(config, _InProcessConfig):
+            return render_diff(
+                a, b, use_color=config.use_color, color_words=config.color_words
+            )
+        return original(a, b, config)
+
+    prettyprint.diff_render = diff_render
+
+
 def diff_to_string(
     notebook: NotebookNode,
     diff_obj: dict,
@@ -248,6 +515,7 @@ def diff_to_string(
     use_diff: bool = True,
     use_color: bool = True,
     color_words: bool = False,
+    renderer: str = "external",
 ) -> str:
     """Convert diff to formatted string.
 
@@ -256,19 +524,22 @@ def diff_to_string(
     :param use_color: whether to prevent use of ANSI color code escapes for text output
     :param color_words: whether to pass the --color-words flag
                         to any internal calls to git diff
+    :param renderer: how to render diffs of multi-line text (one of ``DIFF_RENDERERS``),
+        either with git/diff subprocesses ("external"),
+        or in-process with :func:`~pytest_notebook.diff_render.render_diff` ("inprocess")
     """
-
-    class Printer:
-        def __init__(self):
-            self.string = "\n--- expected\n+++ obtained\n"
-
-        def write(self, text):
-            self.string += text
-
-    printer = Printer()
-
-    config = PrettyPrintConfig(
-        out=printer,
+    if renderer not in DIFF_RENDERERS:
+        raise ValueError(f"renderer must be one of {DIFF_RENDERERS}: {renderer!r}")
+    config_cls = PrettyPrintConfig
+    if renderer == "inprocess":
+        _install_diff_renderer()
+        config_cls = _InProcessConfig
+
+    out = io.StringIO()
+    out.write("\n--- expected\n+++ obtained\n")
+
+    config = config_cls(
+        out=out,
         color_words=color_words,
         use_git=use_git,
         use_diff=use_diff,
@@ -277,4 +548,4 @@ def diff_to_string(
 
     pretty_print_diff(notebook, diff_obj, "", config)
 
-    return printer.string
+    return out.getvalue()
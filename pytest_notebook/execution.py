@@ -1,13 +1,19 @@
 """Execution of notebooks."""
 
+import base64
+from collections.abc import Callable
 from contextlib import nullcontext
 import copy
+from datetime import datetime
 import json
 import logging
 import os
 from pathlib import Path
 import tempfile
 from textwrap import dedent
+import time
+from typing import Any
+import uuid
 
 import attr
 from attr.validators import instance_of
@@ -17,7 +23,18 @@ from nbclient.util import run_sync
 from nbformat import NotebookNode
 import traitlets
 
-from pytest_notebook.notebook import create_cell
+from pytest_notebook.cache import CellCache, ExecutionCache
+from pytest_notebook.forkserver import HELP_PRELOAD, ForkServerKernelManager
+from pytest_notebook.kernel_pool import KernelPool
+from pytest_notebook.notebook import META_KEY, CellCacheConfig, create_cell
+from pytest_notebook.output_limits import (
+    HELP_MAX_NB_OUTPUT_BYTES,
+    HELP_MAX_OUTPUT_BYTES,
+    HELP_OUTPUT_OVERFLOW,
+    OVERFLOW_MODES,
+    OutputLimiter,
+)
+from pytest_notebook.resource_usage import HELP_EXEC_RESOURCES, ResourceMonitor
 from pytest_notebook.utils import autodoc
 
 logger = logging.getLogger(__name__)
@@ -25,30 +42,66 @@ logger = logging.getLogger(__name__)
 HELP_COVERAGE = "Record coverage data, with coverage.py."
 HELP_COVERAGE_CONFIG = "Determines what coverage configuration file to read."
 HELP_COVERAGE_SOURCE = "A list of file paths or package names to measure coverage for."
+HELP_COVERAGE_CORE = (
+    "The coverage.py measurement core to use in the kernel: "
+    "'ctrace', 'pytrace' or 'sysmon' (lower overhead, via sys.monitoring; "
+    "kernels without it fall back to the default core). "
+    "Default is the coverage configuration, or coverage.py's default."
+)
 HELP_EXEC_ENV = (
     "Environment variables to set for the kernel, "
     "in addition to the inherited environment."
 )
+HELP_EXEC_MODE = (
+    "How to run the notebook kernel: 'subprocess' (a kernel process per notebook) "
+    "or 'inprocess' (an ipykernel kernel within the test process, "
+    "for fast, trusted Python notebooks; cell timeouts are not enforced). "
+    "Default is the notebook's nbreg.exec_mode metadata, or 'subprocess'."
+)
+HELP_EXEC_TIMING = (
+    "Record the execution timing of the notebook and its cells "
+    "(which is not written to the notebook)."
+)
+
+HELP_CELL_CALLBACK = (
+    "A callable, called with each cell and its index, as soon as it is executed "
+    "(and its outputs limited); it may raise ExecutionStoppedError, to stop execution."
+)
+
+HELP_COVERAGE_DATA_DIR = (
+    "The directory to write coverage data files to "
+    "(default is a temporary directory, removed when the process exits)."
+)
+
+EXEC_MODES = ("subprocess", "inprocess")
 
 COVERAGE_KEY = "coverage_data"
+COVERAGE_CORE_KEY = "coverage_core"
+COVERAGE_CORES = ("ctrace", "pytrace", "sysmon")
 
 
-def coverage_code_setup(source: str | None, config_file: None | str | Path) -> str:
+def coverage_code_setup(
+    source: str | None,
+    config_file: None | str | Path,
+    data_file: str | Path,
+    data_suffix: str,
+    core: str | None = None,
+) -> str:
     source = f"{source!r}" if source else "None"
     # False disables reading a configuration file
     # (the pre coverage v6.4 meaning of None)
     config_file = f"{config_file!r}" if config_file else "False"
+    set_core = f"__cov.set_option('run:core', {core!r})" if core else ""
     return dedent(
         f"""\
         import coverage as __coverage
         __cov = __coverage.Coverage(
-            data_file=None,
+            data_file={str(data_file)!r},
+            data_suffix={data_suffix!r},
             source={source},
             config_file={config_file},
-            # auto_data=True,
-            data_suffix=True,
             )
-        # __cov.load()
+        {set_core}
         __cov.start()
         __cov._warn_no_data = False
         __cov._warn_unimported_source = False
@@ -59,15 +112,97 @@ def coverage_code_setup(source: str | None, config_file: None | str | Path) -> s
 def coverage_code_teardown() -> str:
     return dedent(
         """\
-        import json
         __cov.stop()
-        # __cov.save()
-        data = __cov.get_data()
-        print(json.dumps({name: data.lines(name) for name in data.measured_files()}))
+        __cov.save()
+        import json as __json
+        print(__json.dumps({
+            "data_file": __cov.get_data().data_filename(),
+            "core": dict(__cov.sys_info()).get("core"),
+        }))
         """
     )
 
 
+_DEFAULT_COV_DATA_DIR = None
+
+
+def get_default_cov_data_dir() -> str:
+    """Return the default directory for coverage data files, for this process.
+
+    This is a temporary directory, which is removed when the process exits.
+    """
+    global _DEFAULT_COV_DATA_DIR
+    if _DEFAULT_COV_DATA_DIR is None:
+        _DEFAULT_COV_DATA_DIR = tempfile.TemporaryDirectory(
+            prefix="pytest_notebook_cov_"
+        )
+    return _DEFAULT_COV_DATA_DIR.name
+
+
+def dump_coverage_file(data_file: str) -> str:
+    """Serialize a coverage data file to a (JSON compatible) string."""
+    from coverage import CoverageData
+
+    data = CoverageData(basename=data_file)
+    data.read()
+    try:
+        return base64.b64encode(data.dumps()).decode("ascii")
+    finally:
+        data.close()
+
+
+def load_coverage_file(dumped: str, data_dir: str | None = None) -> str:
+    """Write a serialized coverage data file (from ``dump_coverage_file``)
+    to a new file in ``data_dir``, and return its path.
+    """
+    from coverage import CoverageData
+
+    data = CoverageData(
+        basename=os.path.join(data_dir or get_default_cov_data_dir(), ".coverage"),
+        suffix=uuid.uuid4().hex,
+    )
+    try:
+        data.loads(base64.b64decode(dumped))
+        return data.data_filename()
+    finally:
+        data.close()
+
+
+def namespace_code_save(names: list[str], path: str) -> str:
+    """Create the kernel code, to pickle namespace variables to a file."""
+    return dedent(
+        f"""\
+        import pickle as _nbreg_pickle
+        with open({path!r}, "wb") as _nbreg_handle:
+            _nbreg_pickle.dump(
+                {{_nbreg_name: globals()[_nbreg_name] for _nbreg_name in {names!r}}},
+                _nbreg_handle,
+            )
+        del _nbreg_pickle, _nbreg_handle
+        """
+    )
+
+
+def namespace_code_load(path: str) -> str:
+    """Create the kernel code, to restore namespace variables from a pickle file."""
+    return dedent(
+        f"""\
+        import pickle as _nbreg_pickle
+        with open({path!r}, "rb") as _nbreg_handle:
+            globals().update(_nbreg_pickle.load(_nbreg_handle))
+        del _nbreg_pickle, _nbreg_handle
+        """
+    )
+
+
+def _parse_timestamp(value: str | None) -> float | None:
+    """Convert an ISO format timestamp, recorded by nbclient, to seconds since epoch."""
+    if not value:
+        return None
+    # python < 3.11 does not parse the Z suffix
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
 class CoverageNotebookClient(NotebookClient):
     """A NotebookClient that records coverage data.
 
@@ -75,10 +210,38 @@ class CoverageNotebookClient(NotebookClient):
 
     - Before running any cells, we run a mock cell, containing coverage setup code.
     - After execution, we run a mock cell, containing code to teardown the coverage,
-      and print the coverage data to ``/cell/output/0/text``.
-    - Coverage data is then saved in resources["coverage_data"]
+      saving the coverage data to a (uniquely suffixed) file in ``cov_data_dir``,
+      and printing its path (and the core used) to ``/cell/output/0/text``.
+    - The data file path is then saved in resources["coverage_data"],
+      and the name of the core in resources["coverage_core"]
+
+    If ``max_output_bytes`` or ``max_nb_output_bytes`` are set,
+    the outputs of the notebook cells are limited as they are collected
+    (see ``OutputLimiter``).
+
+    If ``cell_callback`` is set, it is called with each cell (and its index),
+    as soon as the cell has been executed.
+
+    If ``record_timing`` is True, the timing of execution is stored in ``timing``,
+    rather than in the cell metadata:
+
+    - ``kernel_start``, ``coverage_setup``, ``coverage_teardown`` and ``total``
+      durations (in seconds, or None if not applicable)
+    - ``cells``, a list of ``index``, ``queued``, ``start`` and ``end`` times
+      (in seconds since the epoch) for each executed code cell,
+      where ``queued`` is when the execution request was sent,
+      and ``start`` / ``end`` are reported by the kernel.
+
+    If ``record_resources`` is True, the resource usage of the kernel process
+    is stored in ``resource_usage`` (see ``ResourceMonitor``).
+
+    If ``cell_cache`` is set, the outputs of the cells in ``cached_cells``
+    are replayed from the cache, rather than executed, if available
+    (restoring any cached namespace variables, in Python kernels),
+    otherwise they are stored in the cache, after a successful execution.
 
     :raises CoverageError: If a coverage cell execution errors.
+    :raises ExecutionStoppedError: If the ``cell_callback`` stops execution.
     """
 
     coverage = traitlets.Bool(default_value=False, help=HELP_COVERAGE).tag(config=True)
@@ -91,12 +254,134 @@ class CoverageNotebookClient(NotebookClient):
         allow_none=True,
         help=HELP_COVERAGE_SOURCE,
     ).tag(config=True)
+    cov_core = traitlets.Enum(
+        COVERAGE_CORES, default_value=None, allow_none=True, help=HELP_COVERAGE_CORE
+    ).tag(config=True)
+    cov_data_dir = traitlets.Unicode(
+        default_value=None, allow_none=True, help=HELP_COVERAGE_DATA_DIR
+    ).tag(config=True)
+    preload_modules = traitlets.List(
+        traitlets.Unicode(), default_value=None, allow_none=True, help=HELP_PRELOAD
+    ).tag(config=True)
+    exec_mode = traitlets.Enum(
+        EXEC_MODES, default_value="subprocess", help=HELP_EXEC_MODE
+    ).tag(config=True)
+
+    max_output_bytes = traitlets.Integer(
+        default_value=None, allow_none=True, help=HELP_MAX_OUTPUT_BYTES
+    ).tag(config=True)
+    max_nb_output_bytes = traitlets.Integer(
+        default_value=None, allow_none=True, help=HELP_MAX_NB_OUTPUT_BYTES
+    ).tag(config=True)
+    output_overflow = traitlets.Enum(
+        OVERFLOW_MODES, default_value="truncate", help=HELP_OUTPUT_OVERFLOW
+    ).tag(config=True)
+    spill_dir = traitlets.Unicode(
+        default_value=None,
+        allow_none=True,
+        help="The directory to spill oversized outputs to.",
+    ).tag(config=True)
+    record_resources = traitlets.Bool(
+        default_value=False, help=HELP_EXEC_RESOURCES
+    ).tag(config=True)
+    cell_callback = traitlets.Callable(
+        default_value=None, allow_none=True, help=HELP_CELL_CALLBACK
+    )
+    cell_cache = traitlets.Instance(
+        CellCache,
+        default_value=None,
+        allow_none=True,
+        help="The cache to replay (and store) cell outputs from.",
+    )
+    cached_cells = traitlets.Dict(
+        default_value={},
+        help="The cells whose outputs may be cached: {index: CellCacheConfig}.",
+    )
+
+    def create_kernel_manager(self):
+        """Create a new kernel manager,
+        which runs the kernel in-process, if ``exec_mode`` is 'inprocess',
+        or forks the kernel from a template process, if ``preload_modules`` is set.
+        """
+        if self.exec_mode == "inprocess":
+            # ipykernel is not a required dependency
+            from pytest_notebook.inprocess import InProcessManager
+
+            self.kernel_manager_class = InProcessManager
+            return super().create_kernel_manager()
+        if self.preload_modules:
+            self.kernel_manager_class = ForkServerKernelManager
+        km = super().create_kernel_manager()
+        if self.preload_modules:
+            km.preload_modules = list(self.preload_modules)
+        return km
+
+    timing = None
+    resource_usage = None
+    _output_limiter = None
+    _cell_index = None
+
+    def create_output_limiter(self) -> OutputLimiter | None:
+        """Create a limiter for the notebook cell outputs, if limits are set."""
+        if self.max_output_bytes is None and self.max_nb_output_bytes is None:
+            return None
+        return OutputLimiter(
+            self.max_output_bytes,
+            self.max_nb_output_bytes,
+            overflow=self.output_overflow,
+            spill_dir=self.spill_dir,
+        )
+
+    def output(self, outs, msg, display_id, cell_index):
+        """Handle output, limiting its size if required."""
+        out = super().output(outs, msg, display_id, cell_index)
+        if (
+            self._output_limiter is not None
+            and out is not None
+            and outs
+            and outs[-1] is out
+        ):
+            self._output_limiter.limit(outs)
+        return out
+
+    def _update_display_id(self, display_id: str, msg: dict) -> None:
+        """Update outputs with a given display_id,
+        passing any updated (previously executed) cells to ``cell_callback`` again.
+        """
+        super()._update_display_id(display_id, msg)
+        if self.cell_callback is None or self._cell_index is None:
+            return
+        for cell_index in self._display_id_map.get(display_id, {}):
+            if cell_index < self._cell_index:
+                self.cell_callback(self.nb.cells[cell_index], cell_index)
 
     async def async_execute(self, reset_kc: bool = False, **kwargs) -> NotebookNode:
         if reset_kc and self.owns_km:
             await self._async_cleanup_kernel()
         self.reset_execution_trackers()
+        self.timing = None
+        self.resource_usage = None
+        if self.record_timing:
+            self.timing = {
+                "kernel_start": None,
+                "coverage_setup": None,
+                "coverage_teardown": None,
+                "total": None,
+                "cells": [],
+            }
+        start_time = time.perf_counter()
+
+        try:
+            await self._async_execute_notebook(start_time, **kwargs)
+        finally:
+            if self.timing is not None:
+                self.timing["total"] = time.perf_counter() - start_time
+
+        return self.nb
+
+    execute = run_sync(async_execute)
 
+    async def _async_execute_notebook(self, start_time: float, **kwargs) -> None:
         async with self.async_setup_kernel(**kwargs):
             assert self.kc is not None
             self.log.info(f"Executing notebook with kernel: {self.kernel_name}")
@@ -112,24 +397,186 @@ class CoverageNotebookClient(NotebookClient):
                         'Kernel info received message content has no "language_info" key. '
                         "Content is:\n" + str(info_msg["content"])
                     )
-            if self.coverage and self.kernel_name.startswith("python"):
-                await self.coverage_setup()
+            if self.timing is not None:
+                self.timing["kernel_start"] = time.perf_counter() - start_time
+            monitor = None
+            if self.record_resources:
+                monitor = ResourceMonitor.from_pid(self._kernel_pid())
+            if monitor is not None:
+                monitor.start()
+            try:
+                await self._async_execute_cells(monitor)
+            finally:
+                if monitor is not None:
+                    self.resource_usage = monitor.stop()
+
+    async def _async_execute_cells(self, monitor: ResourceMonitor | None) -> None:
+        """Execute the notebook cells (and any coverage cells),
+        in a started kernel.
+        """
+        if self.coverage and self.kernel_name.startswith("python"):
+            setup_time = time.perf_counter()
+            await self.coverage_setup()
+            if self.timing is not None:
+                self.timing["coverage_setup"] = time.perf_counter() - setup_time
+        # coverage cell outputs are not limited
+        self._output_limiter = self.create_output_limiter()
+        try:
             for index, cell in enumerate(self.nb.cells):
-                await self.async_execute_cell(
-                    cell, index, execution_count=self.code_cells_executed + 1
-                )
-            self.set_widgets_metadata()
-            if self.coverage and self.kernel_name.startswith("python"):
-                await self.coverage_teardown()
+                self._cell_index = index
+                original = cell.get("metadata", {}).get("execution", None)
+                queued = time.time()
+                if monitor is not None and cell.get("cell_type") == "code":
+                    monitor.cell_start(index)
+                try:
+                    await self._async_execute_or_replay_cell(cell, index)
+                finally:
+                    if monitor is not None and cell.get("cell_type") == "code":
+                        monitor.cell_end(index)
+                    if self._output_limiter is not None:
+                        self._output_limiter.finish()
+                    if self.timing is not None:
+                        self._pop_cell_timing(cell, index, queued, original)
+                if self.cell_callback is not None:
+                    self.cell_callback(cell, index)
+        finally:
+            self._output_limiter = None
+            self._cell_index = None
+        self.set_widgets_metadata()
+        if self.coverage and self.kernel_name.startswith("python"):
+            teardown_time = time.perf_counter()
+            await self.coverage_teardown()
+            if self.timing is not None:
+                self.timing["coverage_teardown"] = time.perf_counter() - teardown_time
 
-        return self.nb
+    async def _async_execute_or_replay_cell(
+        self, cell: NotebookNode, index: int
+    ) -> None:
+        """Execute a cell, or replay its outputs from the cell cache."""
+        config: CellCacheConfig | None = self.cached_cells.get(index, None)
+        if self.cell_cache is None or config is None:
+            await self.async_execute_cell(
+                cell, index, execution_count=self.code_cells_executed + 1
+            )
+            return
+        namespace = list(config.namespace)
+        language = self.nb.metadata.get("language_info", {}).get("name", "")
+        if namespace and language != "python":
+            self.log.warning(
+                f"Cell {index}: cached namespaces are only supported for Python kernels"
+            )
+            namespace = []
+        key = self.cell_cache.key(
+            cell.source,
+            self.nb.metadata.get("kernelspec", {}),
+            config.inputs,
+            namespace,
+            root_dir=self.resources.get("metadata", {}).get("path", None),
+        )
+        entry = self.cell_cache.get(key)
+        if entry is not None and (
+            (entry["namespace"] is None and language != "python")
+            or await self._async_execute_silent(
+                "pass"
+                if entry["namespace"] is None
+                else namespace_code_load(str(entry["namespace"])),
+                index,
+                # advance the kernel execution count, as if the cell was executed,
+                # so that the counts of later execute_result outputs are unchanged
+                store_history=True,
+            )
+        ):
+            self.log.info(f"Replaying cached outputs of cell {index}")
+            self.code_cells_executed += 1
+            cell.outputs = entry["outputs"]
+            cell.execution_count = self.code_cells_executed
+            return
 
-    execute = run_sync(async_execute)
+        await self.async_execute_cell(
+            cell, index, execution_count=self.code_cells_executed + 1
+        )
+        if any(output.get("output_type") == "error" for output in cell.outputs):
+            return
+        if namespace:
+            path = self.cell_cache.namespace_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            if not await self._async_execute_silent(
+                namespace_code_save(namespace, str(temp_path)), index
+            ):
+                temp_path.unlink(missing_ok=True)
+                return
+            os.replace(temp_path, path)
+        self.cell_cache.set(key, cell.outputs, namespace=bool(namespace))
+
+    async def _async_execute_silent(
+        self, source: str, index: int, store_history: bool = False
+    ) -> bool:
+        """Execute code in the kernel, without recording it in the notebook.
+
+        :param store_history: Increment the kernel execution count.
+        :returns: Whether the execution succeeded (errors are logged as warnings).
+        """
+        msg_id = await ensure_async(
+            self.kc.execute(
+                source,
+                silent=not store_history,
+                store_history=store_history,
+                allow_stdin=False,
+            )
+        )
+        reply = await self.async_wait_for_reply(msg_id)
+        if reply is None or reply["content"]["status"] != "ok":
+            content = {} if reply is None else reply["content"]
+            self.log.warning(
+                f"Cell {index}: failed to store or restore its cached namespace: "
+                f"{content.get('ename', '<Error>')}: {content.get('evalue', '')}"
+            )
+            return False
+        return True
+
+    def _kernel_pid(self) -> int | None:
+        """Return the process ID of the kernel, if it runs in a (local) subprocess."""
+        provisioner = getattr(self.km, "provisioner", None)
+        return getattr(provisioner, "pid", None)
+
+    def _pop_cell_timing(
+        self, cell: NotebookNode, index: int, queued: float, original: dict | None
+    ) -> None:
+        """Move the timing, recorded by nbclient in the cell metadata, to ``timing``,
+        restoring the original metadata.
+        """
+        metadata = cell.get("metadata", {})
+        execution = metadata.get("execution", None)
+        if execution is None or execution is original:
+            # the cell was not executed
+            return
+        metadata.pop("execution")
+        if original is not None:
+            metadata["execution"] = original
+        if not execution:
+            return
+        start = _parse_timestamp(execution.get("iopub.status.busy"))
+        end = _parse_timestamp(
+            execution.get("shell.execute_reply", execution.get("iopub.status.idle"))
+        )
+        self.timing["cells"].append(
+            {"index": index, "queued": queued, "start": start, "end": end}
+        )
 
     async def coverage_setup(self) -> None:
         """Set up coverage, by executing a code cell."""
         self.log.info("Recording coverage for notebook")
-        source = coverage_code_setup(self.cov_source, self.cov_config_file)
+        source = coverage_code_setup(
+            self.cov_source,
+            self.cov_config_file,
+            os.path.join(
+                os.path.abspath(self.cov_data_dir or get_default_cov_data_dir()),
+                ".coverage",
+            ),
+            uuid.uuid4().hex,
+            self.cov_core,
+        )
         cell = create_cell(source, cell_type="code", as_version=self.nb.nbformat)
         self.nb.cells.insert(0, cell)
         allow_error = self.allow_errors
@@ -172,7 +619,15 @@ class CoverageNotebookClient(NotebookClient):
                 "The teardown coverage cell did not produce the expected output: "
                 f"{cell.outputs}"
             )
-        self.resources[COVERAGE_KEY] = cell.outputs[0]["text"]
+        try:
+            data = json.loads(cell.outputs[0]["text"])
+        except ValueError as err:
+            raise CoverageError(
+                "The teardown coverage cell did not produce the expected output: "
+                f"{cell.outputs}"
+            ) from err
+        self.resources[COVERAGE_KEY] = data["data_file"]
+        self.resources[COVERAGE_CORE_KEY] = data["core"]
 
 
 class CoverageError(Exception):
@@ -196,6 +651,23 @@ class CoverageError(Exception):
         )
 
 
+class ExecutionStoppedError(Exception):
+    """Exception raised (by a cell callback) to stop the execution of a notebook."""
+
+    def __init__(self, message: str, cell_index: int):
+        """Initialise the exception.
+
+        :param message: The reason execution was stopped.
+        :param cell_index: The index of the last cell executed.
+        """
+        super().__init__(message)
+        self.cell_index = cell_index
+
+    def __reduce__(self):
+        """Support pickling (e.g. to return the exception from a worker process)."""
+        return (type(self), (self.args[0], self.cell_index))
+
+
 @autodoc
 @attr.s(frozen=True, slots=True)
 class ExecuteResult:
@@ -211,6 +683,52 @@ class ExecuteResult:
     resources: dict = attr.ib(
         validator=instance_of(dict), metadata={"help": "Resources dictionary."}
     )
+    timing: dict | None = attr.ib(
+        None,
+        validator=instance_of((type(None), dict)),
+        metadata={"help": "Execution timing, if recorded."},
+    )
+    resource_usage: dict | None = attr.ib(
+        None,
+        validator=instance_of((type(None), dict)),
+        metadata={"help": "Resource usage of the kernel process, if recorded."},
+    )
+    from_cache: bool = attr.ib(
+        False,
+        validator=instance_of(bool),
+        metadata={"help": "Whether the result was retrieved from the execution cache."},
+    )
+
+    def cell_durations(self) -> dict[int, float]:
+        """Return the execution duration (in seconds) of each timed cell, by index."""
+        if not self.timing:
+            return {}
+        return {
+            cell["index"]: cell["end"] - cell["start"]
+            for cell in self.timing["cells"]
+            if cell["start"] is not None and cell["end"] is not None
+        }
+
+    def coverage_setup_teardown(self) -> float | None:
+        """Return the time (in seconds) spent setting up and tearing down coverage,
+        if timing was recorded.
+
+        Note, this is not the full overhead of coverage,
+        since it does not include the cost of measuring executed cells,
+        which depends on the coverage core (see ``coverage_core``).
+        For that, compare the total time (``timing["total"]``)
+        with an execution without coverage.
+        """
+        if not self.timing or self.timing.get("coverage_setup") is None:
+            return None
+        return self.timing["coverage_setup"] + (self.timing["coverage_teardown"] or 0)
+
+    @property
+    def coverage_core(self) -> str | None:
+        """Return the name of the coverage.py core used in the kernel, if recorded
+        (e.g. ``CTracer``, ``PyTracer`` or ``SysMonitor``).
+        """
+        return self.resources.get(COVERAGE_CORE_KEY, None)
 
     @property
     def has_coverage(self):
@@ -218,26 +736,57 @@ class ExecuteResult:
         return COVERAGE_KEY in self.resources
 
     def coverage_data(self, debug=None, no_disk=True):
-        """Return coverage.py coverage data as `coverage.CoverageData`."""
-        coverage_str = self.resources.get(COVERAGE_KEY, None)
-        if not coverage_str:
+        """Return coverage.py coverage data as `coverage.CoverageData`.
+
+        :param no_disk: If True, return an in-memory copy of the data file,
+            otherwise the data file itself.
+        """
+        data_file = self.resources.get(COVERAGE_KEY, None)
+        if not data_file:
             return None
         from coverage import CoverageData
 
-        coverage_data = CoverageData(debug=debug, no_disk=no_disk)
-        coverage_data.add_lines(json.loads(coverage_str))
+        file_data = CoverageData(basename=data_file, debug=debug)
+        file_data.read()
+        if not no_disk:
+            return file_data
+        coverage_data = CoverageData(debug=debug, no_disk=True)
+        try:
+            coverage_data.update(file_data)
+        finally:
+            file_data.close()
         return coverage_data
 
     @property
     def coverage_dict(self) -> dict:
-        """Return coverage.py coverage data as a dict."""
-        coverage_str = self.resources.get(COVERAGE_KEY, None)
-        if not coverage_str:
+        """Return coverage.py coverage (line) data as a dict."""
+        coverage_data = self.coverage_data()
+        if coverage_data is None:
             return None
-        return json.loads(coverage_str)
+        return {
+            name: sorted(coverage_data.lines(name))
+            for name in coverage_data.measured_files()
+        }
+
+
+def _copy_for_execution(notebook: NotebookNode) -> NotebookNode:
+    """Copy a notebook, to execute.
+
+    Execution only (re-)assigns keys of the notebook metadata, cells and cell metadata
+    (e.g. new outputs), so only these are copied,
+    and all other elements are shared with the original notebook.
+    """
+    new_notebook = copy.copy(notebook)
+    new_notebook.metadata = copy.copy(notebook.metadata)
+    new_notebook.cells = []
+    for cell in notebook.cells:
+        new_cell = copy.copy(cell)
+        new_cell.metadata = copy.copy(cell.metadata)
+        new_notebook.cells.append(new_cell)
+    return new_notebook
 
 
-def execute_notebook(
+async def async_execute_notebook(
     notebook: NotebookNode,
     *,
     resources: dict | None = None,
@@ -248,6 +797,21 @@ def execute_notebook(
     with_coverage: bool = False,
     cov_config_file: str | None = None,
     cov_source: list[str] | None = None,
+    cov_data_dir: str | None = None,
+    cov_core: str | None = None,
+    kernel_pool: KernelPool | None = None,
+    exec_cache: ExecutionCache | None = None,
+    exec_mode: str | None = None,
+    preload_modules: list[str] | None = None,
+    record_timing: bool = False,
+    record_resources: bool = False,
+    max_output_bytes: int | None = None,
+    max_nb_output_bytes: int | None = None,
+    output_overflow: str = "truncate",
+    spill_dir: str | None = None,
+    cell_callback: Callable[[NotebookNode, int], Any] | None = None,
+    cell_cache: CellCache | None = None,
+    cached_cells: dict[int, CellCacheConfig] | None = None,
 ) -> ExecuteResult:
     """Execute a notebook.
 
@@ -261,38 +825,204 @@ def execute_notebook(
     :param with_coverage: Record code coverage with coverage.py
     :param cov_config_file: Determines what coverage configuration file to read.
     :param cov_source: A list of file paths or package names to measure coverage for.
+    :param cov_data_dir: The directory to write coverage data files to
+        (default is a temporary directory, removed when the process exits).
+    :param cov_core: The coverage.py core to use in the kernel,
+        'ctrace', 'pytrace' or 'sysmon' (default is the coverage configuration).
+    :param kernel_pool: Acquire a pre-started kernel from this pool,
+        rather than starting a new one (and release it after execution).
+    :param exec_cache: Retrieve the execution result from this cache, if available,
+        rather than executing the notebook
+        (successful executions are stored in the cache).
+    :param exec_mode: 'subprocess' or 'inprocess' (see ``HELP_EXEC_MODE``),
+        default is the notebook's ``nbreg.exec_mode`` metadata, or 'subprocess'.
+        In-process execution does not support coverage,
+        and ignores ``kernel_pool`` and ``preload_modules``.
+    :param preload_modules: Fork the kernel from a template process,
+        in which these modules are already imported (Linux and ipykernel only).
+    :param record_timing: Record the execution timing of the notebook and its cells,
+        in ``ExecuteResult.timing`` (not results retrieved from the cache).
+    :param record_resources: Record the peak memory, CPU and wall time
+        of the kernel process, for the notebook and each code cell,
+        in ``ExecuteResult.resource_usage`` (requires psutil,
+        and not recorded for in-process kernels or results retrieved from the cache).
+    :param max_output_bytes: The maximum size (in bytes) of a single cell output.
+    :param max_nb_output_bytes: The maximum size (in bytes) of all cell outputs.
+    :param output_overflow: How to handle outputs exceeding the size limits,
+        'truncate' or 'spill' (see ``OutputLimiter``).
+    :param spill_dir: The directory to spill outputs to
+        (default is a temporary directory, removed when the process exits).
+    :param cell_callback: Called with each cell (and its index),
+        as soon as it has been executed;
+        if it raises ``ExecutionStoppedError``, the kernel is stopped,
+        and the exception returned as the execution error
+        (cells after it are left unexecuted).
+    :param cell_cache: Replay the outputs of ``cached_cells`` from this cache,
+        if available, rather than executing them
+        (successfully executed cells are stored in the cache).
+    :param cached_cells: The cells whose outputs may be cached
+        (e.g. ``MetadataConfig.cache_cells``).
 
     :returns: (exception or None, new_notebook, resources)
 
     """
-    new_notebook = copy.deepcopy(notebook)
     resources = resources or {}
-    cwd_context = nullcontext(cwd) if cwd is not None else tempfile.TemporaryDirectory()
+    if exec_mode is None:
+        exec_mode = notebook.metadata.get(META_KEY, {}).get("exec_mode", "subprocess")
+    if exec_mode not in EXEC_MODES:
+        raise ValueError(f"exec_mode must be one of {EXEC_MODES}: {exec_mode}")
+    if exec_mode == "inprocess" and with_coverage:
+        logger.warning(
+            "In-process execution does not support coverage, using a subprocess"
+        )
+        exec_mode = "subprocess"
+    cache_key = None
+    if exec_cache is not None:
+        cache_key = exec_cache.key(
+            notebook,
+            {
+                "timeout": timeout,
+                "allow_errors": allow_errors,
+                "exec_env": exec_env,
+                "with_coverage": with_coverage,
+                "cov_config_file": cov_config_file,
+                "cov_source": cov_source,
+                "cov_core": cov_core,
+                "max_output_bytes": max_output_bytes,
+                "max_nb_output_bytes": max_nb_output_bytes,
+                "output_overflow": output_overflow,
+                "exec_mode": exec_mode,
+                "preload_modules": preload_modules,
+                "cached_cells": None if cell_cache is None else cached_cells,
+                # cached coverage data is stored as a serialized data file
+                "coverage_transport": "data_file",
+            },
+            cwd=cwd,
+        )
+        cached = exec_cache.get(cache_key, notebook)
+        if cached is not None:
+            logger.debug(f"Using cached execution result: {cache_key}")
+            new_notebook, cached_resources = cached
+            resources.setdefault("metadata", {})["path"] = cwd
+            if COVERAGE_KEY in cached_resources:
+                cached_resources[COVERAGE_KEY] = load_coverage_file(
+                    cached_resources[COVERAGE_KEY], cov_data_dir
+                )
+            resources.update(cached_resources)
+            return ExecuteResult(None, new_notebook, resources, from_cache=True)
+
+    if exec_mode == "inprocess":
+        kernel_pool = None
+    new_notebook = _copy_for_execution(notebook)
+    if cwd is not None or kernel_pool is not None:
+        # pooled kernels without a cwd run in a temporary directory owned by the pool
+        cwd_context = nullcontext(cwd)
+    else:
+        cwd_context = tempfile.TemporaryDirectory()
     exec_error = None
     with cwd_context as cwd_dir:
         resources.setdefault("metadata", {})["path"] = cwd_dir
+        kernel_env = None
+        if exec_env is not None:
+            # merge with the current environment,
+            # since a supplied `env` replaces it entirely
+            kernel_env = {
+                **os.environ,
+                **{key: str(value) for key, value in exec_env.items()},
+            }
+        km = None
+        acquire_time = time.perf_counter()
+        if kernel_pool is not None:
+            km = await kernel_pool.async_acquire(
+                new_notebook.metadata.get("kernelspec", {}).get("name", ""),
+                cwd=cwd_dir,
+                env=kernel_env,
+                preload_modules=preload_modules,
+            )
         client = CoverageNotebookClient(
             new_notebook,
+            km=km,
             timeout=timeout,
             allow_errors=allow_errors,
             log=logger,
             resources=resources,
-            record_timing=False,
+            record_timing=record_timing,
+            record_resources=record_resources,
             coverage=with_coverage,
             cov_config_file=cov_config_file,
             cov_source=cov_source,
+            cov_data_dir=cov_data_dir,
+            cov_core=cov_core,
+            exec_mode=exec_mode,
+            preload_modules=preload_modules,
+            max_output_bytes=max_output_bytes,
+            max_nb_output_bytes=max_nb_output_bytes,
+            output_overflow=output_overflow,
+            spill_dir=spill_dir,
+            cell_callback=cell_callback,
+            cell_cache=cell_cache,
+            cached_cells=cached_cells or {},
         )
+        if km is not None:
+            # the client only sets its kernel name when creating a kernel manager,
+            # and it is needed to decide whether to set up coverage
+            client.kernel_name = km.kernel_name
+        acquire_time = time.perf_counter() - acquire_time
         kernel_kwargs = {}
-        if exec_env is not None:
-            # merge with the current environment,
-            # since a supplied `env` replaces it entirely
-            kernel_kwargs["env"] = {
-                **os.environ,
-                **{key: str(value) for key, value in exec_env.items()},
-            }
+        if kernel_env is not None:
+            kernel_kwargs["env"] = kernel_env
+        if exec_mode == "inprocess":
+            # ipykernel is not a required dependency
+            from pytest_notebook.inprocess import inprocess_lock
+
+            exec_context = inprocess_lock()
+        else:
+            exec_context = nullcontext()
         try:
-            client.execute(**kernel_kwargs)
-        except (CellExecutionError, CellTimeoutError, CoverageError) as err:
+            async with exec_context:
+                await client.async_execute(**kernel_kwargs)
+        except (
+            CellExecutionError,
+            CellTimeoutError,
+            CoverageError,
+            ExecutionStoppedError,
+        ) as err:
             exec_error = err
+        finally:
+            if km is not None:
+                # the client does not own the kernel, so does not clean up after itself
+                if client.kc is not None:
+                    await ensure_async(client.kc.stop_channels())
+                    client.kc = None
+                await kernel_pool.async_release(km)
+        timing = client.timing
+        if timing is not None:
+            # include the time waiting for a pooled kernel
+            if timing["kernel_start"] is not None:
+                timing["kernel_start"] += acquire_time
+            timing["total"] += acquire_time
+
+    if cache_key is not None and exec_error is None:
+        exec_cache.set(
+            cache_key,
+            new_notebook,
+            (
+                {
+                    COVERAGE_KEY: dump_coverage_file(resources[COVERAGE_KEY]),
+                    COVERAGE_CORE_KEY: resources.get(COVERAGE_CORE_KEY, None),
+                }
+                if COVERAGE_KEY in resources
+                else {}
+            ),
+        )
+
+    return ExecuteResult(
+        exec_error,
+        new_notebook,
+        resources,
+        timing=timing,
+        resource_usage=client.resource_usage,
+    )
+
 
-    return ExecuteResult(exec_error, new_notebook, resources)
+execute_notebook = run_sync(async_execute_notebook)
@@ -0,0 +1,335 @@
+"""Launch kernels by forking a template process, with pre-imported modules."""
+
+import asyncio
+import atexit
+from collections.abc import Mapping, Sequence
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+from textwrap import dedent
+import threading
+import time
+import uuid
+
+from jupyter_client.manager import AsyncKernelManager
+from jupyter_client.provisioning import LocalProvisioner
+from nbclient.util import run_sync
+import traitlets
+
+logger = logging.getLogger(__name__)
+
+HELP_PRELOAD = (
+    "Modules to import once, in a template kernel process, "
+    "from which the kernel of each notebook is forked (Linux and ipykernel only)."
+)
+
+# the module arguments of kernel commands, that can be forked from a template
+IPYKERNEL_MODULES = ("ipykernel_launcher", "ipykernel")
+
+FORKSERVER_SOURCE = dedent(
+    """\
+    import importlib
+    import json
+    import os
+    import signal
+    import sys
+    import traceback
+
+    # reply on a duplicate of stdout, and redirect stdout to stderr,
+    # so that output from imported modules (and kernels) cannot corrupt replies
+    replies = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    # interrupts are handled by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # automatically reap exited kernel processes
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+
+    def reply(**data):
+        replies.write(json.dumps(data) + "\\n")
+        replies.flush()
+
+
+    try:
+        importlib.import_module("ipykernel.kernelapp")
+        for name in sys.argv[1:]:
+            importlib.import_module(name)
+    except BaseException:
+        reply(error=traceback.format_exc())
+        sys.exit(1)
+    reply(pid=os.getpid())
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        pid = os.fork()
+        if pid:
+            reply(pid=pid)
+            continue
+        try:
+            # mirror the set up of a kernel process by jupyter_client.launch_kernel
+            os.setsid()
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            replies.close()
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            sys.stdin = open(os.devnull)
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            sys.argv = [sys.executable, *request["argv"]]
+            # the working directory is added back by the kernel
+            if sys.path and sys.path[0] == "":
+                del sys.path[0]
+            from ipykernel import kernelapp
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        kernelapp.launch_new_instance(argv=request["argv"])
+        sys.exit(0)
+    """
+)
+
+
+class ForkServerError(Exception):
+    """Exception for errors involving the fork server."""
+
+
+def can_fork(cmd: Sequence[str]) -> bool:
+    """Return whether a kernel launch command can be forked from a template."""
+    return (
+        sys.platform.startswith("linux")
+        and len(cmd) >= 3
+        and cmd[1] == "-m"
+        and cmd[2] in IPYKERNEL_MODULES
+    )
+
+
+class ForkServer:
+    """A template Python process, with pre-imported modules,
+    from which ipykernel kernel processes are forked.
+
+    The server communicates via JSON lines over its stdin/stdout,
+    and exits once its stdin is closed (e.g. when the parent process exits).
+    Forked kernels are started in a new session,
+    and exit if the server exits.
+    """
+
+    def __init__(
+        self,
+        python: str,
+        modules: Sequence[str] = (),
+        env: Mapping[str, str] | None = None,
+    ):
+        """Initialise the server (it is started on first use).
+
+        :param python: The Python executable to run the server with.
+        :param modules: The modules to import in the server.
+        :param env: The environment of the server.
+        """
+        self.python = python
+        self.modules = tuple(modules)
+        self.env = None if env is None else dict(env)
+        self.pid = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"ForkServer(python={self.python!r}, modules={self.modules!r})"
+
+    def _request(self, data: dict | None = None) -> dict:
+        if data is not None:
+            self._process.stdin.write(json.dumps(data) + "\n")
+            self._process.stdin.flush()
+        line = self._process.stdout.readline()
+        if not line:
+            self._process.wait()
+            self._process = None
+            raise ForkServerError("The fork server exited unexpectedly")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ForkServerError(
+                f"The fork server failed to import modules:\n{reply['error']}"
+            )
+        return reply
+
+    def _start(self) -> None:
+        logger.debug(f"Starting fork server, pre-importing: {self.modules}")
+        self._process = subprocess.Popen(
+            [self.python, "-c", FORKSERVER_SOURCE, *self.modules],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=self.env,
+            text=True,
+        )
+        try:
+            self.pid = self._request()["pid"]
+        except ForkServerError:
+            if self._process is not None:
+                self._process.wait()
+                self._process = None
+            raise
+
+    def launch(self, argv: Sequence[str], cwd: str, env: Mapping[str, str]) -> int:
+        """Fork a kernel process, and return its process ID.
+
+        :param argv: The arguments for ``ipykernel.kernelapp``.
+        :param cwd: The working directory of the kernel.
+        :param env: The environment of the kernel.
+        """
+        with self._lock:
+            if self._process is None:
+                self._start()
+            return self._request(
+                {
+                    # exit if the fork server exits
+                    "argv": [*argv, f"--IPKernelApp.parent_handle={self.pid}"],
+                    "cwd": cwd,
+                    "env": dict(env),
+                }
+            )["pid"]
+
+    def shutdown(self) -> None:
+        """Stop the server (kernels forked from it are not affected)."""
+        with self._lock:
+            if self._process is None:
+                return
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+
+_SERVERS: dict[tuple, ForkServer] = {}
+_SERVERS_LOCK = threading.Lock()
+
+
+def get_forkserver(
+    python: str, modules: Sequence[str], env: Mapping[str, str] | None = None
+) -> ForkServer:
+    """Return the (shared) fork server, for an executable, modules and environment."""
+    key = (
+        python,
+        tuple(modules),
+        None if env is None else tuple(sorted(env.items())),
+    )
+    with _SERVERS_LOCK:
+        if key not in _SERVERS:
+            _SERVERS[key] = ForkServer(python, modules, env)
+        return _SERVERS[key]
+
+
+@atexit.register
+def shutdown_forkservers() -> None:
+    """Stop all fork servers."""
+    with _SERVERS_LOCK:
+        servers = list(_SERVERS.values())
+        _SERVERS.clear()
+    for server in servers:
+        server.shutdown()
+
+
+class ForkedProcess:
+    """A ``subprocess.Popen`` like interface to a kernel process,
+    forked by a fork server (and so not a child of this process).
+
+    Since the exit status is not available, it is always reported as 0.
+    """
+
+    stdin = stdout = stderr = None
+
+    def __init__(self, pid: int):
+        """Initialise the process."""
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self) -> int | None:
+        """Return the exit status, or None if the process is running."""
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                self.returncode = 0
+            except PermissionError:
+                pass
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        """Wait for the process to exit."""
+        start = time.monotonic()
+        while self.poll() is None:
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise subprocess.TimeoutExpired(str(self.pid), timeout)
+            time.sleep(0.01)
+        return self.returncode
+
+    def send_signal(self, signum: int) -> None:
+        """Send a signal to the process."""
+        if self.poll() is None:
+            os.kill(self.pid, signum)
+
+    def terminate(self) -> None:
+        """Terminate the process."""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        """Kill the process."""
+        self.send_signal(signal.SIGKILL)
+
+
+class ForkServerProvisioner(LocalProvisioner):
+    """A kernel provisioner, which forks ipykernel kernels from a fork server,
+    with the kernel manager's ``preload_modules`` pre-imported.
+
+    Other kernels are launched as normal (as are all kernels on non-Linux platforms).
+    """
+
+    async def launch_kernel(self, cmd: list[str], **kwargs):
+        """Launch a kernel with a command."""
+        if not can_fork(cmd):
+            logger.debug(f"Kernel cannot be forked, launching normally: {cmd}")
+            return await super().launch_kernel(cmd, **kwargs)
+        env = dict(kwargs.get("env") or os.environ)
+        cwd = str(kwargs.get("cwd") or os.getcwd())
+        server = get_forkserver(cmd[0], self.parent.preload_modules, env)
+        # the first launch waits for the modules to be imported
+        pid = await asyncio.to_thread(server.launch, cmd[3:], cwd, env)
+        self.process = ForkedProcess(pid)
+        # the kernel is the leader of its own session
+        self.pid = self.pgid = pid
+        self.cwd = cwd
+        return self.connection_info
+
+
+class ForkServerKernelManager(AsyncKernelManager):
+    """A kernel manager, which forks ipykernel kernels from a template process,
+    so that ``preload_modules`` are only imported once.
+
+    Kernel specs that configure their own provisioner are launched as normal.
+    Note, modules that start threads on import may not be safe to fork.
+    """
+
+    preload_modules = traitlets.List(
+        traitlets.Unicode(), default_value=[], help=HELP_PRELOAD
+    ).tag(config=True)
+
+    async def _async_pre_start_kernel(self, **kw):
+        if self.provisioner is None and not self.kernel_spec.metadata.get(
+            "kernel_provisioner"
+        ):
+            self.kernel_id = self.kernel_id or kw.pop("kernel_id", str(uuid.uuid4()))
+            self.provisioner = ForkServerProvisioner(
+                kernel_id=self.kernel_id, kernel_spec=self.kernel_spec, parent=self
+            )
+        return await super()._async_pre_start_kernel(**kw)
+
+    pre_start_kernel = run_sync(_async_pre_start_kernel)
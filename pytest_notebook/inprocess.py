@@ -0,0 +1,167 @@
+"""Execute notebooks with an in-process (ipykernel) kernel."""
+
+import asyncio
+import atexit
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, contextmanager, suppress
+import copy
+import logging
+import os
+import threading
+
+from ipykernel.inprocess.blocking import BlockingInProcessKernelClient
+from ipykernel.inprocess.ipkernel import InProcessInteractiveShell, InProcessKernel
+from ipykernel.inprocess.manager import InProcessKernelManager
+import traitlets
+
+logger = logging.getLogger(__name__)
+
+# the in-process shell is a singleton, and the kernel changes the working directory
+# and environment of the process, so only one kernel can run at a time,
+# across all threads (and their event loops)
+_LOCK = threading.Lock()
+
+
+@asynccontextmanager
+async def inprocess_lock() -> AsyncIterator[None]:
+    """Hold the (process-wide) lock, while executing a notebook in-process.
+
+    The lock is acquired in a worker thread, so that other tasks of the running
+    event loop can continue while waiting for it.
+    """
+    acquired = asyncio.get_running_loop().run_in_executor(None, _LOCK.acquire)
+    try:
+        await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        # release the lock as soon as it is acquired
+        acquired.add_done_callback(lambda _: _LOCK.release())
+        raise
+    try:
+        yield
+    finally:
+        _LOCK.release()
+
+
+@contextmanager
+def _kernel_context(cwd: str | None, env: dict | None):
+    """Temporarily set the working directory and environment of the process."""
+    old_cwd = os.getcwd()
+    old_env = None
+    if env is not None:
+        old_env = dict(os.environ)
+        os.environ.clear()
+        os.environ.update(env)
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        yield
+    finally:
+        os.chdir(old_cwd)
+        if old_env is not None:
+            os.environ.clear()
+            os.environ.update(old_env)
+
+
+def _cancel_event_pipe_gc(iopub_thread) -> None:
+    """Cancel the periodic task of a running IOPub thread, before it is stopped
+    (otherwise it is left pending, and warned about when garbage collected).
+    """
+    task = getattr(iopub_thread, "_event_pipe_gc_task", None)
+    if task is None or not iopub_thread.thread.is_alive():
+        return
+
+    async def _cancel():
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    future = asyncio.run_coroutine_threadsafe(
+        _cancel(), iopub_thread.io_loop.asyncio_loop
+    )
+    try:
+        future.result(timeout=5)
+    except Exception as err:
+        logger.debug(f"Failed to cancel IOPub event pipe gc: {err}")
+
+
+class _InProcessKernel(InProcessKernel):
+    async def execute_request(self, stream, ident, parent):
+        # the parent is only set on the process streams, not the redirected streams
+        self.stdout.set_parent(parent)
+        self.stderr.set_parent(parent)
+        try:
+            await super().execute_request(stream, ident, parent)
+        finally:
+            # send buffered output before the kernel reports it is idle
+            self.stdout.flush()
+            self.stderr.flush()
+
+
+class InProcessClient(BlockingInProcessKernelClient):
+    """A kernel client for an in-process kernel, compatible with ``nbclient``.
+
+    Each request is handled synchronously,
+    in the working directory and environment of the kernel.
+    """
+
+    def wait_for_ready(self, timeout=None):
+        """Wait for the kernel to be ready.
+
+        Requests are handled synchronously, so this only needs to get the kernel info
+        (and does not poll the channels, like the base implementation).
+        """
+        self.kernel_info()
+        self._handle_kernel_info_reply(self.shell_channel.get_msg(block=False))
+        while self.iopub_channel.msg_ready():
+            self.iopub_channel.get_msg(block=False)
+
+    def _dispatch_to_kernel(self, msg):
+        with _kernel_context(self.parent.kernel_cwd, self.parent.kernel_env):
+            return super()._dispatch_to_kernel(msg)
+
+
+class InProcessManager(InProcessKernelManager):
+    """A kernel manager for an in-process kernel, compatible with ``nbclient``.
+
+    Each kernel starts with a new shell (and so namespace),
+    and its code runs in the working directory and environment
+    passed to ``start_kernel``.
+    Note, these are set for the whole process while each request is handled,
+    so (as for the shell) only one kernel should run at a time,
+    with :func:`inprocess_lock` held.
+    The kernel cannot be interrupted, so cell timeouts are not enforced.
+    """
+
+    client_class = traitlets.DottedObjectName(
+        "pytest_notebook.inprocess.InProcessClient"
+    )
+    kernel_cwd = traitlets.Unicode(None, allow_none=True)
+    kernel_env = traitlets.Dict(None, allow_none=True)
+
+    def start_kernel(self, cwd=None, env=None, **kwargs):
+        """Start the kernel."""
+        self.kernel_cwd = None if cwd is None else str(cwd)
+        self.kernel_env = None if env is None else dict(env)
+        config = copy.deepcopy(self.config)
+        # do not write to the user's IPython history
+        config.HistoryManager.hist_file = ":memory:"
+        # ensure a new shell, with a clean namespace
+        InProcessInteractiveShell.clear_instance()
+        self.kernel = _InProcessKernel(parent=self, session=self.session, config=config)
+
+    def shutdown_kernel(self, now=False, restart=False):
+        """Shutdown the kernel."""
+        if self.kernel is not None:
+            _cancel_event_pipe_gc(self.kernel.iopub_thread)
+            shell = self.kernel.shell
+            if shell is not None:
+                # run the shell's exit operations now, in this thread,
+                # rather than keeping the shell until the process exits
+                # (its history database cannot be used from another thread)
+                atexit.unregister(shell.atexit_operations)
+                shell.atexit_operations()
+        super().shutdown_kernel()
+        InProcessInteractiveShell.clear_instance()
+
+    def cleanup_resources(self, restart=False):
+        """Clean up resources (there are none for an in-process kernel)."""
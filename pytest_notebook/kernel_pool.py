@@ -0,0 +1,236 @@
+"""A pool of warm kernels, shared across notebook executions."""
+
+import asyncio
+from collections.abc import Mapping, Sequence
+from concurrent.futures import Future
+import logging
+import tempfile
+import threading
+
+from jupyter_client.manager import AsyncKernelManager
+from nbclient.util import ensure_async, run_sync
+
+from pytest_notebook.forkserver import ForkServerKernelManager
+
+logger = logging.getLogger(__name__)
+
+HELP_KERNEL_POOL = (
+    "Re-use kernels across notebooks, keeping a pool of pre-started kernels "
+    "(per kernel name, working directory, environment and preloaded modules), "
+    "which are restarted after each notebook."
+)
+
+
+def pool_key(
+    kernel_name: str,
+    cwd: str | None,
+    env: Mapping | None,
+    preload_modules: Sequence[str] | None = None,
+) -> tuple:
+    """Return the key under which equivalent kernels are pooled."""
+    return (
+        kernel_name or "",
+        cwd,
+        None if env is None else tuple(sorted(env.items())),
+        tuple(preload_modules or ()),
+    )
+
+
+class KernelPool:
+    """A pool of pre-started kernels, shared across notebook executions.
+
+    Kernels are keyed by their kernel name, working directory, environment
+    and preloaded modules, since these are fixed when the kernel process is launched.
+    When a kernel is released, after executing a notebook,
+    it is returned to the pool, and restarted in the background
+    (i.e. a fresh kernel process is launched),
+    on an event loop run by the pool in a separate thread,
+    whilst the previous notebook is being post-processed and diffed,
+    so that it is ready for the next notebook with the same key
+    (which waits for any pending restart, when acquiring the kernel).
+
+    At most ``max_idle`` kernels are kept idle in the pool,
+    with the least recently used ones being shut down first.
+    Kernels acquired without a working directory share a temporary directory,
+    created by the pool.
+
+    The pool should be shut down, once it is no longer required,
+    either by calling ``shutdown`` or by using it as a context manager.
+    """
+
+    def __init__(
+        self, max_idle: int = 4, kernel_manager_class: type = AsyncKernelManager
+    ):
+        """Initialise the pool.
+
+        :param max_idle: The maximum number of idle kernels to keep in the pool.
+        :param kernel_manager_class: The (asynchronous) kernel manager class to use.
+        """
+        if max_idle < 0:
+            raise ValueError("max_idle must be 0 or larger")
+        self.max_idle = max_idle
+        self.kernel_manager_class = kernel_manager_class
+        # (key, kernel manager, restart future) triples, least recently released first
+        self._idle: list[tuple] = []
+        self._keys: dict = {}
+        self._lock = threading.Lock()
+        self._tempdir = None
+        self._loop = None
+        self._thread = None
+
+    def __repr__(self):
+        """Represent the class instance."""
+        with self._lock:
+            return f"KernelPool(kernels={len(self._keys)}, idle={len(self._idle)})"
+
+    def __enter__(self):
+        """Enter the context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Exit the context manager, shutting down all kernels."""
+        self.shutdown()
+
+    def _run_in_background(self, coro) -> Future:
+        """Run a coroutine on the pool's event loop (started on first use)."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="pytest_notebook_kernel_pool",
+                    daemon=True,
+                )
+                self._thread.start()
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _async_start(self, key: tuple):
+        """Create a kernel manager and launch its kernel."""
+        kernel_name, cwd, env, preload_modules = key
+        if cwd is None:
+            with self._lock:
+                if self._tempdir is None:
+                    self._tempdir = tempfile.TemporaryDirectory()
+                cwd = self._tempdir.name
+        km_kwargs = {"kernel_name": kernel_name} if kernel_name else {}
+        if preload_modules:
+            km = ForkServerKernelManager(
+                preload_modules=list(preload_modules), **km_kwargs
+            )
+        else:
+            km = self.kernel_manager_class(**km_kwargs)
+        kwargs = {"cwd": cwd}
+        if env is not None:
+            kwargs["env"] = dict(env)
+        extra_arguments = []
+        if getattr(km, "ipykernel", False):
+            # mirror the default of NotebookClient.ipython_hist_file
+            extra_arguments.append("--HistoryManager.hist_file=:memory:")
+        logger.debug(f"Starting pooled kernel: {kernel_name}")
+        await ensure_async(km.start_kernel(extra_arguments=extra_arguments, **kwargs))
+        with self._lock:
+            self._keys[km] = key
+        return km
+
+    async def async_acquire(
+        self,
+        kernel_name: str,
+        cwd: str | None = None,
+        env: Mapping | None = None,
+        preload_modules: Sequence[str] | None = None,
+    ):
+        """Retrieve a started kernel manager from the pool.
+
+        A new kernel is started, if no idle kernel is available for the key.
+
+        :param preload_modules: Fork new kernels from a template process,
+            in which these modules are already imported.
+        """
+        key = pool_key(kernel_name, cwd, env, preload_modules)
+        while True:
+            km = restart = None
+            with self._lock:
+                for index in reversed(range(len(self._idle))):
+                    if self._idle[index][0] == key:
+                        _, km, restart = self._idle.pop(index)
+                        break
+            if km is None:
+                return await self._async_start(key)
+            # the kernel may still be restarting
+            if await asyncio.wrap_future(restart) and await ensure_async(km.is_alive()):
+                logger.debug(f"Re-using pooled kernel: {kernel_name}")
+                return km
+            # the kernel failed to restart, or died whilst idle, so discard it
+            await self._async_discard(km)
+
+    acquire = run_sync(async_acquire)
+
+    async def async_release(self, km, reuse: bool = True) -> None:
+        """Return a kernel manager to the pool, after use.
+
+        :param reuse: If True, return the kernel to the pool
+            (restarting it in the background), otherwise shut it down.
+        """
+        with self._lock:
+            key = self._keys.get(km, None)
+        if key is None:
+            raise ValueError("The kernel manager was not acquired from this pool")
+        if not reuse or self.max_idle == 0:
+            await self._async_discard(km)
+            return
+        restart = self._run_in_background(self._async_restart(km))
+        with self._lock:
+            self._idle.append((key, km, restart))
+            evicted = self._idle[: -self.max_idle]
+            self._idle = self._idle[-self.max_idle :]
+        for _, idle_km, idle_restart in evicted:
+            await asyncio.wrap_future(idle_restart)
+            await self._async_discard(idle_km)
+
+    release = run_sync(async_release)
+
+    @staticmethod
+    async def _async_restart(km) -> bool:
+        """Restart a kernel, returning whether it succeeded."""
+        try:
+            await ensure_async(km.restart_kernel(now=True))
+        except Exception as err:
+            logger.warning(f"Failed to restart pooled kernel: {err}")
+            return False
+        return True
+
+    async def _async_discard(self, km) -> None:
+        """Shutdown a kernel and remove it from the pool."""
+        with self._lock:
+            self._keys.pop(km, None)
+        try:
+            if await ensure_async(km.is_alive()):
+                await ensure_async(km.shutdown_kernel(now=True))
+        except RuntimeError as err:
+            if "No kernel is running!" not in str(err):
+                raise
+        finally:
+            await ensure_async(km.cleanup_resources())
+
+    async def async_shutdown(self) -> None:
+        """Shutdown all kernels in the pool."""
+        with self._lock:
+            kms = list(self._keys)
+            restarts = [restart for _, _, restart in self._idle]
+            self._idle = []
+        for restart in restarts:
+            await asyncio.wrap_future(restart)
+        for km in kms:
+            await self._async_discard(km)
+        with self._lock:
+            if self._tempdir is not None:
+                self._tempdir.cleanup()
+                self._tempdir = None
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    shutdown = run_sync(async_shutdown)
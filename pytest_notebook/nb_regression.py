@@ -1,5 +1,6 @@
 """Jupyter Notebook Regression Test Class."""
 
+from collections.abc import Callable
 import copy
 import logging
 import os
@@ -7,7 +8,7 @@ import sys
 from typing import Any, TextIO
 
 import attr
-from attr.validators import instance_of
+from attr.validators import instance_of, is_callable, optional
 from nbdime.diff_format import DiffEntry
 import nbformat
 from nbformat import NotebookNode
@@ -18,26 +19,62 @@ try:
 except ImportError:
     CoverageType = Any
 
-from pytest_notebook.diffing import diff_notebooks, diff_to_string, filter_diff
+from pytest_notebook.cache import CellCache, ExecutionCache
+from pytest_notebook.coverage_merge import (
+    HELP_COVERAGE_MERGER,
+    CoverageMerger,
+)
+from pytest_notebook.diffing import (
+    DIFF_RENDERERS,
+    cell_path,
+    diff_notebooks,
+    diff_to_string,
+    filter_diff,
+    offset_cell_diff,
+    project_notebooks,
+)
 from pytest_notebook.execution import (
+    COVERAGE_CORES,
+    COVERAGE_KEY,
+    EXEC_MODES,
     HELP_COVERAGE,
     HELP_COVERAGE_CONFIG,
+    HELP_COVERAGE_CORE,
+    HELP_COVERAGE_DATA_DIR,
     HELP_COVERAGE_SOURCE,
     HELP_EXEC_ENV,
+    HELP_EXEC_MODE,
+    HELP_EXEC_TIMING,
+    ExecuteResult,
+    ExecutionStoppedError,
+    async_execute_notebook,
     execute_notebook,
 )
+from pytest_notebook.forkserver import HELP_PRELOAD
+from pytest_notebook.kernel_pool import KernelPool
 from pytest_notebook.normalizers import ENTRY_POINT_NAME as NORMALIZE_ENTRY_POINT_NAME
 from pytest_notebook.normalizers import list_normalizer_names, load_normalizer
 from pytest_notebook.notebook import (
+    MetadataConfig,
+    ResourceBudget,
     load_notebook_with_config,
     regex_replace_nb,
     validate_regex_replace,
 )
+from pytest_notebook.output_limits import (
+    HELP_MAX_NB_OUTPUT_BYTES,
+    HELP_MAX_OUTPUT_BYTES,
+    HELP_OUTPUT_OVERFLOW,
+    OVERFLOW_MODES,
+    OutputLimiter,
+)
+from pytest_notebook.pipeline import HELP_DIFF_PIPELINE, CellPipeline
 from pytest_notebook.post_processors import (
     ENTRY_POINT_NAME,
     list_processor_names,
     load_processor,
 )
+from pytest_notebook.resource_usage import HELP_EXEC_RESOURCES
 from pytest_notebook.utils import autodoc
 
 logger = logging.getLogger(__name__)
@@ -63,6 +100,15 @@ HELP_DIFF_IGNORE = (
 )
 HELP_DIFF_USE_COLOR = "Use ANSI color code escapes for text output."
 HELP_DIFF_COLOR_WORDS = "Highlight changed words using only colors."
+HELP_DIFF_RENDERER = (
+    "How to render diffs of multi-line text outputs: "
+    "with git/diff subprocesses (external) or in-process (inprocess)."
+)
+HELP_DIFF_FAIL_FAST = (
+    "Compare the outputs of each cell as soon as it is executed, "
+    "stopping execution at the first (unignored) difference, "
+    "and reporting the diff up to that cell (not applied if force_regen is set)."
+)
 HELP_FORCE_REGEN = (
     "Re-generate notebook files, if no unexpected execution errors, "
     "and an output path has been supplied."
@@ -77,6 +123,26 @@ HELP_DIFF_NORMALIZE = (
     "relating to entry points in the 'nbreg.diff_normalize' group"
 )
 HELP_COVERAGE_MERGE = "A coverage.Coverage instance, to merge coverage results with."
+HELP_EXEC_CACHE = (
+    "An ExecutionCache instance, to retrieve execution results from, "
+    "for unchanged notebooks (rather than executing them)."
+)
+HELP_EXEC_CELL_CACHE = (
+    "A CellCache instance, to replay the outputs of cells marked as cacheable from "
+    "(rather than executing them), if their source and inputs are unchanged."
+)
+HELP_EXEC_KERNEL_POOL = (
+    "A KernelPool instance, to acquire pre-started kernels from "
+    "(rather than starting a new kernel per notebook)."
+)
+HELP_EXEC_SPILL_DIR = (
+    "The directory to spill oversized outputs to "
+    "(default is a temporary directory, removed when the process exits)."
+)
+HELP_EXEC_CALLBACK = (
+    "A callable, called with the notebook path and its ExecuteResult, "
+    "after each execution (before any errors are raised)."
+)
 
 DEFAULT_DIFF_IGNORE = ("/cells/*/outputs/*/traceback",)
 
@@ -99,7 +165,12 @@ class NBRegressionResult:
     )
 
     diff_full: list[DiffEntry] = attr.ib(
-        metadata={"help": "Full diff of initial/final notebooks."}
+        metadata={
+            "help": (
+                "Full diff of initial/final notebooks "
+                "(excluding ignored values present in both)."
+            )
+        }
     )
     diff_filtered: list[DiffEntry] = attr.ib(
         metadata={
@@ -109,9 +180,16 @@ class NBRegressionResult:
             )
         }
     )
-    diff_string: str = attr.ib(
-        validator=instance_of(str),
-        metadata={"help": "The formatte string of diff_filtered."},
+    _diff_string: str | None = attr.ib(
+        None,
+        validator=instance_of((type(None), str)),
+        eq=False,
+        metadata={
+            "help": (
+                "The formatted string of diff_filtered "
+                "(if None, rendered when ``diff_string`` is first accessed)."
+            )
+        },
     )
 
     process_resources: dict = attr.ib(
@@ -119,6 +197,51 @@ class NBRegressionResult:
         instance_of(dict),
         metadata={"help": "Resources returned from notebook processors."},
     )
+    exec_results: ExecuteResult | None = attr.ib(
+        None,
+        validator=instance_of((type(None), ExecuteResult)),
+        metadata={"help": "The result of executing the notebook, if executed."},
+    )
+    regenerated: bool = attr.ib(
+        False,
+        validator=instance_of(bool),
+        metadata={"help": "Whether the notebook file was re-generated."},
+    )
+    budget_violations: list[str] = attr.ib(
+        attr.Factory(list),
+        validator=instance_of(list),
+        metadata={"help": "The resource budgets exceeded by the execution."},
+    )
+    diff_initial: NotebookNode | None = attr.ib(
+        None,
+        validator=instance_of((type(None), NotebookNode)),
+        metadata={
+            "help": (
+                "The (normalized) initial notebook that diff_filtered applies to, "
+                "to render diff_string from (defaults to nb_initial)."
+            )
+        },
+    )
+    diff_options: dict = attr.ib(
+        attr.Factory(dict),
+        validator=instance_of(dict),
+        metadata={"help": "Keyword arguments of diff_to_string, to render with."},
+    )
+
+    @property
+    def diff_string(self) -> str:
+        """Return the formatted string of diff_filtered (rendered once, on access)."""
+        if self._diff_string is None:
+            notebook = (
+                self.nb_initial if self.diff_initial is None else self.diff_initial
+            )
+            # the result is frozen, but the rendered string is cached
+            object.__setattr__(
+                self,
+                "_diff_string",
+                diff_to_string(notebook, self.diff_filtered, **self.diff_options),
+            )
+        return self._diff_string
 
     def __repr__(self):
         """Represent the class instance."""
@@ -175,6 +298,47 @@ class NBRegressionFixture:
             if not isinstance(key, str):
                 raise TypeError(f"exec_env key '{key}' must be a string")
 
+    exec_mode: str | None = attr.ib(None, metadata={"help": HELP_EXEC_MODE})
+
+    @exec_mode.validator
+    def _validate_exec_mode(self, attribute, value):
+        if value is not None and value not in EXEC_MODES:
+            raise ValueError(f"exec_mode must be one of {EXEC_MODES}: {value}")
+
+    exec_preload: tuple = attr.ib(
+        (), instance_of(tuple), metadata={"help": HELP_PRELOAD}
+    )
+    exec_timing: bool = attr.ib(
+        False, instance_of(bool), metadata={"help": HELP_EXEC_TIMING}
+    )
+    exec_resources: bool = attr.ib(
+        False, instance_of(bool), metadata={"help": HELP_EXEC_RESOURCES}
+    )
+    exec_max_output_bytes: int | None = attr.ib(
+        None, instance_of((type(None), int)), metadata={"help": HELP_MAX_OUTPUT_BYTES}
+    )
+    exec_max_nb_output_bytes: int | None = attr.ib(
+        None,
+        instance_of((type(None), int)),
+        metadata={"help": HELP_MAX_NB_OUTPUT_BYTES},
+    )
+    exec_output_overflow: str = attr.ib(
+        "truncate", metadata={"help": HELP_OUTPUT_OVERFLOW}
+    )
+
+    @exec_output_overflow.validator
+    def _validate_exec_output_overflow(self, attribute, value):
+        if value not in OVERFLOW_MODES:
+            raise ValueError(
+                f"exec_output_overflow must be one of {OVERFLOW_MODES}: {value}"
+            )
+
+    exec_spill_dir: str | None = attr.ib(
+        None,
+        instance_of((type(None), str)),
+        metadata={"help": HELP_EXEC_SPILL_DIR},
+    )
+
     coverage: bool = attr.ib(False, metadata={"help": HELP_COVERAGE})
 
     @coverage.validator
@@ -194,6 +358,19 @@ class NBRegressionFixture:
         None, instance_of((type(None), tuple)), metadata={"help": HELP_COVERAGE_SOURCE}
     )
 
+    cov_core: str | None = attr.ib(None, metadata={"help": HELP_COVERAGE_CORE})
+
+    @cov_core.validator
+    def _validate_cov_core(self, attribute, value):
+        if value is not None and value not in COVERAGE_CORES:
+            raise ValueError(f"cov_core must be one of {COVERAGE_CORES}: {value}")
+
+    cov_data_dir: str | None = attr.ib(
+        None,
+        instance_of((type(None), str)),
+        metadata={"help": HELP_COVERAGE_DATA_DIR},
+    )
+
     cov_merge: CoverageType | None = attr.ib(
         None, metadata={"help": HELP_COVERAGE_MERGE}, hash=True
     )
@@ -209,6 +386,35 @@ class NBRegressionFixture:
         if not isinstance(value, Coverage):
             raise TypeError("cov_merge must be an instance of coverage.Coverage")
 
+    cov_merger: CoverageMerger | None = attr.ib(
+        None,
+        instance_of((type(None), CoverageMerger)),
+        metadata={"help": HELP_COVERAGE_MERGER},
+    )
+
+    kernel_pool: KernelPool | None = attr.ib(
+        None,
+        instance_of((type(None), KernelPool)),
+        metadata={"help": HELP_EXEC_KERNEL_POOL},
+    )
+
+    exec_cache: ExecutionCache | None = attr.ib(
+        None,
+        instance_of((type(None), ExecutionCache)),
+        metadata={"help": HELP_EXEC_CACHE},
+    )
+    cell_cache: CellCache | None = attr.ib(
+        None,
+        instance_of((type(None), CellCache)),
+        metadata={"help": HELP_EXEC_CELL_CACHE},
+    )
+
+    exec_callback: Callable[[str, ExecuteResult], Any] | None = attr.ib(
+        None,
+        optional(is_callable()),
+        metadata={"help": HELP_EXEC_CALLBACK},
+    )
+
     post_processors: tuple = attr.ib(
         ("coalesce_streams",), metadata={"help": HELP_POST_PROCS}
     )
@@ -275,6 +481,19 @@ class NBRegressionFixture:
     diff_color_words: bool = attr.ib(
         False, instance_of(bool), metadata={"help": HELP_DIFF_COLOR_WORDS}
     )
+    diff_renderer: str = attr.ib("external", metadata={"help": HELP_DIFF_RENDERER})
+
+    @diff_renderer.validator
+    def _validate_diff_renderer(self, attribute, value):
+        if value not in DIFF_RENDERERS:
+            raise ValueError(f"diff_renderer must be one of {DIFF_RENDERERS}: {value}")
+
+    diff_fail_fast: bool = attr.ib(
+        False, instance_of(bool), metadata={"help": HELP_DIFF_FAIL_FAST}
+    )
+    diff_pipeline: bool = attr.ib(
+        False, instance_of(bool), metadata={"help": HELP_DIFF_PIPELINE}
+    )
 
     force_regen: bool = attr.ib(
         False, instance_of(bool), metadata={"help": HELP_FORCE_REGEN}
@@ -288,147 +507,462 @@ class NBRegressionFixture:
 
         super().__setattr__(key, value)
 
+    def exec_kwargs(
+        self,
+        path: TextIO | str,
+        pipeline: CellPipeline | None = None,
+        nb_config: MetadataConfig | None = None,
+    ) -> dict:
+        """Return the keyword arguments for ``execute_notebook``, for a notebook path.
+
+        Note, ``resources`` is a copy of ``process_resources``.
+
+        :param pipeline: A pipeline (from ``create_pipeline``),
+            to submit each cell to, as soon as it is executed.
+        :param nb_config: The notebook's configuration,
+            from which the cells to cache, and the resource budgets, are read
+            (timing and resource usage are recorded, as required by the budgets).
+        """
+        exec_cwd = self.exec_cwd or os.path.dirname(_get_abspath(path))
+        budgets = [] if nb_config is None else _budgets(nb_config)
+        return {
+            "resources": copy.deepcopy(self.process_resources),
+            "cwd": exec_cwd,
+            "timeout": self.exec_timeout,
+            "allow_errors": self.exec_allow_errors,
+            "exec_env": self.exec_env,
+            "with_coverage": self.coverage,
+            "cov_config_file": self.cov_config,
+            "cov_source": self.cov_source,
+            "cov_data_dir": self.cov_data_dir,
+            "cov_core": self.cov_core,
+            "kernel_pool": self.kernel_pool,
+            "exec_cache": self.exec_cache,
+            "exec_mode": self.exec_mode,
+            "preload_modules": list(self.exec_preload) or None,
+            "record_timing": self.exec_timing
+            or any(budget.max_seconds is not None for budget in budgets),
+            "record_resources": self.exec_resources
+            or any(budget.max_memory_mb is not None for budget in budgets),
+            "max_output_bytes": self.exec_max_output_bytes,
+            "max_nb_output_bytes": self.exec_max_nb_output_bytes,
+            "output_overflow": self.exec_output_overflow,
+            "spill_dir": self.exec_spill_dir,
+            "cell_callback": None if pipeline is None else pipeline.submit,
+            "cell_cache": self.cell_cache,
+            "cached_cells": None if nb_config is None else nb_config.cache_cells,
+        }
+
+    def create_pipeline(
+        self, nb_initial: NotebookNode, nb_config: MetadataConfig
+    ) -> CellPipeline | None:
+        """Create a pipeline, to compare each cell with the initial notebook,
+        as soon as it is executed (if ``diff_pipeline`` or ``diff_fail_fast`` is set).
+
+        The cell post-processing and diffing is the same as for the whole notebook,
+        except that normalizers and replacements are applied to each cell
+        (within a notebook containing only that cell), and post-processors
+        that are not ``cell_preprocessor`` functions are applied likewise.
+        """
+        if self.force_regen or not (self.diff_pipeline or self.diff_fail_fast):
+            return None
+        return CellPipeline(
+            self._limit_outputs(nb_initial),
+            self._post_process_cell,
+            lambda initial, final, index: self._diff(initial, final, nb_config, index),
+            resources=copy.deepcopy(self.process_resources),
+            fail_fast=self.diff_fail_fast,
+        )
+
     def check(
-        self, path: TextIO | str, raise_errors: bool = True
+        self,
+        path: TextIO | str,
+        raise_errors: bool = True,
+        exec_results: ExecuteResult | None = None,
+        pipeline: CellPipeline | None = None,
     ) -> NBRegressionResult:
         """Execute the Notebook and compare its initial vs. final contents.
 
         if ``force_regen`` is True, the new notebook will be written to ``path``
 
+        :param exec_results: The results of a prior execution of the notebook,
+            e.g. from ``async_execute_notebook`` with ``exec_kwargs``,
+            in which case the notebook is not executed again.
+        :param pipeline: The pipeline that ``exec_results`` was executed with
+            (from ``create_pipeline``).
+
         if ``raise_errors`` is True:
 
         :raise nbconvert.preprocessors.CellExecutionError: if error in execution
         :raise NBConfigValidationError: if the notebook metadata is invalid
         :raise NBRegressionError: if diffs present
+            (or execution was stopped at a difference, if ``diff_fail_fast`` is set)
 
         :rtype: NBRegressionResult
 
         """
         __tracebackhide__ = True
-        if hasattr(path, "name"):
-            abspath = os.path.abspath(path.name)
-        else:
-            abspath = os.path.abspath(str(path))
-        logger.debug(f"Checking file: {abspath}")
+        logger.debug(f"Checking file: {_get_abspath(path)}")
 
         nb_initial, nb_config = load_notebook_with_config(path)
 
-        resources = copy.deepcopy(self.process_resources)
-        exec_cwd = self.exec_cwd or os.path.dirname(abspath)
-
-        if self.exec_notebook:
+        if self.exec_notebook and exec_results is None:
             logger.debug("Executing notebook.")
+            pipeline = self.create_pipeline(nb_initial, nb_config)
             exec_results = execute_notebook(
-                nb_initial,
-                resources=resources,
-                cwd=exec_cwd,
-                timeout=self.exec_timeout,
-                allow_errors=self.exec_allow_errors,
-                exec_env=self.exec_env,
-                with_coverage=self.coverage,
-                cov_config_file=self.cov_config,
-                cov_source=self.cov_source,
+                nb_initial, **self.exec_kwargs(path, pipeline, nb_config)
+            )
+
+        return self._compare(
+            path, nb_initial, nb_config, exec_results, raise_errors, pipeline
+        )
+
+    async def async_check(
+        self,
+        path: TextIO | str,
+        raise_errors: bool = True,
+        exec_results: ExecuteResult | None = None,
+        pipeline: CellPipeline | None = None,
+    ) -> NBRegressionResult:
+        """Execute the Notebook and compare its initial vs. final contents.
+
+        This is the coroutine version of ``check``,
+        which executes the notebook with ``async_execute_notebook``,
+        so that multiple notebooks can be checked concurrently in the same event loop,
+        e.g. with ``asyncio.gather``
+        (note, post-processing and diffing still run synchronously,
+        unless ``diff_pipeline`` is set).
+
+        :rtype: NBRegressionResult
+
+        """
+        __tracebackhide__ = True
+        logger.debug(f"Checking file: {_get_abspath(path)}")
+
+        nb_initial, nb_config = load_notebook_with_config(path)
+
+        if self.exec_notebook and exec_results is None:
+            logger.debug("Executing notebook.")
+            pipeline = self.create_pipeline(nb_initial, nb_config)
+            exec_results = await async_execute_notebook(
+                nb_initial, **self.exec_kwargs(path, pipeline, nb_config)
             )
+
+        return self._compare(
+            path, nb_initial, nb_config, exec_results, raise_errors, pipeline
+        )
+
+    def _compare(
+        self,
+        path: TextIO | str,
+        nb_initial: NotebookNode,
+        nb_config: MetadataConfig,
+        exec_results: ExecuteResult | None,
+        raise_errors: bool,
+        pipeline: CellPipeline | None = None,
+    ) -> NBRegressionResult:
+        """Post-process the executed notebook, and compare it to the initial one."""
+        __tracebackhide__ = True
+        abspath = _get_abspath(path)
+
+        if self.exec_notebook:
+            self._record_execution(abspath, exec_results)
             exec_error = exec_results.exec_error
             nb_final = exec_results.notebook
             resources = exec_results.resources
         else:
             exec_error = None
             nb_final = nb_initial
+            resources = copy.deepcopy(self.process_resources)
+
+        if self.exec_notebook and pipeline is not None:
+            # cells have already been post-processed and diffed, during execution
+            nb_final, nb_initial_replace, full_diff = pipeline.finish(nb_final)
+            resources.update(pipeline.resources)
+            filtered_diff = self._filter_diff(full_diff, nb_config)
+        else:
+            nb_final, resources = self._post_process(nb_final, resources)
+
+            nb_initial_replace = nb_initial
+            if self.exec_notebook:
+                nb_initial_replace = self._limit_outputs(nb_initial_replace)
+
+            nb_initial_replace, full_diff, filtered_diff = self._diff(
+                nb_initial_replace, nb_final, nb_config
+            )
+
+        # TODO optionally write diff to file
+
+        regenerated = False
+        if filtered_diff and self.force_regen and not exec_error:
+            if hasattr(path, "close") and hasattr(path, "name"):
+                path.close()
+                with open(path.name, "w") as handle:
+                    nbformat.write(nb_final, handle)
+            else:
+                nbformat.write(nb_final, str(path))
+            regenerated = True
+
+        budget_violations = []
+        if self.exec_notebook and not exec_error:
+            budget_violations = _budget_violations(nb_config, exec_results)
+
+        result = NBRegressionResult(
+            nb_initial,
+            nb_final,
+            full_diff,
+            filtered_diff,
+            None,
+            resources,
+            exec_results=exec_results if self.exec_notebook else None,
+            regenerated=regenerated,
+            budget_violations=budget_violations,
+            diff_initial=nb_initial_replace,
+            diff_options={
+                "use_color": self.diff_use_color,
+                "color_words": self.diff_color_words,
+                "renderer": self.diff_renderer,
+            },
+        )
+        if raise_errors:
+            self._raise_errors(abspath, result)
+        return result
+
+    def check_result(
+        self, path: TextIO | str, result: NBRegressionResult, raise_errors: bool = True
+    ) -> NBRegressionResult:
+        """Complete a check, from a result computed elsewhere.
+
+        The result should be returned by ``check``, with ``raise_errors=False``,
+        from a fixture without an ``exec_callback`` or coverage merging
+        (e.g. in a worker process, see ``NotebookWorkerPool``).
+        The execution of the notebook is then passed to ``exec_callback``,
+        and its coverage merged, by this fixture,
+        and errors raised, as for ``check``.
+
+        :rtype: NBRegressionResult
+
+        """
+        __tracebackhide__ = True
+        abspath = _get_abspath(path)
+        if result.exec_results is not None:
+            self._record_execution(abspath, result.exec_results)
+        if raise_errors:
+            self._raise_errors(abspath, result)
+        return result
+
+    def _record_execution(self, abspath: str, exec_results: ExecuteResult) -> None:
+        """Pass the execution to ``exec_callback``, and merge its coverage."""
+        if self.exec_callback is not None:
+            self.exec_callback(abspath, exec_results)
 
         # TODO merge on fail option (using pytest-cov --no-cov-on-fail)
-        if self.exec_notebook and self.cov_merge and exec_results.has_coverage:
+        if self.cov_merger and exec_results.has_coverage:
+            # merged in bulk, at the end of the session
+            self.cov_merger.add(exec_results.resources[COVERAGE_KEY])
+        elif self.cov_merge and exec_results.has_coverage:
             logger.info("Merging coverage.")
-            aliases = _get_coverage_aliases(self.cov_merge)
-            self.cov_merge.get_data().update(
-                exec_results.coverage_data(debug=self.cov_merge._debug),
-                # note aliases was renamed map_path in coverage v7
-                map_path=aliases.map if aliases else None,
+            merger = CoverageMerger(self.cov_merge)
+            merger.add(exec_results.resources[COVERAGE_KEY])
+            merger.merge()
+
+    @staticmethod
+    def _raise_errors(abspath: str, result: NBRegressionResult) -> None:
+        """Raise any execution error, re-generation or differences of a check."""
+        __tracebackhide__ = True
+        exec_error = None
+        if result.exec_results is not None:
+            exec_error = result.exec_results.exec_error
+        if isinstance(exec_error, ExecutionStoppedError):
+            raise NBRegressionError(
+                f"Execution stopped after cell {exec_error.cell_index}, "
+                f"at the first difference:\n{result.diff_string}"
             )
-            # we also take this opportunity to remove ''
-            # from the unmatched source packages, which is caused by using `--cov=`
-            self.cov_merge._inorout.source_pkgs_unmatched = [
-                p for p in self.cov_merge._inorout.source_pkgs_unmatched if p
-            ]
+        elif exec_error:
+            print("Diff up to exception:\n" + result.diff_string, file=sys.stderr)
+            raise exec_error
+        elif result.regenerated:
+            print("Diff before regeneration:\n" + result.diff_string, file=sys.stderr)
+            raise NBRegressionError(
+                f"Files differ and --nb-force-regen set, "
+                f"regenerating file at:\n- {abspath}"
+            )
+        elif result.diff_filtered or result.budget_violations:
+            message = result.diff_string if result.diff_filtered else ""
+            if result.budget_violations:
+                message += "\nResource budgets exceeded:\n" + "\n".join(
+                    f"- {violation}" for violation in result.budget_violations
+                )
+            raise NBRegressionError(message.lstrip("\n"))
 
+    def _post_process(
+        self, notebook: NotebookNode, resources: dict
+    ) -> tuple[NotebookNode, dict]:
+        """Apply the post-processors to an executed notebook."""
         for proc_name in self.post_processors:
             logger.debug(f"Applying post processor: {proc_name}")
             post_proc = load_processor(proc_name)
-            nb_final, resources = post_proc(nb_final, resources)
-
-        nb_initial_replace = nb_initial
-        nb_final_replace = nb_final
+            if not hasattr(post_proc, "cell_function"):
+                # the executed notebook shares unchanged elements with the initial one,
+                # so is copied for processors that may modify it in-place
+                notebook = copy.deepcopy(notebook)
+            notebook, resources = post_proc(notebook, resources)
+        return notebook, resources
+
+    def _post_process_cell(
+        self, cell: NotebookNode, resources: dict, index: int
+    ) -> tuple[NotebookNode, dict]:
+        """Apply the post-processors to an executed cell."""
+        for proc_name in self.post_processors:
+            post_proc = load_processor(proc_name)
+            if hasattr(post_proc, "cell_function"):
+                cell, resources = post_proc.cell_function(cell, resources, index)
+                continue
+            notebook = nbformat.v4.new_notebook(
+                cells=[*([nbformat.v4.new_raw_cell()] * index), copy.deepcopy(cell)]
+            )
+            notebook, resources = post_proc(notebook, resources)
+            cell = notebook.cells[index]
+        return cell, resources
 
+    def _limit_outputs(self, notebook: NotebookNode) -> NotebookNode:
+        """Apply the execution output limits to an initial notebook,
+        so that its outputs are comparable with the limited final outputs.
+        """
+        if self.exec_max_output_bytes is None and self.exec_max_nb_output_bytes is None:
+            return notebook
+        return OutputLimiter(
+            self.exec_max_output_bytes,
+            self.exec_max_nb_output_bytes,
+            overflow=self.exec_output_overflow,
+            # the stored outputs are only compared, not spilled
+            markers_only=True,
+        ).apply(notebook)
+
+    def _diff(
+        self,
+        nb_initial: NotebookNode,
+        nb_final: NotebookNode,
+        nb_config: MetadataConfig,
+        cell_index: int | None = None,
+    ) -> tuple[NotebookNode, list[DiffEntry], list[DiffEntry]]:
+        """Normalize and diff two notebooks.
+
+        :param cell_index: If given, the notebooks contain only the cell at this index,
+            to which the replacement and ignore paths are re-based,
+            and the diff paths are offset (to those of the full notebooks).
+
+        :returns: (normalized initial notebook, full diff, filtered diff)
+        """
         diff_normalize = dict.fromkeys(
             tuple(self.diff_normalize) + tuple(nb_config.diff_normalize)
         )
         for norm_name in diff_normalize:
             logger.debug(f"Applying normalizer: {norm_name}")
             normalizer = load_normalizer(norm_name)
-            nb_initial_replace = normalizer(nb_initial_replace)
-            nb_final_replace = normalizer(nb_final_replace)
+            nb_initial = normalizer(nb_initial)
+            nb_final = normalizer(nb_final)
 
         regex_replace = list(self.diff_replace) + list(nb_config.diff_replace)
+        diff_ignore = self._diff_ignore(nb_config)
+        if cell_index is not None:
+            regex_replace = [
+                (cell_path(path, cell_index), regex, replace)
+                for path, regex, replace in regex_replace
+                if cell_path(path, cell_index) is not None
+            ]
+            diff_ignore = {
+                cell_path(path, cell_index)
+                for path in diff_ignore
+                if cell_path(path, cell_index) is not None
+            }
 
         if regex_replace:
             logger.debug(f"Applying replacements: {regex_replace}")
-            nb_initial_replace = regex_replace_nb(nb_initial_replace, regex_replace)
-            nb_final_replace = regex_replace_nb(nb_final_replace, regex_replace)
+            nb_initial = regex_replace_nb(nb_initial, regex_replace)
+            nb_final = regex_replace_nb(nb_final, regex_replace)
+
+        # ignored values are not diffed (only those present in both notebooks)
+        full_diff = diff_notebooks(
+            *project_notebooks(nb_initial, nb_final, diff_ignore)
+        )
+        if cell_index is not None:
+            full_diff = offset_cell_diff(full_diff, cell_index)
 
-        full_diff = diff_notebooks(nb_initial_replace, nb_final_replace)
+        return nb_initial, full_diff, self._filter_diff(full_diff, nb_config)
 
+    def _diff_ignore(self, nb_config: MetadataConfig) -> set[str]:
+        """Return the paths to ignore, when diffing."""
         diff_ignore = copy.deepcopy(nb_config.diff_ignore)
         diff_ignore.update(self.diff_ignore)
-        logger.debug(f"filtering diff by ignoring: {diff_ignore}")
-        filtered_diff = filter_diff(full_diff, diff_ignore)
-
-        diff_string = diff_to_string(
-            nb_initial_replace,
-            filtered_diff,
-            use_color=self.diff_use_color,
-            color_words=self.diff_color_words,
-        )
-        # TODO optionally write diff to file
-
-        regen_exc = None
-        if filtered_diff and self.force_regen and not exec_error:
-            if hasattr(path, "close") and hasattr(path, "name"):
-                path.close()
-                with open(path.name, "w") as handle:
-                    nbformat.write(nb_final, handle)
-            else:
-                nbformat.write(nb_final, str(path))
+        return diff_ignore
 
-            regen_exc = NBRegressionError(
-                f"Files differ and --nb-force-regen set, "
-                f"regenerating file at:\n- {abspath}"
+    def _filter_diff(
+        self, full_diff: list[DiffEntry], nb_config: MetadataConfig
+    ) -> list[DiffEntry]:
+        """Filter a diff, by the paths to ignore."""
+        diff_ignore = self._diff_ignore(nb_config)
+        logger.debug(f"filtering diff by ignoring: {diff_ignore}")
+        return filter_diff(full_diff, diff_ignore)
+
+
+def _get_abspath(path: TextIO | str) -> str:
+    """Return the absolute path of a notebook path or file handle."""
+    if hasattr(path, "name"):
+        return os.path.abspath(path.name)
+    return os.path.abspath(str(path))
+
+
+def _budgets(nb_config: MetadataConfig) -> list[ResourceBudget]:
+    """Return the (non-empty) resource budgets of a notebook, and its cells."""
+    return [b for b in [nb_config.budget, *nb_config.cell_budgets.values()] if b]
+
+
+def _budget_violations(
+    nb_config: MetadataConfig, exec_results: ExecuteResult
+) -> list[str]:
+    """Return a description of each resource budget exceeded by an execution.
+
+    Execution times are taken from ``timing``
+    (the notebook total, and the kernel reported cell durations),
+    or otherwise the wall times of ``resource_usage``,
+    and memory from the peak RSS of ``resource_usage``.
+    Budgets that were not measured
+    (e.g. for cached results, replayed cells or in-process kernels) are not checked.
+    """
+    if not _budgets(nb_config):
+        return []
+    timing = exec_results.timing or {}
+    usage = exec_results.resource_usage or {}
+    cell_usage = {cell["index"]: cell for cell in usage.get("cells", [])}
+    cell_durations = exec_results.cell_durations()
+
+    measures = [("notebook", nb_config.budget, timing.get("total", None), usage)]
+    for index, budget in sorted(nb_config.cell_budgets.items()):
+        measures.append(
+            (
+                f"cell {index}",
+                budget,
+                cell_durations.get(index, None),
+                cell_usage.get(index, {}),
             )
-
-        if not raise_errors:
-            pass
-        elif exec_error:
-            print("Diff up to exception:\n" + diff_string, file=sys.stderr)
-            raise exec_error
-        elif regen_exc:
-            print("Diff before regeneration:\n" + diff_string, file=sys.stderr)
-            raise regen_exc
-        elif filtered_diff:
-            raise NBRegressionError(diff_string)
-
-        return NBRegressionResult(
-            nb_initial, nb_final, full_diff, filtered_diff, diff_string, resources
         )
 
-
-def _get_coverage_aliases(cov):
-    """Retrieve path aliases from coverage.Coverage object."""
-    from coverage.files import PathAliases
-
-    aliases = None
-    if cov.config.paths:
-        aliases = PathAliases()
-        for paths in cov.config.paths.values():
-            result = paths[0]
-            for pattern in paths[1:]:
-                aliases.add(pattern, result)
-    return aliases
+    violations = []
+    for name, budget, seconds, measured in measures:
+        if seconds is None:
+            seconds = measured.get("wall", None)
+        memory_mb = measured["peak_rss"] / 2**20 if "peak_rss" in measured else None
+        for key, limit, value, description in (
+            ("max_seconds", budget.max_seconds, seconds, "execution time {:.2f}s"),
+            ("max_memory_mb", budget.max_memory_mb, memory_mb, "peak memory {:.1f}MB"),
+        ):
+            if limit is None:
+                continue
+            if value is None:
+                logger.warning(f"Cannot check {key} of {name}: not measured")
+            elif value > limit:
+                violations.append(
+                    f"{name}: {description.format(value)} exceeds {key}={limit}"
+                )
+    return violations
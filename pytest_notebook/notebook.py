@@ -11,16 +11,19 @@ from typing import Any, TextIO
 import attr
 from attr.validators import instance_of
 import jsonschema
+from nbdime.utils import join_path
 import nbformat
 from nbformat import NotebookNode
 
 from pytest_notebook import resources
-from pytest_notebook.diffing import join_path, star_path
+from pytest_notebook.diffing import star_path
 from pytest_notebook.utils import autodoc
 
 DEFAULT_NB_VERSION = 4
 
 META_KEY = "nbreg"
+#: The cell tag, to mark a cell's outputs as cacheable
+CACHE_TAG = "nbreg-cache"
 
 
 def mapping_to_dict(
@@ -88,17 +91,52 @@ def gather_json_paths(
         paths.append(curr_path)
 
 
+def replace_json_paths(obj: Any, replacements: Mapping[tuple, Any]) -> Any:
+    """Return a copy of a json-like object, with the values at paths replaced.
+
+    Only the containers along the replaced paths are (shallow) copied,
+    all other elements are shared with the original object, which is not modified.
+    If there are no replacements, the original object is returned.
+
+    Examples
+    --------
+    >> dct = {"a": [{"b": 2}, {"c": "x"}]}
+    >> new_dct = replace_json_paths(dct, {("a", 1, "c"): "y"})
+    >> new_dct
+    {"a": [{"b": 2}, {"c": "y"}]}
+    >> new_dct["a"][0] is dct["a"][0]
+    True
+
+    """
+    if not replacements:
+        return obj
+    new_obj = copy.copy(obj)
+    copied = {(): new_obj}
+    for path, value in replacements.items():
+        element = new_obj
+        for i, key in enumerate(path[:-1]):
+            sub_path = path[: i + 1]
+            if sub_path not in copied:
+                copied[sub_path] = element[key] = copy.copy(element[key])
+            element = copied[sub_path]
+        element[path[-1]] = value
+    return new_obj
+
+
 def regex_replace_nb(
     notebook: NotebookNode, replacements: tuple[tuple[str, str, str]]
 ) -> NotebookNode:
-    """Return a new notebook with string regex replacements applied.
+    """Return a notebook with string regex replacements applied.
+
+    The notebook is not modified; only the elements containing replacements
+    are copied (see ``replace_json_paths``).
 
     :param replacements: list of (path, regex, replacement), path is a string of form
         '/cells/0/outputs', and can contain * wildcards for integer parts
     """
     nb_paths = []
     gather_json_paths(notebook, nb_paths, types=(str,))
-    new_notebook = copy.deepcopy(notebook)
+    changes = {}
     for nb_path in nb_paths:
         # iteratively star more elements from the right side
         compare_paths = {
@@ -113,12 +151,17 @@ def regex_replace_nb(
             ):
                 continue
 
-            nb_element = new_notebook
-            for key in nb_path[:-1]:
-                nb_element = nb_element[key]
-            nb_element[nb_path[-1]] = re.sub(regex, replace, nb_element[nb_path[-1]])
+            if nb_path in changes:
+                value = changes[nb_path]
+            else:
+                value = notebook
+                for key in nb_path:
+                    value = value[key]
+            new_value = re.sub(regex, replace, value)
+            if new_value != value:
+                changes[nb_path] = new_value
 
-    return new_notebook
+    return replace_json_paths(notebook, changes)
 
 
 class NBConfigValidationError(Exception):
@@ -186,6 +229,44 @@ def validate_metadata(data, path):
         )
 
 
+@autodoc
+@attr.s(frozen=True, slots=True)
+class CellCacheConfig:
+    """A class to store the cache configuration of a cell."""
+
+    inputs: tuple = attr.ib(
+        (),
+        validator=instance_of(tuple),
+        metadata={"help": "Files (or glob patterns) that the cell reads."},
+    )
+    namespace: tuple = attr.ib(
+        (),
+        validator=instance_of(tuple),
+        metadata={"help": "Variables set by the cell, to restore with its outputs."},
+    )
+
+
+@autodoc
+@attr.s(frozen=True, slots=True)
+class ResourceBudget:
+    """A class to store the resource budget of a notebook or cell."""
+
+    max_seconds: float | None = attr.ib(
+        None,
+        validator=instance_of((type(None), int, float)),
+        metadata={"help": "The maximum execution time (in seconds)."},
+    )
+    max_memory_mb: float | None = attr.ib(
+        None,
+        validator=instance_of((type(None), int, float)),
+        metadata={"help": "The maximum peak memory (RSS) of the kernel (in MB)."},
+    )
+
+    def __bool__(self) -> bool:
+        """Return whether any limit is set."""
+        return self.max_seconds is not None or self.max_memory_mb is not None
+
+
 @autodoc
 @attr.s(frozen=True, slots=True)
 class MetadataConfig:
@@ -237,6 +318,24 @@ class MetadataConfig:
         if not all(isinstance(v, str) for v in values):
             raise TypeError(f"diff_normalize items not all strings: {values}")
 
+    cache_cells: dict = attr.ib(
+        attr.Factory(dict),
+        validator=instance_of(dict),
+        metadata={
+            "help": "Cells whose outputs may be cached: {index: CellCacheConfig}."
+        },
+    )
+    budget: ResourceBudget = attr.ib(
+        attr.Factory(ResourceBudget),
+        validator=instance_of(ResourceBudget),
+        metadata={"help": "The resource budget of the notebook execution."},
+    )
+    cell_budgets: dict = attr.ib(
+        attr.Factory(dict),
+        validator=instance_of(dict),
+        metadata={"help": "Resource budgets of cells: {index: ResourceBudget}."},
+    )
+
 
 def config_from_metadata(nb: NotebookNode) -> dict:
     """Extract configuration data from notebook/cell metadata."""
@@ -245,6 +344,8 @@ def config_from_metadata(nb: NotebookNode) -> dict:
 
     diff_replace = [tuple(d) for d in nb_metadata.get("diff_replace", [])]
     diff_ignore = set(nb_metadata.get("diff_ignore", []))
+    cache_cells = {}
+    cell_budgets = {}
 
     for i, cell in enumerate(nb.get("cells", [])):
         cell_metadata = cell.get("metadata", {}).get(META_KEY, {})
@@ -259,6 +360,20 @@ def config_from_metadata(nb: NotebookNode) -> dict:
         diff_ignore.update(
             [f"/cells/{i}{p}" for p in cell_metadata.get("diff_ignore", [])]
         )
+        cache = cell_metadata.get("cache", None)
+        if cache is None and CACHE_TAG in cell.get("metadata", {}).get("tags", []):
+            cache = True
+        if cache and cell.get("cell_type") == "code":
+            cache = {} if cache is True else cache
+            cache_cells[i] = CellCacheConfig(
+                tuple(cache.get("inputs", [])), tuple(cache.get("namespace", []))
+            )
+        budget = ResourceBudget(
+            cell_metadata.get("max_seconds", None),
+            cell_metadata.get("max_memory_mb", None),
+        )
+        if budget and cell.get("cell_type") == "code":
+            cell_budgets[i] = budget
 
     return MetadataConfig(
         tuple(diff_replace),
@@ -266,6 +381,12 @@ def config_from_metadata(nb: NotebookNode) -> dict:
         nb_metadata.get("skip", False),
         nb_metadata.get("skip_reason", ""),
         diff_normalize=tuple(nb_metadata.get("diff_normalize", [])),
+        cache_cells=cache_cells,
+        budget=ResourceBudget(
+            nb_metadata.get("max_seconds", None),
+            nb_metadata.get("max_memory_mb", None),
+        ),
+        cell_budgets=cell_budgets,
     )
 
 
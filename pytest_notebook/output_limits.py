@@ -0,0 +1,270 @@
+"""Limit the size of notebook outputs, truncating or spilling them to disk."""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import tempfile
+
+from nbformat import NotebookNode
+
+logger = logging.getLogger(__name__)
+
+HELP_MAX_OUTPUT_BYTES = (
+    "The maximum size (in bytes) of a single cell output "
+    "(consecutive stream outputs count as one)."
+)
+HELP_MAX_NB_OUTPUT_BYTES = "The maximum size (in bytes) of all outputs of a notebook."
+HELP_OUTPUT_OVERFLOW = (
+    "How to handle outputs exceeding the size limits: "
+    "'truncate' (replace the excess with a marker) "
+    "or 'spill' (write the excess to a file, and replace it with a marker)."
+)
+
+OVERFLOW_MODES = ("truncate", "spill")
+# output types that are limited (errors are kept, to report the exception)
+LIMITED_OUTPUT_TYPES = ("stream", "display_data", "execute_result")
+# a marker at the end of stream text, e.g. in a notebook regenerated with limits
+STREAM_MARKER_REGEX = re.compile(
+    r"\n\[\d+ bytes (truncated|spilled), sha256: [0-9a-f]+\]\n\Z"
+)
+
+_DEFAULT_SPILL_DIR = None
+
+
+def get_default_spill_dir() -> str:
+    """Return the default directory to spill outputs to, for this process.
+
+    This is a temporary directory, which is removed when the process exits.
+    """
+    global _DEFAULT_SPILL_DIR
+    if _DEFAULT_SPILL_DIR is None:
+        _DEFAULT_SPILL_DIR = tempfile.TemporaryDirectory(
+            prefix="pytest_notebook_spill_"
+        )
+    return _DEFAULT_SPILL_DIR.name
+
+
+class OutputLimiter:
+    """Limit the size of notebook cell outputs.
+
+    Each output is limited to ``max_output_bytes``
+    (consecutive stream outputs of the same name, as emitted by a running cell,
+    count as a single output), and all outputs of the notebook to ``max_nb_bytes``.
+
+    Excess stream text is replaced by a marker line (appended to the kept text),
+    and excess ``display_data`` / ``execute_result`` outputs have each
+    of their mime-type values replaced by a marker.
+    Markers contain the size and SHA256 digest of the replaced content,
+    so that outputs with the same content produce the same marker,
+    and limited notebooks can still be compared.
+    If ``overflow="spill"``, the replaced content is also written to
+    ``<spill_dir>/<digest>.txt`` (unless ``markers_only`` is set).
+
+    Limits are applied either to a list of outputs, as they are collected
+    (via ``limit``, then ``finish`` at the end of each cell),
+    or to a whole notebook (via ``apply``).
+    A limiter instance should only be used for a single notebook.
+    """
+
+    def __init__(
+        self,
+        max_output_bytes: int | None = None,
+        max_nb_bytes: int | None = None,
+        overflow: str = "truncate",
+        spill_dir: str | Path | None = None,
+        markers_only: bool = False,
+    ):
+        """Initialise the limiter.
+
+        :param max_output_bytes: The maximum size of a single output.
+        :param max_nb_bytes: The maximum size of all outputs.
+        :param overflow: 'truncate' or 'spill'.
+        :param spill_dir: The directory to spill outputs to
+            (default is a temporary directory, removed when the process exits).
+        :param markers_only: Replace outputs with markers, without spilling them,
+            e.g. for a stored notebook, to compare with the markers of spilled outputs.
+        """
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_MODES}: {overflow}")
+        self.max_output_bytes = max_output_bytes
+        self.max_nb_bytes = max_nb_bytes
+        self.overflow = overflow
+        self.spill_dir = Path(spill_dir or get_default_spill_dir())
+        self.markers_only = markers_only
+        self.total_bytes = 0
+        self._run = None
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return (
+            f"OutputLimiter(max_output_bytes={self.max_output_bytes}, "
+            f"max_nb_bytes={self.max_nb_bytes}, overflow={self.overflow!r})"
+        )
+
+    def _allowance(self, used: int) -> float:
+        """Return the number of bytes an output may still use."""
+        allowance = float("inf")
+        if self.max_output_bytes is not None:
+            allowance = self.max_output_bytes - used
+        if self.max_nb_bytes is not None:
+            allowance = min(allowance, self.max_nb_bytes - self.total_bytes)
+        return max(allowance, 0)
+
+    @property
+    def _spill(self) -> bool:
+        """Return whether replaced content is written to the spill directory."""
+        return self.overflow == "spill" and not self.markers_only
+
+    def _get_spill_dir(self) -> Path:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        return self.spill_dir
+
+    def _marker(self, size: int, digest: str) -> str:
+        if self.overflow == "spill":
+            return f"[{size} bytes spilled, sha256: {digest}]"
+        return f"[{size} bytes truncated, sha256: {digest[:16]}]"
+
+    def _replace_value(self, data: bytes) -> str:
+        """Return the marker for an oversized value, spilling it if required."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self._spill:
+            path = self._get_spill_dir() / f"{digest}.txt"
+            if not path.exists():
+                path.write_bytes(data)
+        return self._marker(len(data), digest)
+
+    def limit(self, outputs: list[NotebookNode]) -> None:
+        """Limit the last output of a list, which has just been appended to it.
+
+        The list is modified in-place, and its last output may be modified,
+        or removed (if it is merged into a previous marker).
+        """
+        out = outputs[-1]
+        if out.get("output_type") == "stream":
+            self._limit_stream(outputs)
+        elif out.get("output_type") in LIMITED_OUTPUT_TYPES:
+            self._limit_data(out)
+
+    def _limit_data(self, out: NotebookNode) -> None:
+        values = {
+            mime: (value if isinstance(value, str) else json.dumps(value)).encode(
+                "utf8"
+            )
+            for mime, value in out.get("data", {}).items()
+        }
+        size = sum(len(value) for value in values.values())
+        if size <= self._allowance(0):
+            self.total_bytes += size
+            return
+        out["data"] = {
+            mime: self._replace_value(value) for mime, value in values.items()
+        }
+
+    def _limit_stream(self, outputs: list[NotebookNode]) -> None:
+        out = outputs[-1]
+        run = self._run
+        if (
+            run is None
+            or len(outputs) < 2
+            or outputs[-2] is not run["last"]
+            or run["name"] != out.get("name")
+        ):
+            self._finish_run()
+            run = self._run = {
+                "name": out.get("name"),
+                "last": out,
+                "used": 0,
+                "marker": None,
+            }
+
+        if run["marker"] is not None:
+            # the stream is already over the limit
+            outputs.pop()
+            self._overflow(run, out.get("text", ""))
+            return
+
+        text = out.get("text", "")
+        data = text.encode("utf8")
+        allowance = self._allowance(run["used"])
+        match = STREAM_MARKER_REGEX.search(text)
+        if match:
+            # the text has already been limited, so only count the kept text
+            data = text[: match.start()].encode("utf8")
+        if len(data) <= allowance:
+            run["used"] += len(data)
+            self.total_bytes += len(data)
+            run["last"] = out
+            return
+
+        kept = data[: int(allowance)].decode("utf8", "ignore")
+        run["used"] += len(kept.encode("utf8"))
+        self.total_bytes += len(kept.encode("utf8"))
+        # the excess text (of this and later outputs) is replaced by a marker,
+        # appended to the kept text, once the stream has finished
+        out["text"] = kept
+        run["marker"] = out
+        run["last"] = out
+        run["size"] = 0
+        run["hash"] = hashlib.sha256()
+        run["spill"] = None
+        if self._spill:
+            # closed, and renamed to its digest, in _finish_run
+            run["spill"] = tempfile.NamedTemporaryFile(  # noqa: SIM115
+                "wb", dir=self._get_spill_dir(), suffix=".tmp", delete=False
+            )
+        self._overflow(run, text[len(kept) :])
+
+    def _overflow(self, run: dict, text: str) -> None:
+        data = text.encode("utf8")
+        run["size"] += len(data)
+        run["hash"].update(data)
+        if run["spill"] is not None:
+            run["spill"].write(data)
+
+    def _finish_run(self) -> None:
+        """Finalise the marker of the current stream, if it overflowed."""
+        run, self._run = self._run, None
+        if run is None or run["marker"] is None:
+            return
+        digest = run["hash"].hexdigest()
+        if run["spill"] is not None:
+            run["spill"].close()
+            os.replace(run["spill"].name, self._get_spill_dir() / f"{digest}.txt")
+        run["marker"]["text"] += f"\n{self._marker(run['size'], digest)}\n"
+
+    def finish(self) -> None:
+        """Finalise the outputs of a cell."""
+        self._finish_run()
+
+    def apply(self, notebook: NotebookNode) -> NotebookNode:
+        """Apply the limits to all outputs of a notebook.
+
+        The notebook is not modified; cells with limited outputs are copied.
+        """
+        cells = []
+        changed = False
+        for cell in notebook.get("cells", []):
+            if not cell.get("outputs"):
+                cells.append(cell)
+                continue
+            outputs = []
+            for out in cell.outputs:
+                outputs.append(copy.copy(out))
+                self.limit(outputs)
+            self.finish()
+            if len(outputs) == len(cell.outputs) and all(
+                new == old for new, old in zip(outputs, cell.outputs, strict=True)
+            ):
+                cells.append(cell)
+                continue
+            changed = True
+            cells.append(NotebookNode({**cell, "outputs": outputs}))
+        if not changed:
+            return notebook
+        new_notebook = copy.copy(notebook)
+        new_notebook["cells"] = cells
+        return new_notebook
@@ -0,0 +1,178 @@
+"""Post-process, normalize and diff notebook cells, as they are executed."""
+
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+import copy
+import logging
+
+from nbdime.diff_format import DiffEntry, op_patch
+from nbformat import NotebookNode
+
+from pytest_notebook.execution import ExecutionStoppedError
+
+logger = logging.getLogger(__name__)
+
+HELP_DIFF_PIPELINE = (
+    "Post-process, normalize and diff each cell on a worker thread, "
+    "as soon as it is executed (while the kernel executes the next cells), "
+    "rather than the whole notebook after execution "
+    "(normalizers and replacements are applied per cell)."
+)
+
+
+class CellPipeline:
+    """Post-process, normalize and diff the cells of a notebook, as they are executed.
+
+    Each executed cell is passed to ``submit``
+    (e.g. as the ``cell_callback`` of ``execute_notebook``),
+    and a (shallow) copy of it is post-processed, then normalized and diffed
+    against the initial cell, on a worker thread,
+    while the kernel executes the next cells.
+    ``finish`` then waits for the submitted cells, processes any remaining cells
+    (e.g. those not executed, after an error), diffs the notebook metadata,
+    and assembles the final notebook and its diff.
+
+    Each cell is normalized and diffed within a notebook containing only that cell,
+    so that the cost per cell does not depend on its index,
+    and ``compare`` offsets the diff paths to the cell's index.
+    A cell may be submitted again (e.g. if a later cell updates its display data),
+    in which case the latest result is kept.
+
+    If ``fail_fast`` is True, cells are instead processed within ``submit``,
+    which raises ``ExecutionStoppedError`` at the first cell
+    with an (unignored) difference.
+    """
+
+    def __init__(
+        self,
+        nb_initial: NotebookNode,
+        post_process_cell: Callable[[NotebookNode, dict, int], tuple],
+        compare: Callable[[NotebookNode, NotebookNode], tuple],
+        resources: dict | None = None,
+        fail_fast: bool = False,
+    ):
+        """Initialise the pipeline.
+
+        :param nb_initial: The initial notebook (with any output limits applied).
+        :param post_process_cell: Post-process an executed cell:
+            ``(cell, resources, index) -> (cell, resources)``.
+        :param compare: Normalize and diff two notebooks,
+            containing only the cell at an index (or no cells, with an index of None):
+            ``(initial, final, index) -> (initial_normalized, full_diff, filtered_diff)``,
+            with the paths of the diffs offset to the cell's index.
+        :param resources: The resources passed to ``post_process_cell``.
+        :param fail_fast: Process cells synchronously, stopping at the first difference.
+        """
+        self.nb_initial = nb_initial
+        self.post_process_cell = post_process_cell
+        self.compare = compare
+        self.resources = {} if resources is None else resources
+        self.fail_fast = fail_fast
+        self._results = {}
+        self._futures: list[Future] = []
+        self._executor = None
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return (
+            f"CellPipeline(cells={len(self.nb_initial.cells)}, "
+            f"fail_fast={self.fail_fast})"
+        )
+
+    def _notebook(self, cell: NotebookNode) -> NotebookNode:
+        """Return a copy of the initial notebook, containing only a cell."""
+        return NotebookNode({**self.nb_initial, "cells": [cell]})
+
+    def _process(self, cell: NotebookNode, index: int) -> list[DiffEntry]:
+        """Post-process, normalize and diff a cell, returning its filtered diff."""
+        if "outputs" in cell:
+            # the kernel may still update display data (replacing it in the outputs)
+            cell = NotebookNode(
+                {**cell, "outputs": [copy.copy(output) for output in cell.outputs]}
+            )
+        final_cell, self.resources = self.post_process_cell(cell, self.resources, index)
+        nb_initial_cell, full_diff, filtered_diff = self.compare(
+            self._notebook(self.nb_initial.cells[index]),
+            self._notebook(final_cell),
+            index,
+        )
+        cell_diff = [
+            entry for item in full_diff if item.key == "cells" for entry in item.diff
+        ]
+        self._results[index] = (final_cell, nb_initial_cell.cells[0], cell_diff)
+        return filtered_diff
+
+    def submit(self, cell: NotebookNode, index: int) -> None:
+        """Submit an executed cell to be processed.
+
+        :raises ExecutionStoppedError: if ``fail_fast`` is set,
+            and the cell has an unignored difference.
+        """
+        if self.fail_fast:
+            if self._process(cell, index):
+                raise ExecutionStoppedError(
+                    f"Cell {index} differs from the initial notebook", index
+                )
+            return
+        if self._executor is None:
+            # a single worker, so that cells are processed in order
+            self._executor = ThreadPoolExecutor(
+                1, thread_name_prefix="pytest_notebook_pipeline"
+            )
+        self._futures.append(self._executor.submit(self._process, cell, index))
+
+    def finish(
+        self, nb_final: NotebookNode
+    ) -> tuple[NotebookNode, NotebookNode, list[DiffEntry]]:
+        """Wait for all submitted cells, and assemble the results.
+
+        :param nb_final: The executed notebook.
+        :returns: (post-processed final notebook, normalized initial notebook,
+            full diff)
+        """
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures = []
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        remaining = [i for i in range(len(nb_final.cells)) if i not in self._results]
+        if remaining:
+            logger.debug(f"Processing cells after execution: {remaining}")
+        for index in remaining:
+            self._process(nb_final.cells[index], index)
+
+        # the notebook level (i.e. not cell) metadata
+        nb_initial_meta, meta_diff, _ = self.compare(
+            NotebookNode({**self.nb_initial, "cells": []}),
+            NotebookNode({**nb_final, "cells": []}),
+            None,
+        )
+        final_cells, initial_cells, cells_diff = [], [], []
+        for index in range(len(nb_final.cells)):
+            final_cell, initial_cell, cell_diff = self._results[index]
+            final_cells.append(final_cell)
+            initial_cells.append(initial_cell)
+            cells_diff.extend(cell_diff)
+
+        full_diff = list(meta_diff)
+        if cells_diff:
+            # insert in the same (sorted) position, as a diff of the whole notebook
+            position = next(
+                (
+                    i
+                    for i, entry in enumerate(full_diff)
+                    if entry.op == "add"
+                    or (entry.op != "remove" and entry.key > "cells")
+                ),
+                len(full_diff),
+            )
+            full_diff.insert(position, op_patch("cells", cells_diff))
+
+        return (
+            NotebookNode({**nb_final, "cells": final_cells}),
+            NotebookNode({**nb_initial_meta, "cells": initial_cells}),
+            full_diff,
+        )
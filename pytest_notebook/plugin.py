@@ -12,20 +12,47 @@ For more information on writing pytest plugins see:
 """
 
 import fnmatch
+import functools
+import json
 from pathlib import Path
 import shlex
+import shutil
+import tempfile
+import time
 
 from nbclient.exceptions import CellExecutionError
 import pytest
 
-from pytest_notebook.diffing import load_nbdime_ignore_config
-from pytest_notebook.execution import HELP_EXEC_ENV
+from pytest_notebook.cache import (
+    DEFAULT_MAX_SIZE_MB,
+    HELP_CACHE_CLEAR,
+    HELP_CELL_CACHE,
+    HELP_EXEC_CACHE,
+    HELP_EXEC_CACHE_DEPS,
+    HELP_EXEC_CACHE_SIZE,
+    CellCache,
+    ExecutionCache,
+)
+from pytest_notebook.coverage_merge import CoverageMerger
+from pytest_notebook.diffing import DIFF_RENDERERS, load_nbdime_ignore_config
+from pytest_notebook.execution import (
+    COVERAGE_CORES,
+    EXEC_MODES,
+    HELP_COVERAGE_CORE,
+    HELP_EXEC_ENV,
+    HELP_EXEC_MODE,
+    async_execute_notebook,
+)
+from pytest_notebook.forkserver import HELP_PRELOAD
+from pytest_notebook.kernel_pool import HELP_KERNEL_POOL, KernelPool
 from pytest_notebook.nb_regression import (
     DEFAULT_DIFF_IGNORE,
     HELP_COVERAGE,
     HELP_DIFF_COLOR_WORDS,
+    HELP_DIFF_FAIL_FAST,
     HELP_DIFF_IGNORE,
     HELP_DIFF_NORMALIZE,
+    HELP_DIFF_RENDERER,
     HELP_DIFF_REPLACE,
     HELP_DIFF_USE_COLOR,
     HELP_EXEC_ALLOW_ERRORS,
@@ -36,12 +63,43 @@ from pytest_notebook.nb_regression import (
     HELP_POST_PROCS,
     NBRegressionFixture,
 )
-from pytest_notebook.notebook import load_notebook_with_config, validate_regex_replace
+from pytest_notebook.notebook import (
+    load_notebook_with_config,
+    validate_regex_replace,
+)
+from pytest_notebook.output_limits import (
+    HELP_MAX_NB_OUTPUT_BYTES,
+    HELP_MAX_OUTPUT_BYTES,
+    HELP_OUTPUT_OVERFLOW,
+)
+from pytest_notebook.pipeline import HELP_DIFF_PIPELINE
+from pytest_notebook.scheduler import HELP_CONCURRENCY, NotebookScheduler
+from pytest_notebook.sharding import (
+    HELP_LONGEST_FIRST,
+    HELP_SHARD,
+    DurationStore,
+    longest_first,
+    parse_shard,
+    partition,
+)
+from pytest_notebook.workers import HELP_WORKERS, NotebookWorkerPool
 
 HELP_TEST_FILES = "Treat each .ipynb file as a test to be run."
 HELP_FILE_FNMATCH = (
     "The fnmatch pattern(s) for collecting notebooks, default: '*.ipynb'."
 )
+HELP_DURATIONS = (
+    "Record the execution timing of notebooks, and show the N slowest "
+    "notebooks and cells (N=0 for all)."
+)
+HELP_RESOURCES = (
+    "Record the resource usage of notebook kernels (requires psutil), "
+    "and show the N heaviest notebooks and cells, by peak memory (N=0 for all)."
+)
+HELP_RESOURCES_JSON = (
+    "Write the resource usage of notebook kernels (heaviest first) to a JSON file, "
+    "relative to the rootdir (requires --nb-resources)."
+)
 HELP_DIFF_USE_NBDIME_CONFIG = (
     "Also load diff-ignore paths from an nbdime configuration file "
     "(nbdime_config.json), looked up in the current working directory, "
@@ -78,6 +136,68 @@ def pytest_addoption(parser):
     group.addoption(
         "--nb-exec-timeout", dest="nb_exec_timeout", type=int, help=HELP_EXEC_TIMEOUT
     )
+    group.addoption(
+        "--nb-exec-mode",
+        dest="nb_exec_mode",
+        choices=EXEC_MODES,
+        help=HELP_EXEC_MODE,
+    )
+    group.addoption(
+        "--nb-concurrency",
+        dest="nb_concurrency",
+        type=int,
+        metavar="N",
+        help=HELP_CONCURRENCY,
+    )
+    group.addoption(
+        "--nb-workers",
+        dest="nb_workers",
+        type=int,
+        metavar="N",
+        help=HELP_WORKERS,
+    )
+    group.addoption(
+        "--nb-durations",
+        dest="nb_durations",
+        type=int,
+        metavar="N",
+        help=HELP_DURATIONS,
+    )
+    group.addoption(
+        "--nb-resources",
+        dest="nb_resources",
+        type=int,
+        metavar="N",
+        help=HELP_RESOURCES,
+    )
+    group.addoption(
+        "--nb-resources-json",
+        dest="nb_resources_json",
+        type=str,
+        metavar="PATH",
+        help=HELP_RESOURCES_JSON,
+    )
+    group.addoption(
+        "--nb-longest-first",
+        action="store_true",
+        default=None,
+        dest="nb_longest_first",
+        help=HELP_LONGEST_FIRST,
+    )
+    group.addoption(
+        "--nb-shard",
+        dest="nb_shard",
+        type=str,
+        metavar="I/N",
+        help=HELP_SHARD,
+    )
+    group.addoption(
+        "--nb-cache-clear",
+        action="store_true",
+        default=None,
+        dest="nb_cache_clear",
+        help=HELP_CACHE_CLEAR,
+    )
     group.addoption(
         "--nb-coverage",
         action="store_true",
@@ -85,6 +205,14 @@ def pytest_addoption(parser):
         dest="nb_coverage",
         help=HELP_COVERAGE,
     )
+    group.addoption(
+        "--nb-cov-core",
+        action="store",
+        default=None,
+        choices=COVERAGE_CORES,
+        dest="nb_cov_core",
+        help=HELP_COVERAGE_CORE,
+    )
     group.addoption(
         "--nb-diff-color-words",
         action="store_true",
@@ -92,6 +220,26 @@ def pytest_addoption(parser):
         dest="nb_diff_color_words",
         help=HELP_DIFF_COLOR_WORDS,
     )
+    group.addoption(
+        "--nb-diff-renderer",
+        dest="nb_diff_renderer",
+        choices=DIFF_RENDERERS,
+        help=HELP_DIFF_RENDERER,
+    )
+    group.addoption(
+        "--nb-diff-fail-fast",
+        action="store_true",
+        default=None,
+        dest="nb_diff_fail_fast",
+        help=HELP_DIFF_FAIL_FAST,
+    )
+    group.addoption(
+        "--nb-diff-pipeline",
+        action="store_true",
+        default=None,
+        dest="nb_diff_pipeline",
+        help=HELP_DIFF_PIPELINE,
+    )
     group.addoption(
         "--nb-force-regen",
         action="store_true",
@@ -116,7 +264,43 @@ def pytest_addoption(parser):
     )
     parser.addini("nb_exec_timeout", help=HELP_EXEC_TIMEOUT, default=NotSet())
     parser.addini("nb_exec_env", type="linelist", help=HELP_EXEC_ENV, default=NotSet())
+    parser.addini("nb_exec_mode", help=HELP_EXEC_MODE, default=NotSet())
+    parser.addini(
+        "nb_exec_preload", type="linelist", help=HELP_PRELOAD, default=NotSet()
+    )
+    parser.addini(
+        "nb_exec_max_output_bytes", help=HELP_MAX_OUTPUT_BYTES, default=NotSet()
+    )
+    parser.addini(
+        "nb_exec_max_nb_output_bytes", help=HELP_MAX_NB_OUTPUT_BYTES, default=NotSet()
+    )
+    parser.addini(
+        "nb_exec_output_overflow", help=HELP_OUTPUT_OVERFLOW, default=NotSet()
+    )
+    parser.addini(
+        "nb_exec_kernel_pool", type="bool", help=HELP_KERNEL_POOL, default=NotSet()
+    )
+    parser.addini("nb_exec_cache", type="bool", help=HELP_EXEC_CACHE, default=NotSet())
+    parser.addini(
+        "nb_exec_cache_deps",
+        type="linelist",
+        help=HELP_EXEC_CACHE_DEPS,
+        default=NotSet(),
+    )
+    parser.addini("nb_exec_cache_size", help=HELP_EXEC_CACHE_SIZE, default=NotSet())
+    parser.addini(
+        "nb_exec_cell_cache", type="bool", help=HELP_CELL_CACHE, default=NotSet()
+    )
+    parser.addini("nb_concurrency", help=HELP_CONCURRENCY, default=NotSet())
+    parser.addini("nb_workers", help=HELP_WORKERS, default=NotSet())
+    parser.addini("nb_durations", help=HELP_DURATIONS, default=NotSet())
+    parser.addini(
+        "nb_longest_first", type="bool", help=HELP_LONGEST_FIRST, default=NotSet()
+    )
+    parser.addini("nb_resources", help=HELP_RESOURCES, default=NotSet())
+    parser.addini("nb_resources_json", help=HELP_RESOURCES_JSON, default=NotSet())
     parser.addini("nb_coverage", type="bool", help=HELP_COVERAGE, default=NotSet())
+    parser.addini("nb_cov_core", help=HELP_COVERAGE_CORE, default=NotSet())
     parser.addini(
         "nb_post_processors", type="linelist", help=HELP_POST_PROCS, default=NotSet()
     )
@@ -144,6 +328,13 @@ def pytest_addoption(parser):
     parser.addini(
         "nb_diff_color_words", type="bool", help=HELP_DIFF_COLOR_WORDS, default=NotSet()
     )
+    parser.addini("nb_diff_renderer", help=HELP_DIFF_RENDERER, default=NotSet())
+    parser.addini(
+        "nb_diff_fail_fast", type="bool", help=HELP_DIFF_FAIL_FAST, default=NotSet()
+    )
+    parser.addini(
+        "nb_diff_pipeline", type="bool", help=HELP_DIFF_PIPELINE, default=NotSet()
+    )
     parser.addini(
         "nb_force_regen", type="bool", help=HELP_FORCE_REGEN, default=NotSet()
     )
@@ -272,6 +463,134 @@ def gather_nbdime_ignore_config(pytestconfig):
     )
 
 
+KERNEL_POOL_STASH_KEY = pytest.StashKey()
+
+
+def gather_kernel_pool(pytestconfig):
+    """Return the session kernel pool, creating it on first use.
+
+    The pool (and all its kernels) are shut down at the end of the session.
+    """
+    if KERNEL_POOL_STASH_KEY not in pytestconfig.stash:
+        pool = KernelPool()
+        pytestconfig.stash[KERNEL_POOL_STASH_KEY] = pool
+        pytestconfig.add_cleanup(pool.shutdown)
+    return pytestconfig.stash[KERNEL_POOL_STASH_KEY]
+
+
+EXEC_CACHE_STASH_KEY = pytest.StashKey()
+
+
+def gather_exec_cache(pytestconfig):
+    """Return the session execution cache, creating it on first use.
+
+    The cache is stored in the pytest cache directory,
+    and is cleared on creation if ``--nb-cache-clear`` is set.
+    """
+    if EXEC_CACHE_STASH_KEY in pytestconfig.stash:
+        return pytestconfig.stash[EXEC_CACHE_STASH_KEY]
+    if getattr(pytestconfig, "cache", None) is None:
+        raise pytest.UsageError(
+            "nb_exec_cache is set, but the pytest cacheprovider plugin is disabled"
+        )
+    max_size = pytestconfig.getini("nb_exec_cache_size")
+    max_size = DEFAULT_MAX_SIZE_MB if isinstance(max_size, NotSet) else float(max_size)
+    dependencies = pytestconfig.getini("nb_exec_cache_deps")
+    exec_cache = ExecutionCache(
+        pytestconfig.cache.mkdir("nb_exec_cache"),
+        max_size=int(max_size * 1024 * 1024),
+        dependencies=() if isinstance(dependencies, NotSet) else dependencies,
+        root_dir=pytestconfig.rootpath,
+    )
+    if pytestconfig.getoption("nb_cache_clear", None):
+        exec_cache.clear()
+    pytestconfig.stash[EXEC_CACHE_STASH_KEY] = exec_cache
+    return exec_cache
+
+
+CELL_CACHE_STASH_KEY = pytest.StashKey()
+
+
+def gather_cell_cache(pytestconfig):
+    """Return the session cell cache, creating it on first use.
+
+    The cache is stored in the pytest cache directory
+    (sharing the ``nb_exec_cache_size`` limit),
+    and is cleared on creation if ``--nb-cache-clear`` is set.
+    """
+    if CELL_CACHE_STASH_KEY in pytestconfig.stash:
+        return pytestconfig.stash[CELL_CACHE_STASH_KEY]
+    if getattr(pytestconfig, "cache", None) is None:
+        raise pytest.UsageError(
+            "nb_exec_cell_cache is set, but the pytest cacheprovider plugin is disabled"
+        )
+    max_size = pytestconfig.getini("nb_exec_cache_size")
+    max_size = DEFAULT_MAX_SIZE_MB if isinstance(max_size, NotSet) else float(max_size)
+    cell_cache = CellCache(
+        pytestconfig.cache.mkdir("nb_cell_cache"),
+        max_size=int(max_size * 1024 * 1024),
+    )
+    if pytestconfig.getoption("nb_cache_clear", None):
+        cell_cache.clear()
+    pytestconfig.stash[CELL_CACHE_STASH_KEY] = cell_cache
+    return cell_cache
+
+
+def _session_temp_dir(pytestconfig, prefix: str) -> str:
+    """Create a temporary directory, which is removed at the end of the session."""
+    path = tempfile.mkdtemp(prefix=prefix)
+    pytestconfig.add_cleanup(functools.partial(shutil.rmtree, path, ignore_errors=True))
+    return path
+
+
+SPILL_DIR_STASH_KEY = pytest.StashKey()
+
+
+def gather_spill_dir(pytestconfig) -> str:
+    """Return the directory to spill oversized outputs to, for the session.
+
+    This is created (on first use) as a temporary directory,
+    which is removed at the end of the session.
+    """
+    spill_dir = pytestconfig.stash.get(SPILL_DIR_STASH_KEY, None)
+    if spill_dir is None:
+        spill_dir = _session_temp_dir(pytestconfig, "nb_spill_")
+        pytestconfig.stash[SPILL_DIR_STASH_KEY] = spill_dir
+    return spill_dir
+
+
+COV_DATA_DIR_STASH_KEY = pytest.StashKey()
+
+
+def gather_cov_data_dir(pytestconfig) -> str:
+    """Return the directory to write notebook coverage data files to, for the session.
+
+    This is created (on first use) as a temporary directory,
+    which is removed at the end of the session (after coverage is merged).
+    """
+    cov_data_dir = pytestconfig.stash.get(COV_DATA_DIR_STASH_KEY, None)
+    if cov_data_dir is None:
+        cov_data_dir = _session_temp_dir(pytestconfig, "nb_coverage_")
+        pytestconfig.stash[COV_DATA_DIR_STASH_KEY] = cov_data_dir
+    return cov_data_dir
+
+
+COV_MERGER_STASH_KEY = pytest.StashKey()
+
+
+def gather_cov_merger(pytestconfig, cov) -> CoverageMerger:
+    """Return the session coverage merger, creating it on first use.
+
+    Notebook coverage is buffered in this, and merged in bulk at the end of the
+    test run loop (before pytest-cov saves and reports its coverage data).
+    """
+    merger = pytestconfig.stash.get(COV_MERGER_STASH_KEY, None)
+    if merger is None or merger.cov is not cov:
+        merger = CoverageMerger(cov)
+        pytestconfig.stash[COV_MERGER_STASH_KEY] = merger
+    return merger
+
+
 def gather_config_options(pytestconfig):
     """Gather all options, from command-line and ini file.
 
@@ -283,12 +602,21 @@ def gather_config_options(pytestconfig):
         ("nb_exec_cwd", str),
         ("nb_exec_allow_errors", str2bool),
         ("nb_exec_timeout", int),
+        ("nb_exec_mode", str),
+        ("nb_exec_preload", tuple),
+        ("nb_exec_max_output_bytes", int),
+        ("nb_exec_max_nb_output_bytes", int),
+        ("nb_exec_output_overflow", str),
         ("nb_coverage", str2bool),
+        ("nb_cov_core", str),
         ("nb_post_processors", tuple),
         ("nb_diff_ignore", tuple),
         ("nb_diff_normalize", tuple),
         ("nb_diff_use_color", str2bool),
         ("nb_diff_color_words", str2bool),
+        ("nb_diff_renderer", str),
+        ("nb_diff_fail_fast", str2bool),
+        ("nb_diff_pipeline", str2bool),
         ("nb_force_regen", str2bool),
     ]:
         if pytestconfig.getoption(name, None) is not None:
@@ -297,12 +625,32 @@ def gather_config_options(pytestconfig):
             nbreg_kwargs[name[3:]] = value_type(pytestconfig.getini(name))
 
     other_args = {}
-    for name, value_type in [("nb_test_files", bool), ("nb_file_fnmatch", tuple)]:
+    for name, value_type in [
+        ("nb_test_files", bool),
+        ("nb_file_fnmatch", tuple),
+        ("nb_concurrency", int),
+        ("nb_workers", int),
+        ("nb_durations", int),
+        ("nb_longest_first", bool),
+        ("nb_resources", int),
+        ("nb_resources_json", str),
+    ]:
         if pytestconfig.getoption(name, None) is not None:
             other_args[name] = value_type(pytestconfig.getoption(name))
         elif not isinstance(pytestconfig.getini(name), NotSet):
             other_args[name] = value_type(pytestconfig.getini(name))
 
+    if "nb_durations" in other_args:
+        nbreg_kwargs["exec_timing"] = True
+    if "nb_resources" in other_args:
+        nbreg_kwargs["exec_resources"] = True
+
+    if nbreg_kwargs.get("coverage"):
+        nbreg_kwargs["cov_data_dir"] = gather_cov_data_dir(pytestconfig)
+
+    if nbreg_kwargs.get("exec_output_overflow") == "spill":
+        nbreg_kwargs["exec_spill_dir"] = gather_spill_dir(pytestconfig)
+
     nb_diff_replace = validate_diff_replace(pytestconfig)
     if nb_diff_replace is not None:
         nbreg_kwargs["diff_replace"] = nb_diff_replace
@@ -311,6 +659,18 @@ def gather_config_options(pytestconfig):
     if nb_exec_env is not None:
         nbreg_kwargs["exec_env"] = nb_exec_env
 
+    use_kernel_pool = pytestconfig.getini("nb_exec_kernel_pool")
+    if not isinstance(use_kernel_pool, NotSet) and str2bool(use_kernel_pool):
+        nbreg_kwargs["kernel_pool"] = gather_kernel_pool(pytestconfig)
+
+    use_exec_cache = pytestconfig.getini("nb_exec_cache")
+    if not isinstance(use_exec_cache, NotSet) and str2bool(use_exec_cache):
+        nbreg_kwargs["exec_cache"] = gather_exec_cache(pytestconfig)
+
+    use_cell_cache = pytestconfig.getini("nb_exec_cell_cache")
+    if not isinstance(use_cell_cache, NotSet) and str2bool(use_cell_cache):
+        nbreg_kwargs["cell_cache"] = gather_cell_cache(pytestconfig)
+
     use_nbdime_config = pytestconfig.getini("nb_diff_use_nbdime_config")
     if not isinstance(use_nbdime_config, NotSet) and str2bool(use_nbdime_config):
         nbreg_kwargs["diff_ignore"] = tuple(
@@ -334,14 +694,25 @@ def gather_config_options(pytestconfig):
         plugin = pytestconfig.pluginmanager.getplugin("_cov")
         if plugin.cov_controller:
             nbreg_kwargs["cov_merge"] = plugin.cov_controller.cov
+            nbreg_kwargs["cov_merger"] = gather_cov_merger(
+                pytestconfig, plugin.cov_controller.cov
+            )
 
     return nbreg_kwargs, other_args
 
 
+def pytest_sessionstart(session):
+    """Clear the execution (and cell) cache, if requested."""
+    if session.config.getoption("nb_cache_clear", None):
+        # the caches are cleared on creation
+        gather_exec_cache(session.config)
+        gather_cell_cache(session.config)
+
+
 def pytest_report_header(config):
     """Add header information for pytest execution."""
 
-    kwargs, _ = gather_config_options(config)
+    kwargs, other_args = gather_config_options(config)
     header = []
     if kwargs.get("exec_notebook", True) and kwargs.get("exec_cwd", None):
         header.append(f"NB exec dir: {kwargs['exec_cwd']}")
@@ -349,16 +720,270 @@ def pytest_report_header(config):
         header.append(f"NB post processors: {' '.join(kwargs['post_processors'])}")
     if kwargs.get("diff_normalize", None):
         header.append(f"NB diff normalizers: {' '.join(kwargs['diff_normalize'])}")
+    if kwargs.get("exec_notebook", True) and kwargs.get("exec_mode", None):
+        header.append(f"NB exec mode: {kwargs['exec_mode']}")
+    if kwargs.get("exec_notebook", True) and kwargs.get("exec_preload", None):
+        header.append(f"NB preloaded modules: {' '.join(kwargs['exec_preload'])}")
+    if kwargs.get("exec_max_output_bytes", None) or kwargs.get(
+        "exec_max_nb_output_bytes", None
+    ):
+        header.append(
+            "NB output limits: "
+            f"{kwargs.get('exec_max_output_bytes', None)} bytes per output, "
+            f"{kwargs.get('exec_max_nb_output_bytes', None)} bytes per notebook "
+            f"({kwargs.get('exec_output_overflow', 'truncate')})"
+        )
+    if kwargs.get("coverage", False) and kwargs.get("cov_core", None):
+        header.append(f"NB coverage core: {kwargs['cov_core']}")
+    if kwargs.get("kernel_pool", None):
+        header.append("NB kernel pool: enabled")
+    if kwargs.get("exec_cache", None):
+        header.append(f"NB execution cache: {kwargs['exec_cache'].directory}")
+    if kwargs.get("cell_cache", None):
+        header.append(f"NB cell cache: {kwargs['cell_cache'].directory}")
+    if other_args.get("nb_concurrency", 1) > 1:
+        header.append(f"NB concurrency: {other_args['nb_concurrency']}")
+    if other_args.get("nb_workers", 0) > 0:
+        header.append(f"NB workers: {other_args['nb_workers']}")
+    if kwargs.get("diff_fail_fast", None):
+        header.append("NB diff fail fast: enabled")
+    if kwargs.get("diff_pipeline", None):
+        header.append("NB diff pipeline: enabled")
     if kwargs.get("force_regen", None):
         header.append(f"NB force regen: {kwargs['force_regen']}")
+    if other_args.get("nb_longest_first", False):
+        header.append("NB order: longest first")
+    if config.getoption("nb_shard", None):
+        header.append(f"NB shard: {config.getoption('nb_shard')}")
     return header
 
 
+DURATION_STORE_STASH_KEY = pytest.StashKey()
+SHARD_STASH_KEY = pytest.StashKey()
+
+
+def gather_duration_store(pytestconfig) -> DurationStore:
+    """Return the store of notebook test durations, for the session."""
+    if DURATION_STORE_STASH_KEY not in pytestconfig.stash:
+        pytestconfig.stash[DURATION_STORE_STASH_KEY] = DurationStore(
+            getattr(pytestconfig, "cache", None)
+        )
+    return pytestconfig.stash[DURATION_STORE_STASH_KEY]
+
+
+def pytest_collection_modifyitems(session, config, items):
+    """Select the notebooks of a shard, and order them longest first, if requested."""
+    if config.getoption("nb_shard", None):
+        _select_shard(config, items)
+    _, other_args = gather_config_options(config)
+    if other_args.get("nb_longest_first", False):
+        _order_longest_first(config, items)
+
+
+def _order_longest_first(config, items):
+    """Reorder notebook items by their stored durations, longest first
+    (other items keep their positions).
+    """
+    positions = [i for i, item in enumerate(items) if isinstance(item, JupyterNbTest)]
+    estimates = gather_duration_store(config).estimates(
+        items[i].nodeid for i in positions
+    )
+    notebooks = {items[i].nodeid: items[i] for i in positions}
+    for i, nodeid in zip(positions, longest_first(estimates), strict=True):
+        items[i] = notebooks[nodeid]
+
+
+def _select_shard(config, items):
+    """Deselect the notebook items not in the requested shard."""
+    try:
+        index, count = parse_shard(config.getoption("nb_shard"))
+    except ValueError as exc:
+        raise pytest.UsageError(f"--nb-shard: {exc}") from exc
+    notebooks = [item for item in items if isinstance(item, JupyterNbTest)]
+    estimates = gather_duration_store(config).estimates(
+        item.nodeid for item in notebooks
+    )
+    selected = set(partition(estimates, count)[index])
+    deselected = [item for item in notebooks if item.nodeid not in selected]
+    config.stash[SHARD_STASH_KEY] = (
+        len(selected),
+        sum(estimates[nodeid] for nodeid in selected),
+    )
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [
+            item
+            for item in items
+            if not isinstance(item, JupyterNbTest) or item.nodeid in selected
+        ]
+
+
+def pytest_report_collectionfinish(config, start_path, items):
+    """Report the notebooks selected for a shard."""
+    if SHARD_STASH_KEY not in config.stash:
+        return None
+    selected, estimate = config.stash[SHARD_STASH_KEY]
+    return (
+        f"NB shard {config.getoption('nb_shard')}: {selected} notebook(s), "
+        f"estimated {estimate:.2f}s"
+    )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Store the durations of notebook tests, in the pytest cache."""
+    store = session.config.stash.get(DURATION_STORE_STASH_KEY, None)
+    if store is not None:
+        store.save()
+
+
+DURATIONS_STASH_KEY = pytest.StashKey()
+RESOURCES_STASH_KEY = pytest.StashKey()
+
+
+def gather_timing_recorder(pytestconfig, nodeid: str, with_path: bool = False):
+    """Return a callback, to record the execution timing and resource usage
+    of notebooks for a test,
+    or None if neither ``--nb-durations`` nor ``--nb-resources`` is set.
+
+    :param with_path: Append the notebook path to the node ID, in the report.
+    """
+    _, other_args = gather_config_options(pytestconfig)
+    if "nb_durations" not in other_args and "nb_resources" not in other_args:
+        return None
+    records = pytestconfig.stash.setdefault(DURATIONS_STASH_KEY, [])
+    usages = pytestconfig.stash.setdefault(RESOURCES_STASH_KEY, [])
+
+    def _record_timing(path, exec_results):
+        name = nodeid
+        if with_path:
+            name = f"{nodeid}::{Path(path).name}"
+        if exec_results.timing is not None:
+            records.append((name, exec_results.timing, exec_results.coverage_core))
+        if exec_results.resource_usage is not None:
+            usages.append((name, exec_results.resource_usage))
+
+    return _record_timing
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """Report the slowest (and heaviest) notebooks and cells, if requested."""
+    _report_durations(terminalreporter, config)
+    _report_resources(terminalreporter, config)
+
+
+def _report_durations(terminalreporter, config):
+    """Report the slowest notebooks and cells."""
+    _, other_args = gather_config_options(config)
+    durations = other_args.get("nb_durations", None)
+    records = config.stash.get(DURATIONS_STASH_KEY, [])
+    if durations is None or not records:
+        return
+    limit = durations or None
+    count = f"{durations} " if durations else ""
+
+    terminalreporter.write_sep("=", f"slowest {count}notebook durations")
+    for name, timing, cov_core in sorted(
+        records, key=lambda r: r[1]["total"], reverse=True
+    )[:limit]:
+        details = [
+            f"{key.replace('_', ' ')} {timing[key]:.2f}s"
+            for key in ("kernel_start", "coverage_setup", "coverage_teardown")
+            if timing[key] is not None
+        ]
+        if cov_core is not None:
+            details.append(f"coverage core {cov_core}")
+        terminalreporter.write_line(
+            f"{timing['total']:.2f}s {name} ({', '.join(details)})"
+        )
+
+    if any(cov_core is not None for _, _, cov_core in records):
+        # the overhead of coverage is mostly in measuring the executed cells,
+        # so report the total time for each core, to compare between runs
+        totals: dict[str, list] = {}
+        for _, timing, cov_core in records:
+            core_total = totals.setdefault(cov_core or "no coverage", [0.0, 0])
+            core_total[0] += timing["total"]
+            core_total[1] += 1
+        terminalreporter.write_sep("=", "total notebook durations by coverage core")
+        for cov_core, (total, number) in sorted(totals.items()):
+            terminalreporter.write_line(f"{total:.2f}s {cov_core} ({number} notebooks)")
+
+    cells = [
+        (cell["end"] - cell["start"], cell["start"] - cell["queued"], name, cell)
+        for name, timing, _ in records
+        for cell in timing["cells"]
+        if cell["start"] is not None and cell["end"] is not None
+    ]
+    terminalreporter.write_sep("=", f"slowest {count}notebook cell durations")
+    for duration, queued, name, cell in sorted(cells, key=lambda c: c[0], reverse=True)[
+        :limit
+    ]:
+        terminalreporter.write_line(
+            f"{duration:.2f}s {name}::cell[{cell['index']}] (queued {queued:.2f}s)"
+        )
+
+
+def _format_usage(usage: dict) -> str:
+    return (
+        f"{usage['peak_rss'] / 2**20:.1f}MB "
+        f"(cpu user {usage['cpu_user']:.2f}s, system {usage['cpu_system']:.2f}s, "
+        f"wall {usage['wall']:.2f}s)"
+    )
+
+
+def _report_resources(terminalreporter, config):
+    """Report the heaviest notebooks and cells, and write the JSON export."""
+    _, other_args = gather_config_options(config)
+    resources = other_args.get("nb_resources", None)
+    records = sorted(
+        config.stash.get(RESOURCES_STASH_KEY, []),
+        key=lambda r: r[1]["peak_rss"],
+        reverse=True,
+    )
+    if resources is None:
+        return
+    if not records:
+        terminalreporter.write_line(
+            "NB resources: no resource usage recorded (psutil may not be installed)"
+        )
+        return
+    limit = resources or None
+    count = f"{resources} " if resources else ""
+
+    terminalreporter.write_sep("=", f"heaviest {count}notebook kernels")
+    for name, usage in records[:limit]:
+        terminalreporter.write_line(f"{_format_usage(usage)} {name}")
+
+    cells = [(name, cell) for name, usage in records for cell in usage["cells"]]
+    terminalreporter.write_sep("=", f"heaviest {count}notebook cells")
+    for name, cell in sorted(cells, key=lambda c: c[1]["peak_rss"], reverse=True)[
+        :limit
+    ]:
+        terminalreporter.write_line(
+            f"{_format_usage(cell)} {name}::cell[{cell['index']}]"
+        )
+
+    if other_args.get("nb_resources_json", None):
+        path = Path(config.rootpath, other_args["nb_resources_json"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                [{"name": name, **usage} for name, usage in records[:limit]],
+                indent=2,
+            ),
+            encoding="utf8",
+        )
+        terminalreporter.write_line(f"NB resources written to: {path}")
+
+
 @pytest.fixture(scope="function")
-def nb_regression(pytestconfig):
+def nb_regression(pytestconfig, request):
     """Fixture to execute a Jupyter Notebook, and test its output is as expected."""
 
     kwargs, _ = gather_config_options(pytestconfig)
+    recorder = gather_timing_recorder(pytestconfig, request.node.nodeid, True)
+    if recorder is not None:
+        kwargs["exec_callback"] = recorder
     return NBRegressionFixture(**kwargs)
 
 
@@ -386,6 +1011,99 @@ def pytest_collect_file(file_path: Path, parent):
         return JupyterNbCollector.from_parent(parent, path=file_path)
 
 
+SCHEDULER_STASH_KEY = pytest.StashKey()
+WORKERS_STASH_KEY = pytest.StashKey()
+
+
+# run inside the pytest-cov wrapper, so that coverage is merged before it is reported
+@pytest.hookimpl(wrapper=True, trylast=True)
+def pytest_runtestloop(session):
+    """Run the tests, then merge buffered notebook coverage."""
+    if not _start_workers(session):
+        _start_scheduler(session)
+    try:
+        return (yield)
+    finally:
+        merger = session.config.stash.get(COV_MERGER_STASH_KEY, None)
+        if merger is not None:
+            merger.merge()
+
+
+def _scheduled_items(session) -> list:
+    """Return the notebook items to execute ahead of their tests."""
+    kwargs, _ = gather_config_options(session.config)
+    if not kwargs.get("exec_notebook", True) or session.config.option.collectonly:
+        return []
+    return [
+        item
+        for item in session.items
+        if isinstance(item, JupyterNbTest) and not item.get_closest_marker("skip")
+    ]
+
+
+def _start_workers(session) -> bool:
+    """Start checking collected notebooks in worker processes, if requested.
+
+    The notebooks are submitted (in collection order) to a pool of worker processes,
+    and each ``JupyterNbTest`` then waits for its result,
+    before completing the check (e.g. raising any errors), as usual.
+
+    :returns: Whether workers were requested.
+    """
+    kwargs, other_args = gather_config_options(session.config)
+    workers = other_args.get("nb_workers", 0)
+    if workers < 1:
+        return False
+    items = _scheduled_items(session)
+    if not items:
+        return True
+    pool = NotebookWorkerPool(
+        workers, kwargs, kernel_pool=kwargs.get("kernel_pool", None) is not None
+    )
+    session.config.stash[WORKERS_STASH_KEY] = pool
+    session.config.add_cleanup(pool.shutdown)
+    for item in items:
+        pool.submit(item.nodeid, str(item.path))
+    return True
+
+
+def _start_scheduler(session):
+    """Start executing collected notebooks concurrently, if requested.
+
+    The notebooks are executed (in collection order) in a background event loop,
+    and each ``JupyterNbTest`` then waits for its execution result,
+    before post-processing and diffing it, as usual.
+    """
+    kwargs, other_args = gather_config_options(session.config)
+    concurrency = other_args.get("nb_concurrency", 1)
+    if concurrency < 2:
+        return
+    items = _scheduled_items(session)
+    if not items:
+        return
+    scheduler = NotebookScheduler(concurrency)
+    session.config.stash[SCHEDULER_STASH_KEY] = scheduler
+    session.config.add_cleanup(scheduler.shutdown)
+    fixture = NBRegressionFixture(**kwargs)
+    for item in items:
+        scheduler.submit(item.nodeid, _async_execute_path, str(item.path), fixture)
+
+
+async def _async_execute_path(path: str, fixture: NBRegressionFixture):
+    """Load and execute a notebook.
+
+    :returns: (execution result, pipeline the notebook was executed with,
+        duration of the execution)
+    """
+    start_time = time.perf_counter()
+    notebook, nb_config = load_notebook_with_config(path)
+    pipeline = fixture.create_pipeline(notebook, nb_config)
+    exec_results = await async_execute_notebook(
+        notebook, **fixture.exec_kwargs(path, pipeline, nb_config)
+    )
+    return exec_results, pipeline, time.perf_counter() - start_time
+
+
 class JupyterNbCollector(pytest.File):
     """This class represents a pytest collector object for Jupyter Notebook files.
 
@@ -413,15 +1131,39 @@ class JupyterNbTest(pytest.Item):
     def runtest(self):
         """Run the test."""
         kwargs, _ = gather_config_options(self.config)
-        fixture = NBRegressionFixture(**kwargs)
+        fixture = NBRegressionFixture(
+            exec_callback=gather_timing_recorder(self.config, self.nodeid), **kwargs
+        )
+        exec_results = pipeline = result = None
+        # the duration excludes any time waiting for a concurrent execution
+        duration = 0.0
+        workers = self.config.stash.get(WORKERS_STASH_KEY, None)
+        scheduler = self.config.stash.get(SCHEDULER_STASH_KEY, None)
+        if workers is not None and self.nodeid in workers:
+            result, duration = workers.result(self.nodeid)
+        elif scheduler is not None and self.nodeid in scheduler:
+            exec_results, pipeline, duration = scheduler.result(self.nodeid)
+        start_time = time.perf_counter()
         try:
-            fixture.check(str(self.path))
+            if result is not None:
+                result = fixture.check_result(str(self.path), result)
+            else:
+                result = fixture.check(
+                    str(self.path), exec_results=exec_results, pipeline=pipeline
+                )
         except CellExecutionError as err:
             # allow a notebook to skip itself at runtime,
             # by raising ``pytest.skip(...)`` within a cell
             if err.ename == "Skipped":
                 pytest.skip(err.evalue)
             raise
+        # only the durations of complete executions are recorded
+        # (not failed or skipped tests, or results retrieved from the cache),
+        # so that they are not replaced by those of partial or no execution
+        if result.exec_results is not None and not result.exec_results.from_cache:
+            gather_duration_store(self.config).record(
+                self.nodeid, duration + time.perf_counter() - start_time
+            )
 
     def repr_failure(self, exc_info):
         """Handle exception raised by ``self.runtest()``.
@@ -49,7 +49,7 @@ def document_processors():
     )
 
 
-def cell_preprocessor(function):
+def cell_preprocessor(function=None, *, copy_cells: bool = True):
     """Wrap a function to be executed on all cells of a notebook.
 
     The wrapped function should have these parameters:
@@ -60,15 +60,35 @@ def cell_preprocessor(function):
         Additional resources used in the conversion process.
     index : int
         Index of the cell being processed
+
+    Each cell is deep copied, before it is passed to the function.
+    If ``copy_cells`` is False (i.e. ``@cell_preprocessor(copy_cells=False)``),
+    cells are passed as-is, and the function must not modify them in-place,
+    but return a new cell for any changes
+    (which may share unchanged elements with the original cell).
+
+    The function (with any copying) is available as the ``cell_function`` attribute
+    of the wrapper, to apply to cells individually.
     """
+    if function is None:
+        return functools.partial(cell_preprocessor, copy_cells=copy_cells)
+
+    def cell_function(
+        cell: NotebookNode, resources: dict, index: int
+    ) -> tuple[NotebookNode, dict]:
+        if copy_cells:
+            cell = copy.deepcopy(cell)
+        return function(cell, resources, index)
 
     @functools.wraps(function)
     def wrappedfunc(nb: NotebookNode, resources: dict) -> (NotebookNode, dict):
-        new_nb = copy.deepcopy(nb)
-        for index, cell in enumerate(new_nb.cells):
-            new_nb.cells[index], resources = function(cell, resources, index)
+        new_nb = copy.copy(nb)
+        new_nb["cells"] = list(nb.cells)
+        for index, cell in enumerate(nb.cells):
+            new_nb.cells[index], resources = cell_function(cell, resources, index)
         return new_nb, resources
 
+    wrappedfunc.cell_function = cell_function
     return wrappedfunc
 
 
@@ -77,7 +97,7 @@ RGX_CARRIAGERETURN = re.compile(r".*\r(?=[^\n])")
 RGX_BACKSPACE = re.compile("[^\n]\x08")
 
 
-@cell_preprocessor
+@cell_preprocessor(copy_cells=False)
 def coalesce_streams(
     cell: NotebookNode, resources: dict, index: int
 ) -> tuple[NotebookNode, dict]:
@@ -99,6 +119,8 @@ def coalesce_streams(
             if output.name in streams:
                 streams[output.name].text += output.text
             else:
+                # copied, since the text may be modified
+                output = copy.copy(output)
                 new_outputs.append(output)
                 streams[output.name] = output
         else:
@@ -127,12 +149,13 @@ def coalesce_streams(
                 stdout = new_outputs.pop(i + 1)
                 new_outputs.insert(i, stdout)
 
+    cell = copy.copy(cell)
     cell.outputs = new_outputs
 
     return cell, resources
 
 
-@cell_preprocessor
+@cell_preprocessor(copy_cells=False)
 def blacken_code(
     cell: NotebookNode, resources: dict, index: int
 ) -> tuple[NotebookNode, dict]:
@@ -147,18 +170,20 @@ def blacken_code(
 
     # TODO use metadata to set target versions and whether to raise on exceptions
     # i.e. black.FileMode(target_versions, {black.TargetVersion.PY36})
+    source = cell.source
     try:
-        cell.source = black.format_str(cell.source, mode=black.FileMode())
+        source = black.format_str(source, mode=black.FileMode())
     except (SyntaxError, black.InvalidInput):
         logger.debug(f"cell {index} could not be formatted by black.")
 
+    cell = copy.copy(cell)
     # code cells don't require a trailing new line
-    cell.source = cell.source.rstrip()
+    cell.source = source.rstrip()
 
     return cell, resources
 
 
-@cell_preprocessor
+@cell_preprocessor(copy_cells=False)
 def beautifulsoup(
     cell: NotebookNode, resources: dict, index: int
 ) -> tuple[NotebookNode, dict]:
@@ -179,21 +204,28 @@ def beautifulsoup(
     if "outputs" not in cell:
         return cell, resources
 
+    outputs = list(cell.outputs)
     for i, output in enumerate(cell.outputs):
         if output.output_type not in ["execute_result", "display_data"]:
             continue
-        for mimetype, _value in output.get("data", {}).items():
+        data = dict(output.get("data", {}))
+        formatted = False
+        for mimetype, value in output.get("data", {}).items():
             if mimetype not in ["text/html", "image/svg+xml"]:
                 continue
             path = f"/cells/{index}/outputs/{i}/{mimetype}"
             # TODO use metadata to set builder and whether to raise on exceptions
             try:
-                output["data"][mimetype] = BeautifulSoup(
-                    output["data"][mimetype], "html.parser"
-                ).prettify()
+                data[mimetype] = BeautifulSoup(value, "html.parser").prettify()
+                formatted = True
                 # record which paths have been formatted (mainly for testing)
                 resources.setdefault("beautifulsoup", []).append(path)
             except Exception:  # TODO what exceptions might be raised?
                 logger.debug(f"{path} could not be formatted by beautiful-soup.")
+        if formatted:
+            outputs[i] = NotebookNode({**output, "data": NotebookNode(data)})
+
+    cell = copy.copy(cell)
+    cell.outputs = outputs
 
     return cell, resources
@@ -0,0 +1,173 @@
+"""Record the resource usage (memory and CPU) of kernel processes."""
+
+from contextlib import suppress
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HELP_EXEC_RESOURCES = (
+    "Record the resource usage of the kernel process, for the notebook and each cell: "
+    "peak RSS memory, CPU user/system time and wall time "
+    "(requires psutil; not recorded for in-process kernels)."
+)
+
+
+class ResourceMonitor:
+    """Record the resource usage of a (kernel) process, and its child processes.
+
+    The memory (RSS) of the process, and its children, is sampled on a background
+    thread (every ``interval`` seconds), and also at the start and end of each cell,
+    to obtain the peak memory usage.
+    CPU times are those of the process,
+    and its terminated (and waited for) child processes.
+
+    Usage::
+
+        monitor = ResourceMonitor.from_pid(pid)
+        monitor.start()
+        monitor.cell_start(0)
+        ...
+        monitor.cell_end(0)
+        usage = monitor.stop()
+
+    ``usage`` is then a dict of ``pid``, ``peak_rss`` (bytes), ``cpu_user``,
+    ``cpu_system`` and ``wall`` (seconds), and ``cells``,
+    a list of the same (with ``index``, and without ``pid``) for each recorded cell.
+    """
+
+    def __init__(self, process, interval: float = 0.1):
+        """Initialise the monitor.
+
+        :param process: The ``psutil.Process`` to monitor.
+        :param interval: The interval (in seconds) between memory samples.
+        """
+        self.process = process
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start = None
+        self._peak_rss = 0
+        self._cell = None
+        self._cells = []
+        self._cpu = (0.0, 0.0)
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return f"ResourceMonitor(pid={self.process.pid}, interval={self.interval})"
+
+    @classmethod
+    def from_pid(cls, pid: int | None, interval: float = 0.1):
+        """Create a monitor for a process ID,
+        or return None if psutil is not installed, or the process does not exist.
+        """
+        if pid is None:
+            return None
+        try:
+            # psutil is not a required dependency
+            import psutil
+        except ImportError:
+            logger.warning("psutil must be installed, to record resource usage")
+            return None
+        try:
+            return cls(psutil.Process(pid), interval=interval)
+        except psutil.Error as err:
+            logger.warning(f"Cannot record resource usage of process {pid}: {err}")
+            return None
+
+    def _sample_rss(self) -> int:
+        """Return the total RSS of the process and its children (or 0, if exited)."""
+        import psutil
+
+        try:
+            rss = self.process.memory_info().rss
+            for child in self.process.children(recursive=True):
+                with suppress(psutil.Error):
+                    rss += child.memory_info().rss
+        except psutil.Error:
+            return 0
+        return rss
+
+    def _cpu_times(self) -> tuple[float, float]:
+        """Return the (user, system) CPU time of the process
+        (or the last known times, if it has exited).
+        """
+        import psutil
+
+        try:
+            times = self.process.cpu_times()
+        except psutil.Error:
+            return self._cpu
+        self._cpu = (
+            times.user + getattr(times, "children_user", 0.0),
+            times.system + getattr(times, "children_system", 0.0),
+        )
+        return self._cpu
+
+    def _update(self) -> None:
+        rss = self._sample_rss()
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+            if self._cell is not None:
+                self._cell["peak_rss"] = max(self._cell["peak_rss"], rss)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._update()
+
+    def _snapshot(self) -> dict:
+        user, system = self._cpu_times()
+        return {"cpu_user": user, "cpu_system": system, "wall": time.perf_counter()}
+
+    @staticmethod
+    def _usage(start: dict, end: dict) -> dict:
+        return {
+            key: end[key] - start[key] for key in ("cpu_user", "cpu_system", "wall")
+        }
+
+    def start(self) -> None:
+        """Start monitoring."""
+        self._start = self._snapshot()
+        self._update()
+        self._thread = threading.Thread(
+            target=self._run, name="pytest_notebook_resources", daemon=True
+        )
+        self._thread.start()
+
+    def cell_start(self, index: int) -> None:
+        """Mark the start of a cell's execution."""
+        rss = self._sample_rss()
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+            self._cell = {"index": index, "peak_rss": rss, "start": self._snapshot()}
+
+    def cell_end(self, index: int) -> None:
+        """Mark the end of a cell's execution."""
+        self._update()
+        with self._lock:
+            cell, self._cell = self._cell, None
+        if cell is None or cell["index"] != index:
+            return
+        self._cells.append(
+            {
+                "index": index,
+                "peak_rss": cell["peak_rss"],
+                **self._usage(cell["start"], self._snapshot()),
+            }
+        )
+
+    def stop(self) -> dict:
+        """Stop monitoring, and return the resource usage."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._update()
+        return {
+            "pid": self.process.pid,
+            "peak_rss": self._peak_rss,
+            **self._usage(self._start, self._snapshot()),
+            "cells": self._cells,
+        }
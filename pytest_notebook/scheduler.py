@@ -0,0 +1,88 @@
+"""Concurrent scheduling of notebook executions."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import concurrent.futures
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+HELP_CONCURRENCY = (
+    "Execute up to N notebooks concurrently, "
+    "in a single event loop within the pytest process "
+    "(test results are still reported in collection order)."
+)
+
+
+class NotebookScheduler:
+    """Run notebook executions concurrently, in a background event loop.
+
+    Jobs are submitted (in the order they should start),
+    and executed in a single asyncio event loop, running in a background thread,
+    with at most ``concurrency`` jobs running at any one time.
+    Their results can then be retrieved (blocking until available),
+    by the key they were submitted with.
+    """
+
+    def __init__(self, concurrency: int):
+        """Initialise the scheduler, and start its event loop thread."""
+        if concurrency < 1:
+            raise ValueError("concurrency must be 1 or larger")
+        self.concurrency = concurrency
+        self._futures: dict[Hashable, concurrent.futures.Future] = {}
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="pytest-notebook-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return (
+            f"NotebookScheduler(concurrency={self.concurrency}, "
+            f"pending={len(self._futures)})"
+        )
+
+    async def _run(self, func: Callable[..., Awaitable], args, kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await func(*args, **kwargs)
+
+    def submit(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs):
+        """Submit a coroutine function to be run, with the given arguments."""
+        if key in self._futures:
+            raise KeyError(f"job already submitted: {key}")
+        self._futures[key] = asyncio.run_coroutine_threadsafe(
+            self._run(func, args, kwargs), self._loop
+        )
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return whether a job, whose result is not yet retrieved, exists."""
+        return key in self._futures
+
+    def result(self, key: Hashable):
+        """Wait for, and return, the result of a job (raising any exception)."""
+        return self._futures.pop(key).result()
+
+    @staticmethod
+    async def _cancel_all():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        # wait for cancelled jobs to finish, e.g. cleaning up their kernels
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def shutdown(self) -> None:
+        """Cancel all unretrieved jobs, and stop the event loop."""
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result()
+        self._futures = {}
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
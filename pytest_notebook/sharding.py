@@ -0,0 +1,116 @@
+"""Record the durations of notebook tests, to order and partition them into shards."""
+
+from collections.abc import Hashable, Iterable
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+HELP_LONGEST_FIRST = (
+    "Run notebooks in order of their durations from previous runs, longest first "
+    "(stored in the pytest cache), to reduce the tail time of concurrent runs."
+)
+HELP_SHARD = (
+    "Only run the notebooks of shard I (of N, 1-based), "
+    "partitioned to balance their durations from previous runs "
+    "(stored in the pytest cache), e.g. --nb-shard=2/8."
+)
+
+#: The pytest cache key, under which notebook test durations are stored
+CACHE_KEY = "pytest_notebook/durations"
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse a shard specification, of the form ``I/N`` (1-based).
+
+    :returns: (index, count), with a 0-based index.
+    :raises ValueError: if the specification is invalid.
+    """
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"shard must be of the form I/N: {value!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"shard must satisfy 1 <= I <= N: {value!r}")
+    return index - 1, count
+
+
+class DurationStore:
+    """Store the durations (in seconds) of notebook tests, keyed by node ID,
+    across pytest sessions, in the pytest cache.
+
+    Durations recorded in a session are merged into those stored
+    (re-read when saving, in case another process, e.g. a pytest-xdist worker,
+    has since stored durations),
+    so that the durations of notebooks not run (e.g. in another shard) are kept.
+    """
+
+    def __init__(self, cache=None):
+        """Initialise the store.
+
+        :param cache: The pytest cache (``config.cache``),
+            or None to not persist durations.
+        """
+        self.cache = cache
+        self.durations: dict[str, float] = (
+            {} if cache is None else dict(cache.get(CACHE_KEY, {}))
+        )
+        self._recorded: dict[str, float] = {}
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return (
+            f"DurationStore(stored={len(self.durations)}, "
+            f"recorded={len(self._recorded)})"
+        )
+
+    def get(self, nodeid: str) -> float | None:
+        """Return the stored duration of a test, or None if unknown."""
+        return self.durations.get(nodeid, None)
+
+    def record(self, nodeid: str, duration: float) -> None:
+        """Record the duration of a test (stored on ``save``)."""
+        self._recorded[nodeid] = duration
+
+    def save(self) -> None:
+        """Store the recorded durations in the cache."""
+        if self.cache is None or not self._recorded:
+            return
+        self.durations = {**self.cache.get(CACHE_KEY, {}), **self._recorded}
+        self._recorded = {}
+        self.cache.set(CACHE_KEY, dict(sorted(self.durations.items())))
+
+    def estimates(self, keys: Iterable[str]) -> dict[str, float]:
+        """Return the stored duration for each key, estimating unknown durations
+        as the mean of the known ones (or 1 second, if none are known).
+        """
+        keys = list(keys)
+        known = [self.durations[key] for key in keys if key in self.durations]
+        default = sum(known) / len(known) if known else 1.0
+        return {key: self.durations.get(key, default) for key in keys}
+
+
+def longest_first(weights: dict[Hashable, float]) -> list[Hashable]:
+    """Return the keys in order of decreasing weight (ties keep their order)."""
+    return sorted(weights, key=lambda key: -weights[key])
+
+
+def partition(weights: dict[Hashable, float], count: int) -> list[list[Hashable]]:
+    """Partition keys into a number of bins, balancing the total weight of each.
+
+    Keys are assigned, heaviest first, to the bin with the lowest total weight
+    (the longest-processing-time heuristic), with ties broken by key order,
+    so that the partition is deterministic.
+
+    :returns: the keys of each bin, in their original (insertion) order.
+    """
+    if count < 1:
+        raise ValueError("count must be 1 or larger")
+    position = {key: i for i, key in enumerate(weights)}
+    bins: list[list[Hashable]] = [[] for _ in range(count)]
+    heap = [(0.0, i) for i in range(count)]
+    for key in sorted(weights, key=lambda k: (-weights[k], position[k])):
+        total, index = heapq.heappop(heap)
+        bins[index].append(key)
+        heapq.heappush(heap, (total + weights[key], index))
+    return [sorted(keys, key=position.__getitem__) for keys in bins]
@@ -0,0 +1,114 @@
+"""Check notebooks in a pool of worker processes."""
+
+from collections.abc import Hashable
+import concurrent.futures
+import logging
+import multiprocessing
+from multiprocessing.util import Finalize
+import time
+
+from pytest_notebook.kernel_pool import KernelPool
+from pytest_notebook.nb_regression import NBRegressionFixture, NBRegressionResult
+
+logger = logging.getLogger(__name__)
+
+HELP_WORKERS = (
+    "Check notebooks in a pool of N long-lived worker processes "
+    "(each with its own kernels), rather than in the pytest process "
+    "(test results are still reported in collection order)."
+)
+
+#: Fixture options that are specific to a process, and so are not sent to workers
+PROCESS_OPTIONS = ("kernel_pool", "cov_merge", "cov_merger", "exec_callback")
+
+# the fixture of a worker process
+_FIXTURE: NBRegressionFixture | None = None
+
+
+def _init_worker(fixture_kwargs: dict, kernel_pool: bool) -> None:
+    """Initialise a worker process, creating its fixture (and kernel pool)."""
+    global _FIXTURE
+    if kernel_pool:
+        pool = KernelPool()
+        # shut down the kernels when the worker process exits
+        Finalize(pool, pool.shutdown, exitpriority=10)
+        fixture_kwargs = {**fixture_kwargs, "kernel_pool": pool}
+    _FIXTURE = NBRegressionFixture(**fixture_kwargs)
+
+
+def _check(path: str) -> tuple[NBRegressionResult, float]:
+    """Check a notebook, in a worker process.
+
+    :returns: (result, duration of the check)
+    """
+    start_time = time.perf_counter()
+    result = _FIXTURE.check(path, raise_errors=False)
+    return result, time.perf_counter() - start_time
+
+
+class NotebookWorkerPool:
+    """Check notebooks in a pool of long-lived worker processes.
+
+    Each worker process creates a ``NBRegressionFixture``, once,
+    from the given options (except those in ``PROCESS_OPTIONS``),
+    with its own ``KernelPool`` if ``kernel_pool`` is True,
+    and checks the notebooks it is sent with ``raise_errors=False``.
+    The (picklable) results are then streamed back to the main process,
+    and can be retrieved (blocking until available) by the key they were submitted with,
+    to be completed by the main process fixture's ``check_result``
+    (i.e. its ``exec_callback``, coverage merging and error raising).
+
+    Worker processes are started with the ``spawn`` method,
+    so that they do not inherit the threads (e.g. kernel IO loops) of the main process.
+    """
+
+    def __init__(self, workers: int, fixture_kwargs: dict, kernel_pool: bool = False):
+        """Initialise the pool (worker processes are started on first use).
+
+        :param workers: The number of worker processes.
+        :param fixture_kwargs: The options of each worker's ``NBRegressionFixture``.
+        :param kernel_pool: Create a kernel pool, in each worker process.
+        """
+        if workers < 1:
+            raise ValueError("workers must be 1 or larger")
+        self.workers = workers
+        fixture_kwargs = {
+            key: value
+            for key, value in fixture_kwargs.items()
+            if key not in PROCESS_OPTIONS
+        }
+        self._futures: dict[Hashable, concurrent.futures.Future] = {}
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(fixture_kwargs, kernel_pool),
+        )
+
+    def __repr__(self):
+        """Represent the class instance."""
+        return (
+            f"NotebookWorkerPool(workers={self.workers}, pending={len(self._futures)})"
+        )
+
+    def submit(self, key: Hashable, path: str) -> None:
+        """Submit a notebook to be checked."""
+        if key in self._futures:
+            raise KeyError(f"job already submitted: {key}")
+        self._futures[key] = self._executor.submit(_check, path)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return whether a job, whose result is not yet retrieved, exists."""
+        return key in self._futures
+
+    def result(self, key: Hashable) -> tuple[NBRegressionResult, float]:
+        """Wait for, and return, the result of a job (raising any exception).
+
+        :returns: (result, duration of the check)
+        """
+        return self._futures.pop(key).result()
+
+    def shutdown(self) -> None:
+        """Cancel all unstarted jobs, and stop the worker processes."""
+        self._futures = {}
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,118 @@
+"""Tests for the execution result cache."""
+
+import nbformat
+
+from pytest_notebook.cache import CellCache, ExecutionCache
+
+KERNELSPEC = {
+    "kernelspec": {"name": "python3", "display_name": "Python 3", "language": "python"}
+}
+
+
+def _notebook(source="print(1)", markdown="# title"):
+    return nbformat.v4.new_notebook(
+        cells=[
+            nbformat.v4.new_markdown_cell(markdown),
+            nbformat.v4.new_code_cell(source),
+        ],
+        metadata=KERNELSPEC,
+    )
+
+
+def test_key(tmp_path):
+    """Test the cache key only depends on code, tags, settings, cwd and dependencies."""
+    (tmp_path / "data.csv").write_text("a,b")
+    cache = ExecutionCache(
+        tmp_path / "cache", dependencies=["*.csv"], root_dir=tmp_path
+    )
+    key = cache.key(_notebook(), {"timeout": 10})
+    assert key == cache.key(_notebook(markdown="# other"), {"timeout": 10})
+    assert key != cache.key(_notebook(source="print(2)"), {"timeout": 10})
+    tagged = _notebook()
+    tagged.cells[1].metadata.tags = ["raises-exception"]
+    assert key != cache.key(tagged, {"timeout": 10})
+    assert key != cache.key(_notebook(), {"timeout": 20})
+    # the working directory is relative to the root directory
+    cwd_key = cache.key(_notebook(), {"timeout": 10}, cwd=tmp_path / "a")
+    assert cwd_key not in (key, cache.key(_notebook(), {"timeout": 10}, cwd="b"))
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "data.csv").write_text("a,b")
+    other_cache = ExecutionCache(
+        tmp_path / "cache", dependencies=["*.csv"], root_dir=tmp_path / "other"
+    )
+    assert cwd_key == other_cache.key(
+        _notebook(), {"timeout": 10}, cwd=tmp_path / "other" / "a"
+    )
+    (tmp_path / "data.csv").write_text("a,b,c")
+    new_cache = ExecutionCache(
+        tmp_path / "cache", dependencies=["*.csv"], root_dir=tmp_path
+    )
+    assert key != new_cache.key(_notebook(), {"timeout": 10})
+
+
+def test_get_set(tmp_path):
+    """Test cached outputs are applied to the current notebook."""
+    cache = ExecutionCache(tmp_path)
+    executed = _notebook()
+    executed.metadata["language_info"] = {"name": "python"}
+    executed.cells[1].execution_count = 1
+    executed.cells[1].outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="1\n")
+    ]
+    assert cache.get("key", _notebook()) is None
+    cache.set("key", executed, {"a": 1})
+    notebook, resources = cache.get("key", _notebook(markdown="# other"))
+    assert resources == {"a": 1}
+    assert notebook.metadata.language_info == {"name": "python"}
+    assert notebook.cells[0].source == "# other"
+    assert notebook.cells[1].outputs == executed.cells[1].outputs
+    assert notebook.cells[1].execution_count == 1
+
+
+def test_evict(tmp_path):
+    """Test least recently used entries are evicted."""
+    cache = ExecutionCache(tmp_path, max_size=0)
+    cache.set("key1", _notebook(), {})
+    assert cache.get("key1", _notebook()) is None
+    cache.max_size = 10000
+    cache.set("key1", _notebook(), {})
+    cache.set("key2", _notebook(), {})
+    assert cache.get("key1", _notebook()) is not None
+    assert cache.get("key2", _notebook()) is not None
+    cache.clear()
+    assert cache.get("key1", _notebook()) is None
+
+
+def test_cell_cache(tmp_path):
+    """Test the cell cache key, and storing outputs (and namespaces)."""
+    (tmp_path / "data.csv").write_text("a,b")
+    cache = CellCache(tmp_path / "cells")
+    key = cache.key("print(1)", KERNELSPEC["kernelspec"], ["*.csv"], (), tmp_path)
+    assert key == cache.key(
+        "print(1)", KERNELSPEC["kernelspec"], ["*.csv"], (), tmp_path
+    )
+    assert key != cache.key(
+        "print(2)", KERNELSPEC["kernelspec"], ["*.csv"], (), tmp_path
+    )
+    assert key != cache.key(
+        "print(1)", KERNELSPEC["kernelspec"], ["*.csv"], ["x"], tmp_path
+    )
+    (tmp_path / "data.csv").write_text("a,b,c")
+    assert key != cache.key(
+        "print(1)", KERNELSPEC["kernelspec"], ["*.csv"], (), tmp_path
+    )
+
+    outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    assert cache.get("key") is None
+    cache.set("key", outputs)
+    assert cache.get("key") == {"outputs": outputs, "namespace": None}
+    # an entry whose namespace pickle is missing is invalid
+    cache.set("key", outputs, namespace=True)
+    assert cache.get("key") is None
+    cache.namespace_path("key").write_bytes(b"data")
+    cache.set("key", outputs, namespace=True)
+    assert cache.get("key")["namespace"] == cache.namespace_path("key")
+    cache.max_size = 0
+    cache.evict()
+    assert cache.get("key") is None
+    assert not cache.namespace_path("key").exists()
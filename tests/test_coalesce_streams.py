@@ -74,3 +74,5 @@ def test_coalesce_streams():
     )
     new_notebook, _ = coalesce_streams(notebook, {})
     assert new_notebook == expected
+    # the initial notebook is not modified
+    assert notebook.cells[0].outputs[0]["text"] == "hallo1\n"
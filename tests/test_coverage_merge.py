@@ -0,0 +1,46 @@
+"""Tests for merging notebook coverage in bulk."""
+
+from coverage import Coverage, CoverageData
+
+from pytest_notebook.coverage_merge import CoverageMerger
+
+
+def _write_data_file(path, lines):
+    data = CoverageData(basename=str(path))
+    data.add_lines(lines)
+    data.write()
+    return str(path)
+
+
+def test_merge(tmp_path):
+    """Test data files are buffered, then merged in a single update."""
+    cov = Coverage(data_file=None, config_file=False)
+    merger = CoverageMerger(cov)
+    merger.add(_write_data_file(tmp_path / "data1", {"/src/a.py": [1, 2]}))
+    merger.add(
+        _write_data_file(tmp_path / "data2", {"/src/a.py": [3], "/src/b.py": [1]})
+    )
+    assert len(merger) == 2
+    assert cov.get_data().measured_files() == set()
+
+    assert merger.merge() == 2
+    assert len(merger) == 0
+    data = cov.get_data()
+    assert sorted(data.lines("/src/a.py")) == [1, 2, 3]
+    assert sorted(data.lines("/src/b.py")) == [1]
+    # nothing is left to merge
+    assert merger.merge() == 0
+
+
+def test_merge_with_aliases(tmp_path):
+    """Test the path aliases of the coverage configuration are applied."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("a = 1\n")
+    config = tmp_path / "coveragerc"
+    config.write_text(f"[paths]\nsource =\n    {tmp_path}/src/\n    /other/src/\n")
+    cov = Coverage(data_file=None, config_file=str(config))
+    merger = CoverageMerger(cov)
+    merger.add(_write_data_file(tmp_path / "data", {"/other/src/a.py": [1]}))
+    merger.merge()
+    assert cov.get_data().measured_files() == {str(tmp_path / "src" / "a.py")}
+    assert merger.aliases() is merger.aliases()
@@ -0,0 +1,87 @@
+"""Tests for rendering text diffs in-process."""
+
+import shutil
+
+from nbdime.prettyprint import PrettyPrintConfig, diff_render_with_git
+import pytest
+
+from pytest_notebook.diff_render import render_diff
+
+CASES = [
+    ("a\nb\n", "a\nc\n"),
+    ("a\nb\n", "a\nb"),
+    ("a\nb", "a\nc"),
+    ("", "a\nb\n"),
+    ("a\nb\n", ""),
+    ("def f():\n" + "x\n" * 10, "def f():\n" + "x\n" * 9 + "y\n"),
+    ("1\n2\n3\n4\n5\n6\n7\n8\n9\n10\n", "0\n2\n3\n4\n5\n6\n7\n8\n9\nten\n"),
+    ("x\nb\nb\ny\n", "x\nb\ny\n"),
+    ("x = 1\n", "x = 1  \n \ty\n\n"),
+    ("a b c\nd\n", "a B c\nd e\n"),
+    (
+        "".join(f"{i}\n" for i in range(20)) + "\n\n",
+        "".join(f"{i}\n" for i in range(19)) + "\n",
+    ),
+    ("a 1\nb 2\nc\n", "b 2 changed\nc\n"),
+]
+
+
+def test_render_diff():
+    assert render_diff("a\nb\n", "a\nb\n") == ""
+    assert render_diff("a\nb\n", "a\nc\n", use_color=False) == (
+        "@@ -1,2 +1,2 @@\n a\n-b\n+c\n"
+    )
+    assert render_diff("a\nb\n", "a\nc\n", use_color=True) == (
+        "\x1b[36m@@ -1,2 +1,2 @@\x1b[m\n a\x1b[m\n\x1b[31m-b\x1b[m\n"
+        "\x1b[32m+\x1b[m\x1b[32mc\x1b[m\n"
+    )
+    assert render_diff("a\nb\n", "a\nc\n", color_words=True) == (
+        "\x1b[36m@@ -1,2 +1,2 @@\x1b[m\na\x1b[m\n\x1b[31mb\x1b[m\x1b[32mc\x1b[m\n"
+    )
+
+
+def test_render_diff_hunks():
+    """Test distant changes are split into hunks, with the "function" line."""
+    initial = "def f():\n" + "".join(f"{i}\n" for i in range(10))
+    final = initial.replace("0\n", "zero\n").replace("9\n", "nine\n")
+    assert render_diff(initial, final, use_color=False) == (
+        "@@ -1,5 +1,5 @@\n def f():\n-0\n+zero\n 1\n 2\n 3\n"
+        "@@ -8,4 +8,4 @@ def f():\n 6\n 7\n 8\n-9\n+nine\n"
+    )
+
+
+def test_render_diff_trailing_blank():
+    """Test trailing blank lines are kept as context (as for ``git diff``)."""
+    initial = "".join(f"line {i}\n" for i in range(1, 20)) + "\n\n"
+    final = "".join(f"line {i}\n" for i in range(1, 19)) + "\n"
+    assert render_diff(initial, final, use_color=False) == (
+        "@@ -16,6 +16,4 @@ line 15\n line 16\n line 17\n line 18\n-line 19\n-\n \n"
+    )
+
+
+def test_render_diff_words_deleted_line():
+    """Test a deleted line keeps its line break, when highlighting words."""
+    initial = "line 1 value=0\nline 2 value=5\nline 3\n"
+    final = "line 2 value=5 changed\nline 3\n"
+    assert render_diff(initial, final, color_words=True) == (
+        "\x1b[36m@@ -1,3 +1,2 @@\x1b[m\n"
+        "line\x1b[31m1 value=0\x1b[m\n\x1b[31mline\x1b[m 2 value=5 \x1b[32mchanged\x1b[m\n"
+        "line 3\x1b[m\n"
+    )
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not available")
+@pytest.mark.parametrize("initial,final", CASES)
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"use_color": False},
+        {"use_color": True},
+        {"use_color": True, "color_words": True},
+    ],
+    ids=["plain", "color", "color_words"],
+)
+def test_render_diff_as_git(initial, final, options):
+    """Test the rendered diff is the same as that of ``git diff``."""
+    expected = diff_render_with_git(initial, final, PrettyPrintConfig(**options))
+    assert render_diff(initial, final, **options) == expected
@@ -1,11 +1,17 @@
+import asyncio
 import os
 from textwrap import dedent
+import time
 
 from coverage import CoverageData
+from jupyter_client.manager import AsyncKernelManager
 import nbformat
+import pytest
 
-from pytest_notebook.execution import execute_notebook
-from pytest_notebook.notebook import create_cell, create_notebook
+from pytest_notebook.cache import CellCache, ExecutionCache
+from pytest_notebook.execution import COVERAGE_KEY, execute_notebook
+from pytest_notebook.kernel_pool import KernelPool
+from pytest_notebook.notebook import CellCacheConfig, create_cell, create_notebook
 
 PATH = os.path.dirname(os.path.realpath(__file__))
 
@@ -59,3 +65,390 @@ def test_execute_notebook_with_coverage():
     assert isinstance(exec_results.notebook, nbformat.NotebookNode)
     assert isinstance(exec_results.coverage_dict, dict)
     assert isinstance(exec_results.coverage_data(), CoverageData)
+
+
+def test_execute_notebook_with_branch_coverage(tmp_path):
+    """Test branch coverage data is exchanged via a data file, and cached."""
+    config_file = tmp_path / "coveragerc"
+    config_file.write_text("[run]\nbranch = True\n")
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("import package\npackage.func()")],
+    )
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    exec_cache = ExecutionCache(tmp_path / "cache")
+    results = []
+    for _ in range(2):
+        exec_results = execute_notebook(
+            notebook,
+            cwd=os.path.join(PATH, "raw_files", "coverage_test"),
+            with_coverage=True,
+            cov_config_file=str(config_file),
+            cov_data_dir=str(data_dir),
+            exec_cache=exec_cache,
+        )
+        if exec_results.exec_error:
+            raise exec_results.exec_error
+        assert os.path.dirname(exec_results.resources[COVERAGE_KEY]) == str(data_dir)
+        assert exec_results.coverage_data().has_arcs()
+        results.append(exec_results)
+    # the second result is retrieved from the cache, into a new data file
+    assert results[0].resources[COVERAGE_KEY] != results[1].resources[COVERAGE_KEY]
+    assert results[0].coverage_dict == results[1].coverage_dict
+    assert any(path.endswith("package.py") for path in results[1].coverage_dict)
+    assert len(list(data_dir.iterdir())) == 2
+
+
+def test_execute_notebook_cache_tags(tmp_path):
+    """Test the cache is not used, if a cell's tags change how it is executed."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            nbformat.v4.new_code_cell(
+                "raise ValueError()", metadata={"tags": ["raises-exception"]}
+            )
+        ],
+    )
+    exec_cache = ExecutionCache(tmp_path / "cache")
+    exec_results = execute_notebook(
+        notebook, exec_cache=exec_cache, exec_mode="inprocess"
+    )
+    assert exec_results.exec_error is None
+    notebook.cells[0].metadata.tags = []
+    exec_results = execute_notebook(
+        notebook, exec_cache=exec_cache, exec_mode="inprocess"
+    )
+    assert exec_results.exec_error is not None
+
+
+def test_execute_notebook_with_coverage_core():
+    """Test selecting the coverage core used in the kernel."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("import package\npackage.func()")],
+    )
+    exec_results = execute_notebook(
+        notebook,
+        cwd=os.path.join(PATH, "raw_files", "coverage_test"),
+        with_coverage=True,
+        cov_core="pytrace",
+        record_timing=True,
+    )
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    assert exec_results.coverage_core == "PyTracer"
+    assert exec_results.coverage_setup_teardown() > 0
+    assert any(path.endswith("package.py") for path in exec_results.coverage_dict)
+
+
+def test_execute_notebook_inprocess(tmp_path):
+    """Test executing a notebook in-process gives the same outputs as a subprocess."""
+    (tmp_path / "data.txt").write_text("data")
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell("import sys\nprint(open('data.txt').read())\nx = 1\nx"),
+            create_cell("print(x, file=sys.stderr)\nraise ValueError(x)"),
+            create_cell(
+                "from IPython.display import Markdown, display\ndisplay(Markdown('a'))"
+            ),
+        ],
+    )
+    results = {
+        exec_mode: execute_notebook(
+            notebook, cwd=str(tmp_path), allow_errors=True, exec_mode=exec_mode
+        )
+        for exec_mode in ("subprocess", "inprocess")
+    }
+    outputs = {
+        exec_mode: [cell.outputs for cell in result.notebook.cells]
+        for exec_mode, result in results.items()
+    }
+    for cell_outputs in outputs.values():
+        cell_outputs[1][-1].pop("traceback")
+    assert outputs["inprocess"] == outputs["subprocess"]
+    # the kernel namespace is not shared between notebooks
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("print('x' in globals())")],
+    )
+    result = execute_notebook(notebook, exec_mode="inprocess")
+    assert result.notebook.cells[0].outputs[0].text == "False\n"
+
+
+def test_execute_notebook_inprocess_threads(tmp_path):
+    """Test in-process notebooks executed from several threads run one at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell("import os, time\ncwd = os.getcwd()"),
+            create_cell("time.sleep(0.2)\nprint(cwd == os.getcwd())"),
+            create_cell("print(os.path.basename(cwd))"),
+        ],
+    )
+    paths = [tmp_path / "a", tmp_path / "b"]
+    for path in paths:
+        path.mkdir()
+    cwd = os.getcwd()
+    with ThreadPoolExecutor(2) as executor:
+        results = list(
+            executor.map(
+                lambda path: execute_notebook(
+                    notebook, cwd=str(path), exec_mode="inprocess"
+                ),
+                paths,
+            )
+        )
+    assert os.getcwd() == cwd
+    for path, result in zip(paths, results, strict=True):
+        assert result.exec_error is None
+        assert result.notebook.cells[1].outputs[0].text == "True\n"
+        assert result.notebook.cells[2].outputs[0].text == f"{path.name}\n"
+
+
+def test_execute_notebook_inprocess_from_metadata():
+    """Test the execution mode is read from the notebook metadata."""
+    notebook = create_notebook(
+        metadata={
+            "kernelspec": {"name": "python3", "display_name": "Python 3"},
+            "nbreg": {"exec_mode": "inprocess"},
+        },
+        cells=[create_cell(f"import os\nprint(os.getpid() == {os.getpid()})")],
+    )
+    result = execute_notebook(notebook)
+    assert result.notebook.cells[0].outputs[0].text == "True\n"
+    result = execute_notebook(notebook, exec_mode="subprocess")
+    assert result.notebook.cells[0].outputs[0].text == "False\n"
+
+
+ORIGINAL_TIMING = {"iopub.status.busy": "2020-01-01T00:00:00.000000Z"}
+
+
+def test_execute_notebook_with_timing():
+    """Test recording the timing of execution, outside of the notebook."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell("import time\ntime.sleep(0.2)"),
+            create_cell("# Title", cell_type="markdown"),
+            create_cell("print(1)", metadata={"execution": ORIGINAL_TIMING}),
+        ],
+    )
+    exec_results = execute_notebook(notebook, record_timing=True, with_coverage=True)
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    timing = exec_results.timing
+    assert timing["kernel_start"] > 0
+    assert timing["coverage_setup"] > 0
+    assert timing["coverage_teardown"] > 0
+    assert timing["total"] > timing["kernel_start"]
+    assert [cell["index"] for cell in timing["cells"]] == [0, 2]
+    for cell in timing["cells"]:
+        assert cell["queued"] <= cell["start"] <= cell["end"]
+    assert exec_results.cell_durations()[0] >= 0.2
+    # the notebook metadata is not changed
+    assert "execution" not in exec_results.notebook.cells[0].metadata
+    assert exec_results.notebook.cells[2].metadata == {"execution": ORIGINAL_TIMING}
+    assert execute_notebook(notebook).timing is None
+
+
+def test_execute_notebook_with_resources():
+    """Test recording the resource usage of the kernel process."""
+    pytest.importorskip("psutil")
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell("data = bytearray(50 * 2**20)"),
+            create_cell("# Title", cell_type="markdown"),
+            create_cell("sum(range(10**6))"),
+        ],
+    )
+    exec_results = execute_notebook(notebook, record_resources=True)
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    usage = exec_results.resource_usage
+    assert usage["peak_rss"] > 50 * 2**20
+    assert usage["cpu_user"] > 0
+    assert usage["wall"] > 0
+    assert [cell["index"] for cell in usage["cells"]] == [0, 2]
+    for cell in usage["cells"]:
+        assert cell["peak_rss"] <= usage["peak_rss"]
+        assert cell["cpu_user"] >= 0
+        assert cell["cpu_system"] >= 0
+    assert usage["cells"][0]["peak_rss"] > 50 * 2**20
+    assert execute_notebook(notebook).resource_usage is None
+
+
+def test_execute_notebook_with_output_limits():
+    """Test that outputs are limited, as they are collected."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell(
+                "import sys, time\n"
+                "for i in range(5):\n"
+                "    print('x' * 100, flush=True)\n"
+                "    time.sleep(0.01)\n"
+                "'y' * 1000"
+            ),
+        ],
+    )
+    exec_results = execute_notebook(notebook, max_output_bytes=150)
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    outputs = exec_results.notebook.cells[0].outputs
+    text = "".join(out.text for out in outputs if out.output_type == "stream")
+    assert text.startswith("x" * 100 + "\n" + "x" * 49 + "\n[355 bytes truncated")
+    assert outputs[-1].data["text/plain"].startswith("[1002 bytes truncated")
+
+
+def test_execute_notebook_with_kernel_pool():
+    """Test that a kernel pool re-uses kernels across executions."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("import os\nprint(os.getpid())")],
+    )
+    with KernelPool() as pool:
+        first = execute_notebook(notebook, kernel_pool=pool)
+        second = execute_notebook(notebook, kernel_pool=pool)
+        assert repr(pool) == "KernelPool(kernels=1, idle=1)"
+    assert first.exec_error is None
+    assert second.exec_error is None
+    # the kernel is restarted between notebooks, so has a new process
+    assert first.notebook.cells[0].outputs != second.notebook.cells[0].outputs
+    assert repr(pool) == "KernelPool(kernels=0, idle=0)"
+
+
+class _SlowRestartManager(AsyncKernelManager):
+    async def restart_kernel(self, now=False, **kw):
+        await asyncio.sleep(1)
+        await super().restart_kernel(now=now, **kw)
+        self.restarted = True
+
+
+def test_kernel_pool_restart_in_background():
+    """Test pooled kernels are restarted in the background, after release."""
+    with KernelPool(kernel_manager_class=_SlowRestartManager) as pool:
+        km = pool.acquire("python3")
+        start_time = time.perf_counter()
+        pool.release(km)
+        assert time.perf_counter() - start_time < 1
+        assert not getattr(km, "restarted", False)
+        # acquiring the kernel waits for its restart
+        assert pool.acquire("python3") is km
+        assert km.restarted
+        pool.release(km)
+    assert repr(pool) == "KernelPool(kernels=0, idle=0)"
+
+
+def test_execute_notebook_with_kernel_pool_coverage():
+    """Test coverage is collected from a pooled kernel."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("from pytest_notebook.notebook import create_notebook")],
+    )
+    with KernelPool() as pool:
+        exec_results = execute_notebook(
+            notebook,
+            cwd=os.path.join(PATH, "raw_files"),
+            with_coverage=True,
+            kernel_pool=pool,
+        )
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    assert exec_results.has_coverage
+
+
+def test_execute_notebook_with_preload(tmp_path):
+    """Test that preloaded modules are imported before the kernel is forked."""
+    tmp_path.joinpath("preload_mod.py").write_text("import os\nPID = os.getpid()\n")
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell(
+                "import os, sys\n"
+                "print('preload_mod' in sys.modules)\n"
+                "print(sys.modules['preload_mod'].PID != os.getpid())"
+            )
+        ],
+    )
+    exec_env = {"PYTHONPATH": str(tmp_path)}
+    exec_results = execute_notebook(
+        notebook, exec_env=exec_env, preload_modules=["preload_mod"]
+    )
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    assert exec_results.notebook.cells[0].outputs[0].text == "True\nTrue\n"
+    with KernelPool() as pool:
+        exec_results = execute_notebook(
+            notebook,
+            exec_env=exec_env,
+            preload_modules=["preload_mod"],
+            kernel_pool=pool,
+        )
+    if exec_results.exec_error:
+        raise exec_results.exec_error
+    assert exec_results.notebook.cells[0].outputs[0].text == "True\nTrue\n"
+
+
+def test_execute_notebook_with_cell_cache(tmp_path):
+    """Test that the outputs (and namespace) of cached cells are replayed."""
+    tmp_path.joinpath("data.txt").write_text("a")
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[
+            create_cell(
+                "import random\n"
+                "value = random.random()\n"
+                "data = open('data.txt').read()\n"
+                "print(value)"
+            ),
+            create_cell("print(value, data)"),
+        ],
+    )
+    cache = CellCache(tmp_path / "cells")
+    cached_cells = {0: CellCacheConfig(("data.txt",), ("value", "data"))}
+
+    def _execute():
+        exec_results = execute_notebook(
+            notebook,
+            cwd=str(tmp_path),
+            cell_cache=cache,
+            cached_cells=cached_cells,
+        )
+        if exec_results.exec_error:
+            raise exec_results.exec_error
+        return [cell.outputs[0].text for cell in exec_results.notebook.cells]
+
+    first = _execute()
+    assert first[1] == f"{first[0].strip()} a\n"
+    assert _execute() == first
+    # changing an input invalidates the cache entry
+    tmp_path.joinpath("data.txt").write_text("b")
+    second = _execute()
+    assert second[0] != first[0]
+    assert second[1] == f"{second[0].strip()} b\n"
+
+
+def test_execute_notebook_with_cell_cache_execution_count(tmp_path):
+    """Test replaying cached cells advances the kernel execution count."""
+    notebook = create_notebook(
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3"}},
+        cells=[create_cell("x = 1"), create_cell("print(1)"), create_cell("x + 1")],
+    )
+    cache = CellCache(tmp_path / "cells")
+    cached_cells = {0: CellCacheConfig((), ("x",)), 1: CellCacheConfig((), ())}
+
+    for _ in range(2):
+        exec_results = execute_notebook(
+            notebook, cwd=str(tmp_path), cell_cache=cache, cached_cells=cached_cells
+        )
+        if exec_results.exec_error:
+            raise exec_results.exec_error
+        cell = exec_results.notebook.cells[2]
+        assert cell.execution_count == 3
+        assert cell.outputs[0].data["text/plain"] == "2"
+        assert cell.outputs[0].execution_count == 3
@@ -1,7 +1,14 @@
 import json
 import os
 
-from pytest_notebook.diffing import filter_diff
+from nbdime.diff_format import op_add, op_patch
+
+from pytest_notebook.diffing import (
+    DiffPathMatcher,
+    cell_path,
+    filter_diff,
+    offset_cell_diff,
+)
 
 PATH = os.path.dirname(os.path.realpath(__file__))
 
@@ -90,3 +97,53 @@ def test_filter_diff_complex():
         ],
     )
     assert diff == []
+
+
+def test_diff_path_matcher():
+    matcher = DiffPathMatcher(
+        ["/cells/*/outputs", "/cells/1", "/cells/*/outputs/*/data/text", "/metadata"]
+    )
+    assert matcher.matches("/cells/0/outputs")
+    assert matcher.matches("/cells/0/outputs/0")
+    assert matcher.matches("/cells/1/source")
+    assert matcher.matches("/cells/2/outputs/0/data/text/plain")
+    assert matcher.matches("/metadata/kernelspec")
+    assert not matcher.matches("/cells/11/source")
+    assert not matcher.matches("/cells/2/outputs_x")
+    assert not DiffPathMatcher(["/cells/*/outputs/*/data/text"]).matches(
+        "/cells/2/outputs/0/data/textual"
+    )
+    # the last segment is always starred, if it is an integer
+    assert not matcher.matches("/cells/1")
+
+
+def test_filter_diff_matcher():
+    """Test filtering with a compiled matcher, and that unfiltered entries are shared."""
+    diff = get_test_diff()
+    matcher = DiffPathMatcher(["/cells/*/outputs"])
+    filtered = filter_diff(diff, matcher)
+    assert filtered == filter_diff(diff, ["/cells/*/outputs"])
+    unfiltered = filter_diff(diff, DiffPathMatcher(["/metadata"]))
+    assert unfiltered == diff
+    assert all(new is old for new, old in zip(unfiltered, diff))
+
+
+def test_cell_path():
+    assert cell_path("/cells/2/outputs", 2) == "/cells/0/outputs"
+    assert cell_path("/cells/2", 2) == "/cells/0"
+    assert cell_path("/cells/*/outputs", 2) == "/cells/*/outputs"
+    assert cell_path("/cells", 2) == "/cells"
+    assert cell_path("/metadata/kernelspec", 2) == "/metadata/kernelspec"
+    assert cell_path("/cells/1/outputs", 2) is None
+    assert cell_path("/cells/12/outputs", 2) is None
+
+
+def test_offset_cell_diff():
+    diff = [
+        op_patch("cells", [op_patch(0, [op_add("execution_count", 1)])]),
+        op_add("metadata", {}),
+    ]
+    assert offset_cell_diff(diff, 3) == [
+        op_patch("cells", [op_patch(3, [op_add("execution_count", 1)])]),
+        op_add("metadata", {}),
+    ]
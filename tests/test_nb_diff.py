@@ -1,13 +1,16 @@
 import json
 import os
 
+from nbdime.diffing.generic import diff as nbdime_diff
 import nbformat
 import pytest
 
 from pytest_notebook.diffing import (
     diff_notebooks,
     diff_to_string,
+    filter_diff,
     load_nbdime_ignore_config,
+    project_notebooks,
 )
 from pytest_notebook.notebook import mapping_to_dict
 
@@ -33,6 +36,72 @@ def test_notebooks_unequal(data_regression):
     data_regression.check(mapping_to_dict(diff))
 
 
+def test_notebooks_only_changed_cells_diffed(monkeypatch):
+    """Test that only unequal cells are passed to nbdime."""
+    import pytest_notebook.diffing
+
+    initial = nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell(f"print({i})") for i in range(3)]
+    )
+    final = nbformat.from_dict(json.loads(json.dumps(initial)))
+    diffed = []
+
+    def _diff(a, b, path="", config=None):
+        diffed.append(path)
+        return nbdime_diff(a, b, path=path, config=config)
+
+    monkeypatch.setattr(pytest_notebook.diffing, "diff", _diff)
+    assert diff_notebooks(initial, final) == []
+    assert diffed == []
+
+    final.cells[1].source = "print(10)"
+    diff = diff_notebooks(initial, final)
+    assert diffed.count("/cells/*") == 1
+    assert diff[0]["key"] == "cells"
+    assert [entry["key"] for entry in diff[0]["diff"]] == [1]
+
+
+def test_project_notebooks():
+    """Test ignored values, present in both notebooks, are replaced before diffing."""
+    initial = nbformat.v4.new_notebook(
+        cells=[
+            nbformat.v4.new_code_cell("a", execution_count=1),
+            nbformat.v4.new_code_cell("b", execution_count=2),
+        ]
+    )
+    initial.cells[0].outputs = [
+        nbformat.v4.new_output("error", ename="E", evalue="", traceback=["x"]),
+        nbformat.v4.new_output("display_data", data={"image/png": "abc"}),
+    ]
+    initial.cells[1].outputs = [
+        nbformat.v4.new_output("error", ename="E", evalue="", traceback=["x"])
+    ]
+    final = nbformat.from_dict(json.loads(json.dumps(initial)))
+    final.cells[0].outputs[0].traceback = ["y"]
+    final.cells[0].outputs[1].data["image/png"] = "def"
+    # outputs of different types are diffed as a whole, so are not projected
+    final.cells[1].outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="x"),
+    ]
+    paths = ["/cells/*/outputs/*/traceback", "/cells/*/outputs/*/data/image/png"]
+    initial_json = json.dumps(initial, sort_keys=True)
+
+    projected_initial, projected_final = project_notebooks(initial, final, paths)
+
+    assert json.dumps(initial, sort_keys=True) == initial_json
+    assert projected_initial.cells[0].outputs[0].traceback == []
+    assert projected_final.cells[0].outputs[0].traceback == []
+    assert projected_final.cells[0].outputs[1].data["image/png"] == ""
+    assert projected_final.cells[1].outputs is final.cells[1].outputs
+    assert projected_initial.cells[1] is initial.cells[1]
+    assert [
+        e["key"] for e in diff_notebooks(projected_initial, projected_final)[0].diff
+    ] == [1]
+    assert filter_diff(
+        diff_notebooks(projected_initial, projected_final), paths
+    ) == filter_diff(diff_notebooks(initial, final), paths)
+
+
 def test_notebooks_unequal_removed_outputs():
     """Test that removed trailing outputs diff at the correct indices."""
     cell = nbformat.v4.new_code_cell("print('a')\nprint('b')", execution_count=1)
@@ -132,3 +201,27 @@ def test_diff_to_string(file_regression):
     )
     diff = diff_notebooks(initial, final)
     file_regression.check(diff_to_string(initial, diff, use_color=False))
+
+
+@pytest.mark.parametrize("use_color", [False, True])
+def test_diff_to_string_inprocess(monkeypatch, use_color):
+    """Test in-process rendering matches rendering with git, without subprocesses."""
+    import subprocess
+
+    initial = nbformat.read(
+        os.path.join(path, "raw_files", "different_outputs.ipynb"), as_version=4
+    )
+    final = nbformat.read(
+        os.path.join(path, "raw_files", "different_outputs_altered.ipynb"), as_version=4
+    )
+    diff = diff_notebooks(initial, final)
+    expected = diff_to_string(initial, diff, use_color=use_color)
+
+    def _popen(*args, **kwargs):
+        raise AssertionError("subprocess called")
+
+    monkeypatch.setattr(subprocess, "Popen", _popen)
+    string = diff_to_string(initial, diff, use_color=use_color, renderer="inprocess")
+    assert string == expected
+    with pytest.raises(ValueError, match="renderer"):
+        diff_to_string(initial, diff, renderer="other")
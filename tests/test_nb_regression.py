@@ -1,7 +1,10 @@
 """Tests for ``NBRegressionFixture``."""
 
+import asyncio
 import os
+import pickle
 
+from coverage import CoverageData
 import nbformat
 import pytest
 
@@ -42,6 +45,51 @@ def test_regression_exec_env(tmp_path):
     fixture.check(str(path))
 
 
+def test_async_check(tmp_path):
+    """Test checking notebooks concurrently, with ``async_check``."""
+    paths = []
+    for index in range(2):
+        cell = nbformat.v4.new_code_cell(f"print({index})", execution_count=1)
+        cell.outputs = [
+            nbformat.v4.new_output("stream", name="stdout", text=f"{index}\n")
+        ]
+        notebook = nbformat.v4.new_notebook(
+            cells=[cell],
+            metadata={
+                "kernelspec": {
+                    "name": "python3",
+                    "display_name": "Python 3",
+                    "language": "python",
+                }
+            },
+        )
+        paths.append(tmp_path / f"test_nb{index}.ipynb")
+        nbformat.write(notebook, str(paths[-1]))
+    fixture = NBRegressionFixture(diff_ignore=("/metadata/language_info",))
+
+    async def check_all():
+        semaphore = asyncio.Semaphore(2)
+
+        async def check(path):
+            async with semaphore:
+                return await fixture.async_check(str(path))
+
+        return await asyncio.gather(*(check(path) for path in paths))
+
+    results = asyncio.run(check_all())
+    assert [result.nb_final.cells[0].outputs[0].text for result in results] == [
+        "0\n",
+        "1\n",
+    ]
+
+    with pytest.raises(NBRegressionError):
+        asyncio.run(
+            fixture.async_check(
+                os.path.join(PATH, "raw_files", "simple-diff-output.ipynb")
+            )
+        )
+
+
 def test_regression_fail():
     """Test a regression that will fail."""
     fixture = NBRegressionFixture()
@@ -49,6 +97,169 @@ def test_regression_fail():
         fixture.check(os.path.join(PATH, "raw_files", "simple-diff-output.ipynb"))
 
 
+def test_check_result():
+    """Test a result checked without raising errors can be pickled,
+    and its errors raised by another fixture.
+    """
+    path = os.path.join(PATH, "raw_files", "simple-diff-output.ipynb")
+    result = NBRegressionFixture().check(path, raise_errors=False)
+    assert result.exec_results is not None
+    assert result.diff_filtered
+    result = pickle.loads(pickle.dumps(result))
+
+    records = []
+    fixture = NBRegressionFixture(exec_callback=lambda *args: records.append(args))
+    with pytest.raises(NBRegressionError):
+        fixture.check_result(path, result)
+    assert records == [(path, result.exec_results)]
+    assert fixture.check_result(path, result, raise_errors=False) is result
+
+
+def test_diff_string_lazy(monkeypatch):
+    """Test the diff string is only rendered when accessed, and then cached."""
+    import pytest_notebook.nb_regression
+
+    calls = []
+
+    def _diff_to_string(*args, **kwargs):
+        calls.append(kwargs)
+        return "diff"
+
+    monkeypatch.setattr(
+        pytest_notebook.nb_regression, "diff_to_string", _diff_to_string
+    )
+    path = os.path.join(PATH, "raw_files", "simple-diff-output.ipynb")
+    fixture = NBRegressionFixture(exec_notebook=False, diff_use_color=False)
+    result = fixture.check(path)
+    assert calls == []
+    assert result.diff_string == "diff"
+    assert result.diff_string == "diff"
+    assert calls == [{"use_color": False, "color_words": False, "renderer": "external"}]
+
+
+def test_regression_fail_fast(tmp_path):
+    """Test execution is stopped at the first cell with an unignored difference."""
+    cells = [
+        nbformat.v4.new_code_cell("print(1)", execution_count=1),
+        nbformat.v4.new_code_cell("print(2)", execution_count=2),
+        nbformat.v4.new_code_cell("print(3)", execution_count=3),
+    ]
+    cells[0].outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    cells[1].outputs = [nbformat.v4.new_output("stream", name="stdout", text="x\n")]
+    cells[2].outputs = [nbformat.v4.new_output("stream", name="stdout", text="y\n")]
+    notebook = nbformat.v4.new_notebook(
+        cells=cells,
+        metadata={
+            "kernelspec": {
+                "name": "python3",
+                "display_name": "Python 3",
+                "language": "python",
+            }
+        },
+    )
+    path = tmp_path / "test_fail_fast.ipynb"
+    nbformat.write(notebook, str(path))
+    fixture = NBRegressionFixture(
+        diff_ignore=("/metadata/language_info",),
+        diff_fail_fast=True,
+        diff_use_color=False,
+    )
+    with pytest.raises(NBRegressionError, match="Execution stopped after cell 1"):
+        fixture.check(str(path))
+
+    result = fixture.check(str(path), raise_errors=False)
+    # the last cell is not executed
+    assert result.nb_final.cells[1].outputs[0].text == "2\n"
+    assert result.nb_final.cells[2].outputs[0].text == "y\n"
+    assert [diff.key for diff in result.diff_filtered[0].diff] == [1]
+
+    # the difference is ignored
+    fixture.diff_ignore = ("/metadata/language_info", "/cells/1/outputs")
+    with pytest.raises(NBRegressionError, match="/cells/2/outputs"):
+        fixture.check(str(path))
+
+
+def test_regression_budgets(tmp_path):
+    """Test that exceeded resource budgets are reported, alongside the diff."""
+    pytest.importorskip("psutil")
+    cells = [
+        nbformat.v4.new_code_cell(
+            "import time\ntime.sleep(0.5)",
+            execution_count=1,
+            metadata={"nbreg": {"max_seconds": 0.1}},
+        ),
+        nbformat.v4.new_code_cell(
+            "print(1)", execution_count=2, metadata={"nbreg": {"max_seconds": 10}}
+        ),
+    ]
+    cells[1].outputs = [nbformat.v4.new_output("stream", name="stdout", text="2\n")]
+    notebook = nbformat.v4.new_notebook(
+        cells=cells,
+        metadata={
+            "kernelspec": {
+                "name": "python3",
+                "display_name": "Python 3",
+                "language": "python",
+            },
+            "nbreg": {"max_memory_mb": 1},
+        },
+    )
+    path = tmp_path / "test_budgets.ipynb"
+    nbformat.write(notebook, str(path))
+    fixture = NBRegressionFixture(
+        diff_ignore=("/metadata/language_info",), diff_use_color=False
+    )
+    result = fixture.check(str(path), raise_errors=False)
+    assert len(result.budget_violations) == 2
+    assert result.budget_violations[0].startswith("notebook: peak memory")
+    assert result.budget_violations[1].startswith("cell 0: execution time")
+    with pytest.raises(NBRegressionError) as exc_info:
+        fixture.check(str(path))
+    message = str(exc_info.value)
+    assert "/cells/1/outputs/0/text" in message
+    assert "Resource budgets exceeded:\n- notebook: peak memory" in message
+
+    # only the budgets are exceeded
+    fixture.diff_ignore = ("/metadata/language_info", "/cells/1/outputs")
+    with pytest.raises(NBRegressionError, match=r"^Resource budgets exceeded"):
+        fixture.check(str(path))
+
+
+def test_regression_pipeline(tmp_path):
+    """Test cells are compared as they are executed,
+    including cells whose display is updated by later cells.
+    """
+    cells = [
+        nbformat.v4.new_code_cell("handle = display('a', display_id=True)"),
+        nbformat.v4.new_code_cell("import time\ntime.sleep(0.2)\nhandle.update('b')"),
+        nbformat.v4.new_code_cell("print(1)", execution_count=3),
+    ]
+    cells[0].outputs = [
+        nbformat.v4.new_output("display_data", data={"text/plain": "'b'"})
+    ]
+    cells[2].outputs = [nbformat.v4.new_output("stream", name="stdout", text="2\n")]
+    notebook = nbformat.v4.new_notebook(
+        cells=cells,
+        metadata={
+            "kernelspec": {
+                "name": "python3",
+                "display_name": "Python 3",
+                "language": "python",
+            }
+        },
+    )
+    path = tmp_path / "test_pipeline.ipynb"
+    nbformat.write(notebook, str(path))
+    fixture = NBRegressionFixture(
+        diff_ignore=("/metadata/language_info", "/cells/*/execution_count"),
+        diff_pipeline=True,
+        diff_use_color=False,
+    )
+    result = fixture.check(str(path), raise_errors=False)
+    assert result.nb_final.cells[0].outputs[0].data == {"text/plain": "'b'"}
+    assert [diff.key for diff in result.diff_filtered[0].diff] == [2]
+
+
 def test_regression_diff_ignore_pass():
     """Test a regression that will succeed by ignoring certain notebook paths."""
     fixture = NBRegressionFixture()
@@ -105,5 +316,7 @@ def test_regression_coverage():
     )
 
     assert COVERAGE_KEY in result.process_resources
-    assert "package.py" in result.process_resources[COVERAGE_KEY]
-    # assert "[1,2,3]" in result.process_resources[COVERAGE_KEY]
+    assert os.path.isfile(result.process_resources[COVERAGE_KEY])
+    data = CoverageData(basename=result.process_resources[COVERAGE_KEY])
+    data.read()
+    assert any(path.endswith("package.py") for path in data.measured_files())
@@ -1,14 +1,20 @@
 """Tests for pytest_notebook.notebook."""
 
+import pytest
+
 from pytest_notebook.notebook import (
     META_KEY,
+    CellCacheConfig,
     MetadataConfig,
+    NBConfigValidationError,
+    ResourceBudget,
     config_from_metadata,
     create_notebook,
     gather_json_paths,
     mapping_to_dict,
     prepare_cell,
     regex_replace_nb,
+    replace_json_paths,
 )
 
 
@@ -74,6 +80,17 @@ def test_gather_paths_filter_str():
     ]
 
 
+def test_replace_json_paths():
+    """Test only the containers along replaced paths are copied."""
+    dct = {"a": [{"b": 2}, {"c": "x"}], "d": {"e": 1}}
+    new_dct = replace_json_paths(dct, {("a", 1, "c"): "y"})
+    assert new_dct == {"a": [{"b": 2}, {"c": "y"}], "d": {"e": 1}}
+    assert dct == {"a": [{"b": 2}, {"c": "x"}], "d": {"e": 1}}
+    assert new_dct["a"][0] is dct["a"][0]
+    assert new_dct["d"] is dct["d"]
+    assert replace_json_paths(dct, {}) is dct
+
+
 def test_regex_replace_nb_no_change():
     """Test that, if no replacements are made, the notebook remains the same."""
     notebook = create_notebook()
@@ -127,6 +144,9 @@ def test_regex_replace_nb_segment_boundaries():
     new_notebook = regex_replace_nb(notebook, [("/cells/1", "cell", "replaced")])
     assert new_notebook.cells[1].source == "replaced1"
     assert new_notebook.cells[11].source == "cell11"
+    # unchanged cells are shared, and the initial notebook is not modified
+    assert new_notebook.cells[11] is notebook.cells[11]
+    assert notebook.cells[1].source == "cell1"
 
 
 def test_regex_replace_nb_output():
@@ -236,3 +256,81 @@ def test_config_from_metadata():
         ),
         diff_ignore={"/", "/cells/*/outputs", "/cells/1/", "/cells/1/outputs"},
     )
+
+
+def test_config_from_metadata_cache_cells():
+    """Test extraction of the cells whose outputs may be cached."""
+    notebook = create_notebook()
+    notebook.cells.extend(
+        [
+            prepare_cell({"cell_type": "code", "metadata": {"tags": ["nbreg-cache"]}}),
+            prepare_cell({"cell_type": "code", "metadata": {}}),
+            prepare_cell(
+                {
+                    "cell_type": "code",
+                    "metadata": {
+                        META_KEY: {
+                            "cache": {"inputs": ["*.csv"], "namespace": ["data"]}
+                        }
+                    },
+                }
+            ),
+            prepare_cell(
+                {
+                    "cell_type": "code",
+                    "metadata": {"tags": ["nbreg-cache"], META_KEY: {"cache": False}},
+                }
+            ),
+            prepare_cell(
+                {"cell_type": "markdown", "metadata": {"tags": ["nbreg-cache"]}}
+            ),
+        ]
+    )
+
+    config = config_from_metadata(notebook)
+
+    assert config.cache_cells == {
+        0: CellCacheConfig(),
+        2: CellCacheConfig(inputs=("*.csv",), namespace=("data",)),
+    }
+
+
+def test_config_from_metadata_cache_invalid():
+    """Test that invalid cell cache metadata is rejected."""
+    notebook = create_notebook()
+    notebook.cells.append(
+        prepare_cell(
+            {
+                "cell_type": "code",
+                "metadata": {META_KEY: {"cache": {"namespace": ["a b"]}}},
+            }
+        )
+    )
+    with pytest.raises(NBConfigValidationError):
+        config_from_metadata(notebook)
+
+
+def test_config_from_metadata_budgets():
+    """Test extraction of the notebook and cell resource budgets."""
+    notebook = create_notebook()
+    notebook.metadata[META_KEY] = {"max_seconds": 60}
+    notebook.cells.extend(
+        [
+            prepare_cell({"cell_type": "code", "metadata": {}}),
+            prepare_cell(
+                {
+                    "cell_type": "code",
+                    "metadata": {META_KEY: {"max_seconds": 1.5, "max_memory_mb": 100}},
+                }
+            ),
+        ]
+    )
+
+    config = config_from_metadata(notebook)
+
+    assert config.budget == ResourceBudget(max_seconds=60)
+    assert config.cell_budgets == {1: ResourceBudget(1.5, 100)}
+
+    notebook.metadata[META_KEY] = {"max_seconds": 0}
+    with pytest.raises(NBConfigValidationError):
+        config_from_metadata(notebook)
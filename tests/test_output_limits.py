@@ -0,0 +1,116 @@
+"""Tests for limiting the size of notebook outputs."""
+
+import hashlib
+from pathlib import Path
+
+import nbformat
+
+from pytest_notebook.output_limits import OutputLimiter, get_default_spill_dir
+from pytest_notebook.post_processors import coalesce_streams
+
+
+def _stream(text, name="stdout"):
+    return nbformat.v4.new_output("stream", name=name, text=text)
+
+
+def _notebook(*outputs):
+    cell = nbformat.v4.new_code_cell("print(1)", outputs=list(outputs))
+    return nbformat.v4.new_notebook(cells=[cell])
+
+
+def test_limit_stream():
+    """Test a stream is truncated once, across consecutive outputs."""
+    limiter = OutputLimiter(max_output_bytes=10)
+    outputs = []
+    for text in ["abcd", "efgh", "ijkl", "mnop"]:
+        outputs.append(_stream(text))
+        limiter.limit(outputs)
+    outputs.append(_stream("other", name="stderr"))
+    limiter.limit(outputs)
+    limiter.finish()
+    digest = hashlib.sha256(b"klmnop").hexdigest()[:16]
+    assert [out.text for out in outputs] == [
+        "abcd",
+        "efgh",
+        f"ij\n[6 bytes truncated, sha256: {digest}]\n",
+        "other",
+    ]
+
+
+def test_apply_matches_limit():
+    """Test limiting a stored (coalesced) notebook matches limiting during execution,
+    and that re-applying the limits does not change it.
+    """
+    limiter = OutputLimiter(max_output_bytes=10)
+    outputs = []
+    for text in ["abcd", "efgh", "ijkl", "mnop"]:
+        outputs.append(_stream(text))
+        limiter.limit(outputs)
+    limiter.finish()
+    executed, _ = coalesce_streams(_notebook(*outputs), {})
+
+    stored = _notebook(_stream("abcdefghijklmnop"))
+    limited = OutputLimiter(max_output_bytes=10).apply(stored)
+    assert limited.cells[0].outputs == executed.cells[0].outputs
+    # the stored notebook is not modified
+    assert stored.cells[0].outputs[0].text == "abcdefghijklmnop"
+    assert OutputLimiter(max_output_bytes=10).apply(executed) is executed
+
+
+def test_limit_notebook_bytes():
+    """Test the total size of notebook outputs is limited."""
+    notebook = _notebook(
+        _stream("abcd"),
+        nbformat.v4.new_output("display_data", data={"text/plain": "efgh"}),
+        nbformat.v4.new_output("display_data", data={"text/plain": "ijkl"}),
+    )
+    limited = OutputLimiter(max_nb_bytes=10).apply(notebook)
+    outputs = limited.cells[0].outputs
+    assert outputs[0].text == "abcd"
+    assert outputs[1].data == {"text/plain": "efgh"}
+    assert outputs[2].data["text/plain"].startswith("[4 bytes truncated, sha256: ")
+
+
+def test_spill(tmp_path):
+    """Test oversized outputs are spilled to disk."""
+    limiter = OutputLimiter(max_output_bytes=2, overflow="spill", spill_dir=tmp_path)
+    limited = limiter.apply(
+        _notebook(
+            _stream("abcdef"),
+            nbformat.v4.new_output("display_data", data={"text/plain": "ghi"}),
+        )
+    )
+    outputs = limited.cells[0].outputs
+    digest = hashlib.sha256(b"cdef").hexdigest()
+    assert outputs[0].text == f"ab\n[4 bytes spilled, sha256: {digest}]\n"
+    assert (tmp_path / f"{digest}.txt").read_bytes() == b"cdef"
+    digest = hashlib.sha256(b"ghi").hexdigest()
+    assert outputs[1].data == {"text/plain": f"[3 bytes spilled, sha256: {digest}]"}
+    assert (tmp_path / f"{digest}.txt").read_bytes() == b"ghi"
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        [f"{hashlib.sha256(b'cdef').hexdigest()}.txt", f"{digest}.txt"]
+    )
+
+
+def test_spill_markers_only(tmp_path):
+    """Test markers of spilled outputs can be computed, without spilling them."""
+    notebook = _notebook(
+        _stream("abcdef"),
+        nbformat.v4.new_output("display_data", data={"text/plain": "ghi"}),
+    )
+    limited = OutputLimiter(
+        max_output_bytes=2, overflow="spill", spill_dir=tmp_path
+    ).apply(notebook)
+    spill_dir = tmp_path / "markers"
+    markers = OutputLimiter(
+        max_output_bytes=2, overflow="spill", spill_dir=spill_dir, markers_only=True
+    ).apply(notebook)
+    assert markers == limited
+    assert not spill_dir.exists()
+
+
+def test_spill_default_dir():
+    """Test outputs are spilled to a temporary directory, by default."""
+    limiter = OutputLimiter(max_output_bytes=2, overflow="spill")
+    assert limiter.spill_dir == Path(get_default_spill_dir())
+    assert OutputLimiter(overflow="spill").spill_dir == limiter.spill_dir
@@ -0,0 +1,98 @@
+"""Tests for ``CellPipeline``."""
+
+import os
+
+import nbformat
+import pytest
+
+from pytest_notebook.execution import ExecuteResult, ExecutionStoppedError
+from pytest_notebook.nb_regression import NBRegressionFixture
+from pytest_notebook.notebook import load_notebook_with_config, mapping_to_dict
+
+PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "raw_files")
+
+
+def _final_notebook():
+    nb_final = nbformat.read(
+        os.path.join(PATH, "different_outputs_altered.ipynb"), as_version=4
+    )
+    nb_final.metadata["language_info"] = {"name": "python"}
+    nb_final.nbformat_minor += 1
+    return nb_final
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {
+            "diff_ignore": ("/cells/*/outputs/*/traceback",),
+            "diff_normalize": ("strip_ansi",),
+            "diff_replace": (("/cells/*/outputs/*/text", "x", "y"),),
+        },
+        {
+            # paths of specific cells, which are re-based for each cell
+            "diff_ignore": ("/cells/9/outputs", "/cells/16/outputs/1/traceback"),
+            "diff_replace": (("/cells/4/outputs/0/text", "hallo3\n", ""),),
+        },
+    ],
+    ids=["starred", "indexed"],
+)
+def test_pipeline_matches_sequential(options):
+    """Test the pipelined comparison is the same as for the whole notebook."""
+    path = os.path.join(PATH, "different_outputs.ipynb")
+    fixture = NBRegressionFixture(diff_use_color=False, **options)
+    sequential = fixture.check(
+        path,
+        raise_errors=False,
+        exec_results=ExecuteResult(None, _final_notebook(), {}),
+    )
+    assert sequential.diff_filtered
+
+    fixture.diff_pipeline = True
+    nb_final = _final_notebook()
+    pipeline = fixture.create_pipeline(*load_notebook_with_config(path))
+    # the remaining cells are processed on finish
+    for index, cell in enumerate(nb_final.cells[:2]):
+        pipeline.submit(cell, index)
+    pipelined = fixture.check(
+        path,
+        raise_errors=False,
+        exec_results=ExecuteResult(None, nb_final, {}),
+        pipeline=pipeline,
+    )
+    assert mapping_to_dict(pipelined.diff_full) == mapping_to_dict(sequential.diff_full)
+    assert pipelined.diff_string == sequential.diff_string
+    assert pipelined.nb_final == sequential.nb_final
+
+
+def test_pipeline_fail_fast():
+    """Test a fail-fast pipeline stops at the first cell with a difference."""
+    path = os.path.join(PATH, "different_outputs.ipynb")
+    fixture = NBRegressionFixture(diff_fail_fast=True)
+    nb_initial, nb_config = load_notebook_with_config(path)
+    pipeline = fixture.create_pipeline(nb_initial, nb_config)
+    nb_final = _final_notebook()
+    index = next(
+        index
+        for index, (initial, final) in enumerate(
+            zip(nb_initial.cells, nb_final.cells, strict=True)
+        )
+        if initial != final
+    )
+    for cell_index in range(index):
+        pipeline.submit(nb_final.cells[cell_index], cell_index)
+    with pytest.raises(ExecutionStoppedError) as exc_info:
+        pipeline.submit(nb_final.cells[index], index)
+    assert exc_info.value.cell_index == index
+
+
+def test_pipeline_fail_fast_cell_path():
+    """Test a fail-fast pipeline applies the ignore paths of specific cells."""
+    path = os.path.join(PATH, "different_outputs.ipynb")
+    fixture = NBRegressionFixture(diff_fail_fast=True, diff_ignore=("/cells/3",))
+    pipeline = fixture.create_pipeline(*load_notebook_with_config(path))
+    nb_final = _final_notebook()
+    with pytest.raises(ExecutionStoppedError) as exc_info:
+        for index, cell in enumerate(nb_final.cells):
+            pipeline.submit(cell, index)
+    assert exc_info.value.cell_index == 4
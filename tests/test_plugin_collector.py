@@ -1,8 +1,10 @@
 """Test the  plugin collection and direct invocation of notebooks."""
 
+import json
 import os
 
 import nbformat
+import pytest
 
 PATH = os.path.dirname(os.path.realpath(__file__))
 
@@ -120,11 +122,14 @@ def test_run_with_coverage_merge(testdir):
             /metadata/language_info
         """
     )
+    # the coverage data files do not require the tmpdir plugin
     result = testdir.runpytest(
-        "--nb-test-files", "--nb-coverage", "--cov=package", "-v"
+        "--nb-test-files", "--nb-coverage", "--cov=package", "-v", "-p", "no:tmpdir"
     )
     # fnmatch_lines does an assertion internally
-    result.stdout.fnmatch_lines(["*::nbregression(test_nb) PASSED*", "*package.py*"])
+    result.stdout.fnmatch_lines(
+        ["*::nbregression(test_nb) PASSED*", "package.py * 0 * 100%"]
+    )
     assert result.ret == 0
 
 
@@ -315,3 +320,527 @@ def test_run_with_exec_env_ini(testdir):
     # fnmatch_lines does an assertion internally
     result.stdout.fnmatch_lines(["*::nbregression(test_nb) PASSED*"])
     assert result.ret == 0
+
+
+def test_run_with_kernel_pool(testdir):
+    """Test the ``nb_exec_kernel_pool`` ini option, with multiple notebooks."""
+    for name in ("test_nb1.ipynb", "test_nb2.ipynb"):
+        cell = nbformat.v4.new_code_cell("print('hallo')", execution_count=1)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="hallo\n")]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, name)
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_kernel_pool = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB kernel pool: enabled",
+            "*::nbregression(test_nb1) PASSED*",
+            "*::nbregression(test_nb2) PASSED*",
+        ]
+    )
+    assert result.ret == 0
+
+
+def test_run_with_workers(testdir):
+    """Test the ``--nb-workers`` option, checking notebooks in worker processes."""
+    for name, source, text in (
+        ("test_nb1", "print(1)", "1\n"),
+        ("test_nb2", "print(2)", "1\n"),
+        ("test_nb3", "import pytest\npytest.skip('skipped in a worker')", ""),
+        ("test_nb4", "print(4)", "4\n"),
+    ):
+        cell = nbformat.v4.new_code_cell(source, execution_count=1)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text=text)]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_kernel_pool = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("--nb-workers=2", "--nb-durations=0", "-rs", "-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB workers: 2",
+            "*::nbregression(test_nb1) PASSED*",
+            "*::nbregression(test_nb2) FAILED*",
+            "*::nbregression(test_nb3) SKIPPED*",
+            "*::nbregression(test_nb4) PASSED*",
+            # the execution timing is recorded by the main process
+            "*= slowest notebook durations =*",
+            "*skipped in a worker*",
+            "*1 failed, 2 passed, 1 skipped*",
+        ]
+    )
+    assert "modified /cells/0/outputs/0/text" in result.stdout.str()
+    assert result.ret == 1
+
+
+def test_run_with_shard(testdir):
+    """Test the ``--nb-shard`` option, partitioning by stored durations."""
+    for name, source in (
+        ("test_nb1", "import time; time.sleep(2)"),
+        ("test_nb2", "pass"),
+        ("test_nb3", "pass"),
+    ):
+        notebook = nbformat.v4.new_notebook(
+            cells=[nbformat.v4.new_code_cell(source)], metadata=KERNELSPEC
+        )
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+            /cells/*/execution_count
+        """
+    )
+    result = testdir.runpytest("--nb-shard=1/2")
+    # without stored durations, notebooks are assumed to take the same time
+    result.stdout.fnmatch_lines(
+        [
+            "NB shard: 1/2",
+            "*3 items / 1 deselected / 2 selected*",
+            "NB shard 1/2: 2 notebook(s), estimated 2.00s",
+        ]
+    )
+    assert result.ret == 0
+    # record the durations of all notebooks
+    assert testdir.runpytest().ret == 0
+
+    # the slowest notebook is now in a shard on its own
+    result = testdir.runpytest("--nb-shard=1/2", "-v")
+    result.stdout.fnmatch_lines(
+        ["*test_nb1.ipynb::nbregression(test_nb1) PASSED*", "*1 passed, 2 deselected*"]
+    )
+    result = testdir.runpytest("--nb-shard=2/2", "-v")
+    result.stdout.fnmatch_lines(
+        [
+            "*test_nb2.ipynb::nbregression(test_nb2) PASSED*",
+            "*test_nb3.ipynb::nbregression(test_nb3) PASSED*",
+            "*2 passed, 1 deselected*",
+        ]
+    )
+
+    result = testdir.runpytest("--nb-shard=3/2")
+    result.stderr.fnmatch_lines(["*--nb-shard: shard must satisfy 1 <= I <= N*"])
+    assert result.ret == 4
+
+
+def test_run_longest_first(testdir):
+    """Test the ``--nb-longest-first`` option, ordering by stored durations."""
+    for name, source in (
+        ("test_nb1", "pass"),
+        ("test_nb2", "import time; time.sleep(2)"),
+        ("test_nb3", "pass"),
+    ):
+        notebook = nbformat.v4.new_notebook(
+            cells=[nbformat.v4.new_code_cell(source)], metadata=KERNELSPEC
+        )
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+            /cells/*/execution_count
+        """
+    )
+    testdir.makepyfile(test_other="def test_other(): pass")
+    # without stored durations, the collection order is kept
+    result = testdir.runpytest("--nb-longest-first", "-v")
+    result.stdout.fnmatch_lines(
+        [
+            "NB order: longest first",
+            "*test_nb1.ipynb::nbregression(test_nb1) PASSED*",
+            "*test_nb2.ipynb::nbregression(test_nb2) PASSED*",
+            "*test_nb3.ipynb::nbregression(test_nb3) PASSED*",
+            "*test_other.py::test_other PASSED*",
+        ]
+    )
+    assert result.ret == 0
+    result = testdir.runpytest("--nb-longest-first", "-v")
+    result.stdout.fnmatch_lines(
+        [
+            "*test_nb2.ipynb::nbregression(test_nb2) PASSED*",
+            "*test_nb?.ipynb::nbregression(test_nb?) PASSED*",
+            "*test_nb?.ipynb::nbregression(test_nb?) PASSED*",
+            "*test_other.py::test_other PASSED*",
+        ]
+    )
+    assert result.ret == 0
+
+
+def test_run_with_durations(testdir):
+    """Test the ``--nb-durations`` option."""
+    for name, source in (("test_nb1", "print(1)"), ("test_nb2", "print(2)")):
+        cell = nbformat.v4.new_code_cell(source, execution_count=1)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("--nb-durations=0")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "*= slowest notebook durations =*",
+            "*s test_nb?.ipynb::nbregression(test_nb?) (kernel start *s)",
+            "*s test_nb?.ipynb::nbregression(test_nb?) (kernel start *s)",
+            "*= slowest notebook cell durations =*",
+            "*s test_nb?.ipynb::nbregression(test_nb?)::cell[[]0] (queued *s)",
+            "*s test_nb?.ipynb::nbregression(test_nb?)::cell[[]0] (queued *s)",
+        ]
+    )
+    # failing notebooks are also reported
+    assert result.stdout.str().count("nbregression(test_nb2)::cell[0]") == 1
+    assert result.ret == 1
+
+    result = testdir.runpytest("--nb-durations=1")
+    result.stdout.fnmatch_lines(["*= slowest 1 notebook durations =*"])
+    assert result.stdout.str().count("::cell[0] (queued") == 1
+
+
+def test_run_with_resources(testdir):
+    """Test the ``--nb-resources`` and ``--nb-resources-json`` options."""
+    pytest.importorskip("psutil")
+    for name, source in (("test_nb1", "print(1)"), ("test_nb2", "print(2)")):
+        cell = nbformat.v4.new_code_cell(source, execution_count=1)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("--nb-resources=1", "--nb-resources-json=usage.json")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "*= heaviest 1 notebook kernels =*",
+            "*MB (cpu user *s, system *s, wall *s) test_nb?.ipynb::nbregression(*)",
+            "*= heaviest 1 notebook cells =*",
+            "*MB (cpu user *s, system *s, wall *s) "
+            "test_nb?.ipynb::nbregression(test_nb?)::cell[[]0]",
+            "NB resources written to: *usage.json",
+        ]
+    )
+    assert result.ret == 1
+    records = json.loads(testdir.tmpdir.join("usage.json").read_text("utf8"))
+    assert len(records) == 1
+    assert records[0]["peak_rss"] > 0
+    assert [cell["index"] for cell in records[0]["cells"]] == [0]
+
+
+def test_run_with_coverage_core(testdir):
+    """Test the ``--nb-cov-core`` option, and that the core is reported."""
+    cell = nbformat.v4.new_code_cell("print(1)", execution_count=1)
+    cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest(
+        "--nb-coverage", "--nb-cov-core=pytrace", "--nb-durations=0"
+    )
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB coverage core: pytrace",
+            "*= slowest notebook durations =*",
+            "*s test_nb.ipynb::nbregression(test_nb) (kernel start *s, "
+            "coverage setup *s, coverage teardown *s, coverage core PyTracer)",
+            "*= total notebook durations by coverage core =*",
+            "*s PyTracer (1 notebooks)",
+        ]
+    )
+    assert result.ret == 0
+
+
+def test_run_inprocess(testdir):
+    """Test the ``--nb-exec-mode`` option."""
+    cell = nbformat.v4.new_code_cell("print(1)", execution_count=1)
+    cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("--nb-exec-mode=inprocess", "-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        ["NB exec mode: inprocess", "*::nbregression(test_nb) PASSED*"]
+    )
+    assert result.ret == 0
+
+
+def test_run_with_output_limits(testdir):
+    """Test the ``nb_exec_max_output_bytes`` ini option."""
+    for name, expected in (("test_nb1", "x" * 5000), ("test_nb2", "x" * 4999 + "y")):
+        cell = nbformat.v4.new_code_cell("print('x' * 5000, end='')", execution_count=1)
+        cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text=expected)]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, f"{name}.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_max_output_bytes = 1000
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB output limits: 1000 bytes per output, None bytes per notebook "
+            "(truncate)",
+            "*::nbregression(test_nb1) PASSED*",
+            "*::nbregression(test_nb2) FAILED*",
+        ]
+    )
+    # the excess output is compared by its digest
+    result.stdout.fnmatch_lines(["*4000 bytes truncated, sha256:*"])
+    assert result.ret == 1
+    # spilling does not require the tmpdir plugin
+    result = testdir.runpytest(
+        "-v", "-p", "no:tmpdir", "-o", "nb_exec_output_overflow=spill"
+    )
+    result.stdout.fnmatch_lines(
+        ["*::nbregression(test_nb1) PASSED*", "*4000 bytes spilled, sha256:*"]
+    )
+    assert result.ret == 1
+
+
+def test_run_with_preload(testdir):
+    """Test the ``nb_exec_preload`` ini option."""
+    testdir.makepyfile(preload_mod="import os\nPID = os.getpid()\n")
+    cell = nbformat.v4.new_code_cell(
+        "import os, sys\n"
+        "print('preload_mod' in sys.modules)\n"
+        "print(sys.modules['preload_mod'].PID != os.getpid())",
+        execution_count=1,
+    )
+    cell.outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="True\nTrue\n")
+    ]
+    notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_preload =
+            preload_mod
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB preloaded modules: preload_mod",
+            "*::nbregression(test_nb) PASSED*",
+        ]
+    )
+    assert result.ret == 0
+
+
+@pytest.mark.parametrize("pool", (False, True))
+def test_run_with_concurrency(testdir, pool):
+    """Test ``--nb-concurrency``, with results reported in collection order."""
+    for name, text in (("a", "hallo"), ("b", "wrong"), ("c", "hallo")):
+        cell = nbformat.v4.new_code_cell(
+            "import time\ntime.sleep(0.5)\nprint('hallo')", execution_count=1
+        )
+        cell.outputs = [
+            nbformat.v4.new_output("stream", name="stdout", text=f"{text}\n")
+        ]
+        notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+        nbformat.write(notebook, f"test_nb_{name}.ipynb")
+    testdir.makeini(
+        f"""
+        [pytest]
+        nb_test_files = True
+        nb_exec_kernel_pool = {pool}
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest("--nb-concurrency", "2", "-v")
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB concurrency: 2",
+            "*::nbregression(test_nb_a) PASSED*",
+            "*::nbregression(test_nb_b) FAILED*",
+            "*::nbregression(test_nb_c) PASSED*",
+        ]
+    )
+    assert result.ret != 0
+
+
+@pytest.mark.parametrize("concurrency", ("1", "2"))
+def test_run_with_diff_fail_fast(testdir, concurrency):
+    """Test ``--nb-diff-fail-fast`` stops execution at the first difference."""
+    cells = [
+        nbformat.v4.new_code_cell("print('hallo')", execution_count=1),
+        nbformat.v4.new_code_cell("raise ValueError('executed')", execution_count=2),
+    ]
+    cells[0].outputs = [nbformat.v4.new_output("stream", name="stdout", text="wrong\n")]
+    notebook = nbformat.v4.new_notebook(cells=cells, metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    result = testdir.runpytest(
+        "--nb-diff-fail-fast", "--nb-concurrency", concurrency, "-v"
+    )
+    # fnmatch_lines does an assertion internally
+    result.stdout.fnmatch_lines(
+        [
+            "NB diff fail fast: enabled",
+            "*::nbregression(test_nb) FAILED*",
+            "*Execution stopped after cell 0, at the first difference:",
+        ]
+    )
+    assert "executed" not in result.stdout.str()
+    assert result.ret != 0
+
+
+def test_run_with_exec_cache(testdir):
+    """Test the ``nb_exec_cache`` ini option and ``--nb-cache-clear``."""
+    cell = nbformat.v4.new_code_cell(
+        "with open('runs.txt', 'a') as handle:\n    handle.write('run\\n')\n"
+        "print('hallo')",
+        execution_count=1,
+    )
+    cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text="hallo\n")]
+    notebook = nbformat.v4.new_notebook(cells=[cell], metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_cache = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    for args in ([], [], ["--nb-cache-clear"]):
+        result = testdir.runpytest("-v", *args)
+        # fnmatch_lines does an assertion internally
+        result.stdout.fnmatch_lines(
+            ["NB execution cache: *", "*::nbregression(test_nb) PASSED*"]
+        )
+        assert result.ret == 0
+    with open("runs.txt") as handle:
+        assert handle.read() == "run\nrun\n"
+
+
+def test_run_with_exec_cache_durations(testdir):
+    """Test results retrieved from the execution cache do not replace
+    the stored durations.
+    """
+    notebook = nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell("import time; time.sleep(1)")],
+        metadata=KERNELSPEC,
+    )
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_cache = True
+        nb_diff_ignore =
+            /metadata/language_info
+            /cells/*/execution_count
+        """
+    )
+    path = os.path.join(".pytest_cache", "v", "pytest_notebook", "durations")
+    durations = []
+    for _ in range(2):
+        assert testdir.runpytest().ret == 0
+        with open(path) as handle:
+            durations.append(json.load(handle))
+    assert durations[0]["test_nb.ipynb::nbregression(test_nb)"] >= 1
+    assert durations[1] == durations[0]
+
+
+def test_run_with_exec_cell_cache(testdir):
+    """Test the ``nb_exec_cell_cache`` ini option, with a tagged cell."""
+    cells = [
+        nbformat.v4.new_code_cell(
+            "with open('runs.txt', 'a') as handle:\n    handle.write('run\\n')\n"
+            "print('hallo')",
+            execution_count=1,
+            metadata={"tags": ["nbreg-cache"]},
+        ),
+        nbformat.v4.new_code_cell("print('world')", execution_count=2),
+    ]
+    cells[0].outputs = [nbformat.v4.new_output("stream", name="stdout", text="hallo\n")]
+    cells[1].outputs = [nbformat.v4.new_output("stream", name="stdout", text="world\n")]
+    notebook = nbformat.v4.new_notebook(cells=cells, metadata=KERNELSPEC)
+    nbformat.write(notebook, "test_nb.ipynb")
+    testdir.makeini(
+        """
+        [pytest]
+        nb_test_files = True
+        nb_exec_cell_cache = True
+        nb_diff_ignore =
+            /metadata/language_info
+        """
+    )
+    for args in ([], [], ["--nb-cache-clear"]):
+        result = testdir.runpytest("-v", *args)
+        # fnmatch_lines does an assertion internally
+        result.stdout.fnmatch_lines(
+            ["NB cell cache: *", "*::nbregression(test_nb) PASSED*"]
+        )
+        assert result.ret == 0
+    with open("runs.txt") as handle:
+        assert handle.read() == "run\nrun\n"
@@ -95,6 +95,7 @@ def test_nb_regression_ini_setting_init(testdir):
         nb_exec_timeout = 100
         nb_diff_use_color = True
         nb_diff_color_words = True
+        nb_diff_renderer = inprocess
         nb_diff_ignore =
             /metadata/language_info/version
             /cells/*/execution_count
@@ -139,6 +140,7 @@ def test_nb_regression_ini_setting_init(testdir):
                         ),
                         "diff_use_color": True,
                         "diff_color_words": True,
+                        "diff_renderer": "inprocess",
                         # the following are the defaults for pytest-cov
                         "cov_source": (),
                         "cov_config": ".coveragerc",
@@ -0,0 +1,56 @@
+"""Tests for partitioning notebook tests into shards."""
+
+import pytest
+
+from pytest_notebook.sharding import (
+    CACHE_KEY,
+    DurationStore,
+    longest_first,
+    parse_shard,
+    partition,
+)
+
+
+class _Cache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def test_parse_shard():
+    assert parse_shard("1/1") == (0, 1)
+    assert parse_shard("3/8") == (2, 8)
+    for value in ("0/2", "3/2", "1", "a/b", "1/2/3"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_partition():
+    """Test keys are balanced across bins, keeping their original order."""
+    weights = {"a": 1, "b": 5, "c": 2, "d": 3, "e": 1}
+    assert partition(weights, 2) == [["a", "b"], ["c", "d", "e"]]
+    assert partition(weights, 1) == [list(weights)]
+    assert partition(weights, 6) == [["b"], ["d"], ["c"], ["a"], ["e"], []]
+    with pytest.raises(ValueError):
+        partition(weights, 0)
+
+
+def test_longest_first():
+    weights = {"a": 1, "b": 5, "c": 2, "d": 5}
+    assert longest_first(weights) == ["b", "d", "c", "a"]
+
+
+def test_duration_store():
+    """Test durations are merged with, and estimated from, those stored."""
+    cache = _Cache({CACHE_KEY: {"a": 2.0, "b": 4.0}})
+    store = DurationStore(cache)
+    assert store.get("a") == 2.0
+    assert store.estimates(["a", "b", "c"]) == {"a": 2.0, "b": 4.0, "c": 3.0}
+    assert DurationStore().estimates(["a"]) == {"a": 1.0}
+
+    store.record("a", 1.0)
+    store.record("c", 5.0)
+    assert cache[CACHE_KEY] == {"a": 2.0, "b": 4.0}
+    # e.g. stored by another process, since the store was loaded
+    cache[CACHE_KEY] = {"a": 2.0, "b": 4.0, "d": 6.0}
+    store.save()
+    assert cache[CACHE_KEY] == {"a": 1.0, "b": 4.0, "c": 5.0, "d": 6.0}